@@ -1,5 +1,6 @@
 ﻿using api_gateway_dotnet.Services.Interface;
 using Microsoft.Extensions.Logging;
+using System.Diagnostics;
 using System.Net.Http.Headers;
 using System.Text;
 
@@ -85,7 +86,10 @@ namespace api_gateway_dotnet.Services
                 CopyHeaderIfExists(request, forwardRequest, "Accept");
                 CopyHeaderIfExists(request, forwardRequest, "Accept-Language");
 
-                _logger.LogInformation($"Forwarding request to {url}");
+                // Correlate the downstream request with this one
+                var requestId = AddCorrelationHeaders(request, forwardRequest);
+
+                _logger.LogInformation($"Forwarding request {requestId} to {url}");
                 var response = await client.SendAsync(forwardRequest);
                 
                 _logger.LogDebug($"Response from {url}: {(int)response.StatusCode}");
@@ -125,6 +129,34 @@ namespace api_gateway_dotnet.Services
             }
         }
 
+        private string AddCorrelationHeaders(HttpRequest source, HttpRequestMessage destination)
+        {
+            // Keep the caller's request id, or use this request's own identifier
+            var requestId = source.Headers.TryGetValue("X-Request-ID", out var values) && !string.IsNullOrEmpty(values.ToString())
+                ? values.ToString()
+                : source.HttpContext.TraceIdentifier;
+            destination.Headers.TryAddWithoutValidation("X-Request-ID", requestId);
+
+            // W3C trace context: the gateway's current activity becomes the parent
+            // of the downstream span; without one, pass the caller's context through
+            var activity = Activity.Current;
+            if (activity != null && activity.IdFormat == ActivityIdFormat.W3C)
+            {
+                destination.Headers.TryAddWithoutValidation("traceparent", activity.Id);
+                if (!string.IsNullOrEmpty(activity.TraceStateString))
+                {
+                    destination.Headers.TryAddWithoutValidation("tracestate", activity.TraceStateString);
+                }
+            }
+            else
+            {
+                CopyHeaderIfExists(source, destination, "traceparent");
+                CopyHeaderIfExists(source, destination, "tracestate");
+            }
+
+            return requestId;
+        }
+
         private void CopyHeaderIfExists(HttpRequest source, HttpRequestMessage destination, string headerName)
         {
             if (source.Headers.TryGetValue(headerName, out var values))
@@ -0,0 +1,148 @@
+# blind_index.py
+"""
+Blind indexes for equality lookups on encrypted columns.
+
+A blind index is a deterministic keyed HMAC-SHA256 of a (normalized)
+value. Store it next to the ciphertext and look rows up by the index of
+the search term instead of decrypting the column.
+
+    index = base64url(HMAC-SHA256(BLIND_INDEX_KEY, context || 0x00 || normalize(value))[:length])
+
+- BLIND_INDEX_KEY is separate from the Fernet keys, so rotating
+  encryption keys does not invalidate stored indexes (and leaking one
+  does not compromise the other). Changing it requires re-indexing.
+- context separates indexes of different columns: the same e-mail address
+  yields unrelated indexes for "users.email" and "orders.email". It may
+  not contain NUL, so the first 0x00 always ends it and no other
+  (context, value) pair produces the same HMAC input.
+- Truncating to fewer bytes makes collisions likely on purpose, which
+  hides exact matches from someone holding the index column; lookups then
+  return a few candidates that are filtered after decryption.
+"""
+import base64
+import hashlib
+import hmac
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Sequence
+from fastapi import HTTPException
+from .config import get_settings
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+MIN_LENGTH = 4
+
+
+def _digits(value: str) -> str:
+    return "".join(ch for ch in value if ch.isdigit())
+
+
+def _collapse_whitespace(value: str) -> str:
+    return " ".join(value.split())
+
+
+NORMALIZERS: Dict[str, Callable[[str], str]] = {
+    "trim": str.strip,
+    "lower": str.lower,
+    "casefold": str.casefold,
+    "nfkc": lambda value: unicodedata.normalize("NFKC", value),
+    "collapse_whitespace": _collapse_whitespace,
+    "digits": _digits,
+}
+
+
+def normalize(value: str, steps: Sequence[str]) -> str:
+    """
+    Apply normalization steps in order.
+
+    Raises:
+        HTTPException: If a step is unknown
+    """
+    for step in steps:
+        normalizer = NORMALIZERS.get(step)
+        if normalizer is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown normalization '{step}'. Expected one of: {', '.join(NORMALIZERS)}"
+            )
+        value = normalizer(value)
+    return value
+
+
+@lru_cache(maxsize=64)
+def _base_mac(key: str, context: str):
+    # The keyed state is computed once per context and copied per value
+    return hmac.new(key.encode(), context.encode() + b"\x00", hashlib.sha256)
+
+
+def _get_key() -> str:
+    key = get_settings().blind_index_key
+    if key is None:
+        logger.error("BLIND_INDEX_KEY not configured - blind indexing cannot proceed")
+        raise HTTPException(
+            status_code=503,
+            detail="Blind index service not properly configured"
+        )
+    return key
+
+
+def _check_context(context: str):
+    if "\x00" in context:
+        raise HTTPException(
+            status_code=400,
+            detail="context may not contain NUL characters"
+        )
+
+
+def _check_length(length: int):
+    if not MIN_LENGTH <= length <= DIGEST_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"length must be between {MIN_LENGTH} and {DIGEST_SIZE} bytes"
+        )
+
+
+def blind_index(
+    value: str,
+    context: str = "",
+    normalization: Sequence[str] = (),
+    length: int = DIGEST_SIZE
+) -> str:
+    """
+    Compute the blind index of value.
+
+    Args:
+        value: The plaintext to index
+        context: Domain separator, e.g. the table and column name
+        normalization: Normalization steps applied first (see NORMALIZERS)
+        length: Bytes of the HMAC to keep
+
+    Returns:
+        The index as unpadded URL-safe base64
+
+    Raises:
+        HTTPException: If the key is not configured or the options are invalid
+    """
+    return blind_index_batch([value], context, normalization, length)[0]
+
+
+def blind_index_batch(
+    values: List[str],
+    context: str = "",
+    normalization: Sequence[str] = (),
+    length: int = DIGEST_SIZE
+) -> List[str]:
+    """Compute the blind indexes of many values with the same options."""
+    _check_context(context)
+    _check_length(length)
+    base = _base_mac(_get_key(), context)
+    indexes = []
+    for value in values:
+        mac = base.copy()
+        mac.update(normalize(value, normalization).encode())
+        indexes.append(base64.urlsafe_b64encode(mac.digest()[:length]).rstrip(b"=").decode())
+    return indexes
+
@@ -0,0 +1,184 @@
+# channel.py
+"""
+Persistent WebSocket channel for high-frequency encrypt/decrypt callers.
+
+A client authenticates once when it connects, sending the JWT in the
+Authorization header or, for clients that cannot set headers, in the
+"token" query parameter. The same rules as app.security apply. It then
+sends any number of JSON messages:
+
+    {"id": 1, "op": "encrypt", "data": "Hello, World!"}
+    {"id": 2, "op": "decrypt", "data": "gAAAAABl..."}
+
+and receives one reply per message, carrying the same id:
+
+    {"id": 1, "result": "gAAAAABl..."}
+    {"id": 2, "error": {"status_code": 400, "detail": "Invalid token..."}}
+
+The id can be any JSON value. Small payloads are handled inline and
+answered in order. Payloads above the crypto executor's offload
+threshold run in its pool and may be answered out of order, so clients
+match replies by id.
+
+Flow control: at most WS_MAX_IN_FLIGHT operations per connection are in
+progress at once. Past that the server stops reading, and TCP
+backpressure slows the client down instead of growing a backlog.
+Messages larger than WS_MAX_MESSAGE_SIZE get a 413 reply.
+
+Token expiry is re-checked every WS_AUTH_CHECK_INTERVAL seconds and when
+exp is reached. An expired connection is closed with code 1008 (policy
+violation) and must reconnect with a fresh token. The per-subject rate
+limit (app.limits) is charged per operation.
+"""
+import asyncio
+import time
+from typing import Any, Optional, Set
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from starlette import status
+from .config import get_settings
+from .crypto import decrypt_data, encrypt_data
+from .executor import get_crypto_executor
+from .limits import check_rate_limit
+from .logger import setup_logger
+from .metrics import observe_request
+from .security import decode_token
+from .serialization import dumps, loads
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+OPERATIONS = {
+    "encrypt": encrypt_data,
+    "decrypt": decrypt_data,
+}
+
+ROUTE = "/ws"
+
+
+def _get_token(websocket: WebSocket) -> Optional[str]:
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials.strip()
+    return websocket.query_params.get("token")
+
+
+class Channel:
+    """One authenticated WebSocket connection."""
+
+    def __init__(self, websocket: WebSocket, token: dict):
+        settings = get_settings()
+        self.websocket = websocket
+        self.token = token
+        self.max_message_size = settings.ws_max_message_size
+        self.check_interval = settings.ws_auth_check_interval
+        self.executor = get_crypto_executor()
+        self._slots = asyncio.Semaphore(settings.ws_max_in_flight)
+        self._send_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def run(self):
+        """Serve messages until the client disconnects or the token expires."""
+        reader = asyncio.ensure_future(self._read())
+        watchdog = asyncio.ensure_future(self._watch_expiry())
+        try:
+            done, _ = await asyncio.wait((reader, watchdog), return_when=asyncio.FIRST_COMPLETED)
+            if watchdog in done:
+                logger.info(f"WebSocket token of {self.token.get('sub', 'unknown')} expired - closing")
+                await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+        finally:
+            for task in (reader, watchdog, *self._tasks):
+                task.cancel()
+
+    async def _watch_expiry(self):
+        while True:
+            exp = self.token.get("exp")
+            remaining = exp - time.time() if isinstance(exp, (int, float)) else self.check_interval
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, self.check_interval))
+
+    async def _read(self):
+        try:
+            while True:
+                await self._slots.acquire()
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                data = message.get("text")
+                if data is None:
+                    data = message.get("bytes") or b""
+
+                start = time.perf_counter()
+                if len(data) > self.max_message_size:
+                    await self._reply(None, None, (413, f"Message exceeds {self.max_message_size} bytes"), start)
+                    continue
+                if self.executor.mode == "inline" or len(data) < self.executor.threshold:
+                    # Runs inline without yielding; a task would only add overhead
+                    await self._handle(data, start)
+                else:
+                    task = asyncio.ensure_future(self._handle(data, start))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        except WebSocketDisconnect:
+            return
+
+    async def _handle(self, data, start: float):
+        request_id = None
+        try:
+            try:
+                message = loads(data)
+                request_id = message.get("id")
+                operation = OPERATIONS.get(message.get("op"))
+                payload = message.get("data")
+            except (ValueError, AttributeError):
+                raise HTTPException(status_code=400, detail="Message must be a JSON object")
+            if operation is None:
+                raise HTTPException(status_code=400, detail=f"Unknown op, expected one of: {', '.join(OPERATIONS)}")
+            if not isinstance(payload, str):
+                raise HTTPException(status_code=400, detail="data must be a string")
+
+            check_rate_limit(self.token)
+            result = await self.executor.run(operation, payload, len(payload))
+            await self._reply(request_id, result, None, start)
+        except HTTPException as e:
+            await self._reply(request_id, None, (e.status_code, e.detail), start)
+        except Exception as e:
+            logger.error(f"Unexpected error on WebSocket: {type(e).__name__}: {str(e)}")
+            await self._reply(request_id, None, (500, "Internal server error"), start)
+
+    async def _reply(self, request_id: Any, result: Optional[str], error: Optional[tuple], start: float):
+        if error is None:
+            reply = {"id": request_id, "result": result}
+        else:
+            reply = {"id": request_id, "error": {"status_code": error[0], "detail": error[1]}}
+        try:
+            async with self._send_lock:
+                await self.websocket.send_text(dumps(reply).decode())
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            pass  # The client went away; the reader sees the disconnect
+        finally:
+            self._slots.release()
+            observe_request("WS", ROUTE, 200 if error is None else error[0], time.perf_counter() - start)
+
+
+async def serve_channel(websocket: WebSocket):
+    """
+    Authenticate a WebSocket connection and serve it as a Channel.
+
+    Connections without a valid token are refused (HTTP 403) before the
+    handshake completes.
+    """
+    token = _get_token(websocket)
+    try:
+        if not token:
+            raise HTTPException(status_code=401, detail="Missing token")
+        payload = decode_token(token)
+    except HTTPException as e:
+        logger.warning(f"WebSocket connection refused: {e.detail}")
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+
+    await websocket.accept()
+    logger.debug(f"WebSocket channel opened by user: {payload.get('sub', 'unknown')}")
+    await Channel(websocket, payload).run()
@@ -0,0 +1,133 @@
+# compression.py
+"""
+Optional compression stage applied before encryption.
+
+Enabled with COMPRESSION=zlib (or zstd, if the zstandard package is
+installed). Plaintexts of at least COMPRESSION_MIN_SIZE bytes are
+compressed, and the codec is recorded in the flags byte of the ciphertext
+header (see app.engines); data that does not shrink is stored as is.
+Decompression is capped at MAX_DECOMPRESSED_SIZE bytes so a crafted
+ciphertext cannot expand into an unbounded allocation.
+
+Compression is opt-in: the ciphertext length then depends on the content,
+which leaks information when attacker-controlled text is encrypted
+together with secrets (as in CRIME/BREACH). Only enable it for data where
+that is acceptable.
+"""
+import io
+import zlib
+from typing import Tuple
+from fastapi import HTTPException
+from .logger import setup_logger
+from .metrics import track_stage
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+FLAG_ZLIB = 0x01
+FLAG_ZSTD = 0x02
+COMPRESSION_FLAGS = FLAG_ZLIB | FLAG_ZSTD
+
+CODECS = ("off", "zlib", "zstd")
+
+_warned_zstd_missing = False
+
+
+def compress(data: bytes, codec: str, min_size: int, level: int = 6) -> Tuple[bytes, int]:
+    """
+    Compress data with codec if it is large enough and actually shrinks.
+
+    Args:
+        data: The plaintext
+        codec: "off", "zlib" or "zstd" (falls back to zlib when zstandard
+            is not installed)
+        min_size: Smaller inputs are left uncompressed
+        level: Compression level
+
+    Returns:
+        (data to encrypt, header flags); flags is 0 when data was left as is
+
+    Raises:
+        HTTPException: If codec is unknown
+    """
+    if codec == "off" or len(data) < min_size:
+        return data, 0
+    if codec not in CODECS:
+        logger.error(f"Unknown compression codec '{codec}' - check COMPRESSION")
+        raise HTTPException(
+            status_code=503,
+            detail="Encryption service not properly configured"
+        )
+
+    global _warned_zstd_missing
+    if codec == "zstd" and zstandard is None:
+        if not _warned_zstd_missing:
+            logger.warning("COMPRESSION=zstd but the zstandard package is not installed - using zlib")
+            _warned_zstd_missing = True
+        codec = "zlib"
+
+    with track_stage("compress"):
+        if codec == "zstd":
+            compressed, flag = zstandard.ZstdCompressor(level=level).compress(data), FLAG_ZSTD
+        else:
+            compressed, flag = zlib.compress(data, level), FLAG_ZLIB
+
+    if len(compressed) >= len(data):
+        return data, 0
+    return compressed, flag
+
+
+def decompress(data: bytes, flags: int, max_size: int) -> bytes:
+    """
+    Reverse compress() according to the header flags.
+
+    Raises:
+        HTTPException: 413 if the output would exceed max_size, 400 if the
+            compressed data is corrupt, 503 if the codec is not installed
+    """
+    flag = flags & COMPRESSION_FLAGS
+    if not flag:
+        return data
+
+    with track_stage("decompress"):
+        if flag == FLAG_ZLIB:
+            decompressor = zlib.decompressobj()
+            try:
+                result = decompressor.decompress(data, max_size + 1)
+            except zlib.error:
+                raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+            complete = decompressor.eof and not decompressor.unconsumed_tail
+        elif flag == FLAG_ZSTD:
+            if zstandard is None:
+                logger.error("Ciphertext is zstd-compressed but the zstandard package is not installed")
+                raise HTTPException(status_code=503, detail="zstd decompression is not available")
+            # read() may return fewer bytes than asked for before EOF, so
+            # keep reading until EOF or until the cap is exceeded
+            chunks = []
+            size = 0
+            try:
+                with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+                    while size <= max_size:
+                        chunk = reader.read(max_size + 1 - size)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        size += len(chunk)
+            except zstandard.ZstdError:
+                raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+            result = b"".join(chunks)
+            complete = True
+        else:
+            raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+
+    if len(result) > max_size:
+        logger.warning(f"Decompressed data exceeds the {max_size} byte limit")
+        raise HTTPException(status_code=413, detail="Decompressed data exceeds size limit")
+    if not complete:
+        raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+    return result
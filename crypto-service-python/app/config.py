@@ -1,56 +1,353 @@
 # config.py
+"""
+Service configuration.
+
+Nothing is read or validated at import time. Settings are loaded once,
+explicitly, via load_settings(): by app.server before it forks workers,
+or by the application lifespan when the app runs under plain uvicorn.
+Code that runs outside the app (tests, CLIs, benchmarks) gets them lazily
+from get_settings(). The cipher is built from the settings on first use
+and shared by every caller.
+"""
 import os
-from dotenv import load_dotenv
-from cryptography.fernet import Fernet
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from cryptography.fernet import Fernet, MultiFernet
 from .logger import setup_logger
 
 # Setup logger for this module
 logger = setup_logger(__name__)
 
-logger.info("Loading environment variables...")
+# JWT Configuration
+JWT_ISSUER = "SecureCloudPlatform"
+JWT_AUDIENCE = "SecureCloudClients"
 
-# Load environment variables from .env file
-load_dotenv()
+_lock = threading.Lock()
+_settings: Optional["Settings"] = None
+_cipher: Optional[MultiFernet] = None
+_preloaded = False
 
-logger.info("Environment variables loaded. Checking required secrets...")
 
-# Check FERNET_KEY
-fernet_key = os.getenv("FERNET_KEY")
-logger.debug(f"FERNET_KEY exists: {fernet_key is not None}")
-if fernet_key:
-    logger.debug(f"FERNET_KEY length: {len(fernet_key)}")
-    logger.debug(f"FERNET_KEY first 10 chars: {fernet_key[:10]}...")
-else:
-    logger.error("FERNET_KEY not found in environment!")
+def get_fernet_keys() -> List[str]:
+    """
+    Return the Fernet key ring from the environment, newest key first.
 
-# Check JWT_SECRET
-jwt_secret = os.getenv("JWT_SECRET")
-logger.debug(f"JWT_SECRET exists: {jwt_secret is not None}")
-if jwt_secret:
-    logger.debug(f"JWT_SECRET length: {len(jwt_secret)}")
-    logger.debug(f"JWT_SECRET first 10 chars: {jwt_secret[:10]}...")
-else:
-    logger.error("JWT_SECRET not found in environment!")
+    FERNET_KEYS holds a comma-separated ring for key rotation: the first
+    key encrypts, every key can decrypt. When it is not set, the single
+    FERNET_KEY is used.
+    """
+    raw = os.getenv("FERNET_KEYS") or os.getenv("FERNET_KEY") or ""
+    return [key.strip() for key in raw.split(",") if key.strip()]
 
-# JWT Configuration
-JWT_ISSUER = "SecureCloudPlatform"
-JWT_AUDIENCE = "SecureCloudClients"
-logger.info(f"JWT_ISSUER: {JWT_ISSUER}")
-logger.info(f"JWT_AUDIENCE: {JWT_AUDIENCE}")
 
-def get_cipher():
-    """Initialize and return Fernet cipher instance."""
-    key = os.getenv("FERNET_KEY")
-    if not key:
+def get_usable_cpus() -> int:
+    """Return the number of cores this process may run on (respects CPU affinity)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def get_master_keys() -> List[str]:
+    """
+    Return the envelope master key ring from MASTER_KEYS, newest key first.
+
+    The master key only wraps data keys. When MASTER_KEYS is not set, the
+    Fernet key ring is used as the master key.
+    """
+    raw = os.getenv("MASTER_KEYS") or ""
+    return [key.strip() for key in raw.split(",") if key.strip()] or get_fernet_keys()
+
+
+def parse_route_limits(raw: str) -> Tuple[Tuple[str, int], ...]:
+    """
+    Parse ROUTE_CONCURRENCY ("route=limit,route=limit") into ((route, limit), ...).
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    limits = []
+    for entry in raw.split(","):
+        if not entry.strip():
+            continue
+        route, sep, limit = entry.partition("=")
+        if not sep or not route.strip():
+            raise ValueError(f"Invalid route limit '{entry.strip()}', expected ROUTE=LIMIT")
+        limits.append((route.strip(), int(limit)))
+    return tuple(limits)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Immutable snapshot of the service configuration."""
+
+    fernet_keys: Tuple[str, ...]
+    jwt_secret: Optional[str]
+    jwt_issuer: str = JWT_ISSUER
+    jwt_audience: str = JWT_AUDIENCE
+    jwt_cache_size: int = 1024
+    jwt_cache_ttl: float = 300
+    batch_max_items: int = 10000
+    # Where payloads above the threshold are processed:
+    # "inline" (on the event loop), "thread" (bounded thread pool) or "process".
+    crypto_executor: str = "thread"
+    crypto_executor_workers: int = field(default_factory=get_usable_cpus)
+    crypto_offload_threshold: int = 65536
+    crypto_executor_max_queue: int = 64
+    # Cipher engine for new ciphertexts: "fernet", "aes-gcm" or "chacha20-poly1305"
+    crypto_engine: str = "fernet"
+    # Compression before encryption: "off", "zlib" or "zstd"
+    compression: str = "off"
+    compression_min_size: int = 1024
+    compression_level: int = 6
+    max_decompressed_size: int = 64 * 1024 * 1024
+    stream_chunk_size: int = 65536
+    ndjson_batch_size: int = 256
+    ndjson_max_line_size: int = 1024 * 1024
+    ndjson_max_in_flight: int = 4
+    field_schema_cache_size: int = 256
+    blind_index_key: Optional[str] = None
+    health_check_interval: float = 30
+    master_keys: Tuple[str, ...] = ()
+    envelope_key_store: str = "envelope_keys.db"
+    envelope_cache_size: int = 1024
+    envelope_cache_ttl: float = 300
+    # Admission control (app.limits); 0 disables a limit
+    max_body_size: int = 10 * 1024 * 1024
+    max_stream_body_size: int = 0
+    max_concurrent_requests: int = 0
+    route_concurrency: Tuple[Tuple[str, int], ...] = ()
+    rate_limit: float = 0
+    rate_limit_burst: int = 0
+    # WebSocket channel (app.channel)
+    ws_max_in_flight: int = 64
+    ws_max_message_size: int = 1024 * 1024
+    ws_auth_check_interval: float = 30
+    # Multi-process server (app.server): worker processes, and requests
+    # after which a worker is gracefully replaced (0: never)
+    web_concurrency: int = field(default_factory=get_usable_cpus)
+    worker_max_requests: int = 0
+    worker_max_requests_jitter: int = 0
+    # Admin-only /debug profiling endpoints (app.profiling)
+    profiling_enabled: bool = False
+    profiling_max_seconds: float = 60
+    # Span export (app.tracing): "none", "file", "memory" or "module:factory"
+    trace_exporter: str = "none"
+    trace_file: str = "traces.jsonl"
+    trace_sample_rate: float = 0.01
+    # Fraction of successful requests logged by the request middleware
+    log_sample_rate: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from the process environment (and .env, if present)."""
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        return cls(
+            fernet_keys=tuple(get_fernet_keys()),
+            jwt_secret=os.getenv("JWT_SECRET") or None,
+            jwt_cache_size=int(os.getenv("JWT_CACHE_SIZE", "1024")),
+            jwt_cache_ttl=float(os.getenv("JWT_CACHE_TTL", "300")),
+            batch_max_items=int(os.getenv("BATCH_MAX_ITEMS", "10000")),
+            crypto_executor=os.getenv("CRYPTO_EXECUTOR", "thread").lower(),
+            crypto_executor_workers=int(os.getenv("CRYPTO_EXECUTOR_WORKERS") or get_usable_cpus()),
+            crypto_offload_threshold=int(os.getenv("CRYPTO_OFFLOAD_THRESHOLD", "65536")),
+            crypto_executor_max_queue=int(os.getenv("CRYPTO_EXECUTOR_MAX_QUEUE", "64")),
+            crypto_engine=os.getenv("CRYPTO_ENGINE", "fernet").lower(),
+            compression=os.getenv("COMPRESSION", "off").lower(),
+            compression_min_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+            compression_level=int(os.getenv("COMPRESSION_LEVEL", "6")),
+            max_decompressed_size=int(os.getenv("MAX_DECOMPRESSED_SIZE", str(64 * 1024 * 1024))),
+            stream_chunk_size=int(os.getenv("STREAM_CHUNK_SIZE", "65536")),
+            ndjson_batch_size=int(os.getenv("NDJSON_BATCH_SIZE", "256")),
+            ndjson_max_line_size=int(os.getenv("NDJSON_MAX_LINE_SIZE", str(1024 * 1024))),
+            ndjson_max_in_flight=int(os.getenv("NDJSON_MAX_IN_FLIGHT", "4")),
+            field_schema_cache_size=int(os.getenv("FIELD_SCHEMA_CACHE_SIZE", "256")),
+            blind_index_key=os.getenv("BLIND_INDEX_KEY") or None,
+            health_check_interval=float(os.getenv("HEALTH_CHECK_INTERVAL", "30")),
+            master_keys=tuple(get_master_keys()),
+            envelope_key_store=os.getenv("ENVELOPE_KEY_STORE", "envelope_keys.db"),
+            envelope_cache_size=int(os.getenv("ENVELOPE_CACHE_SIZE", "1024")),
+            envelope_cache_ttl=float(os.getenv("ENVELOPE_CACHE_TTL", "300")),
+            max_body_size=int(os.getenv("MAX_BODY_SIZE", str(10 * 1024 * 1024))),
+            max_stream_body_size=int(os.getenv("MAX_STREAM_BODY_SIZE", "0")),
+            max_concurrent_requests=int(os.getenv("MAX_CONCURRENT_REQUESTS", "0")),
+            route_concurrency=parse_route_limits(os.getenv("ROUTE_CONCURRENCY", "")),
+            rate_limit=float(os.getenv("RATE_LIMIT", "0")),
+            rate_limit_burst=int(os.getenv("RATE_LIMIT_BURST", "0")),
+            ws_max_in_flight=int(os.getenv("WS_MAX_IN_FLIGHT", "64")),
+            ws_max_message_size=int(os.getenv("WS_MAX_MESSAGE_SIZE", str(1024 * 1024))),
+            ws_auth_check_interval=float(os.getenv("WS_AUTH_CHECK_INTERVAL", "30")),
+            web_concurrency=int(os.getenv("WEB_CONCURRENCY") or get_usable_cpus()),
+            worker_max_requests=int(os.getenv("WORKER_MAX_REQUESTS", "0")),
+            worker_max_requests_jitter=int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "0")),
+            profiling_enabled=os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes"),
+            profiling_max_seconds=float(os.getenv("PROFILING_MAX_SECONDS", "60")),
+            trace_exporter=os.getenv("TRACE_EXPORTER", "none"),
+            trace_file=os.getenv("TRACE_FILE", "traces.jsonl"),
+            trace_sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+            log_sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+        )
+
+    def missing_secrets(self) -> List[str]:
+        """Names of required secrets that are not configured."""
+        missing = []
+        if not self.fernet_keys:
+            missing.append("FERNET_KEY")
+        if not self.jwt_secret:
+            missing.append("JWT_SECRET")
+        return missing
+
+    def ephemeral_key_store(self) -> bool:
+        """
+        True if the envelope key store path is relative, i.e. resolved
+        against the working directory. In a container that is the writable
+        layer, which is lost on redeploy along with every data key.
+        """
+        store = self.envelope_key_store
+        return store != ":memory:" and not os.path.isabs(store)
+
+    def summary(self) -> dict:
+        """Loggable view of the settings; secrets are reported only as present/absent."""
+        return {
+            "fernet_keys": len(self.fernet_keys),
+            "jwt_secret": self.jwt_secret is not None,
+            "jwt_issuer": self.jwt_issuer,
+            "jwt_audience": self.jwt_audience,
+            "jwt_cache_size": self.jwt_cache_size,
+            "jwt_cache_ttl": self.jwt_cache_ttl,
+            "batch_max_items": self.batch_max_items,
+            "crypto_executor": self.crypto_executor,
+            "crypto_executor_workers": self.crypto_executor_workers,
+            "crypto_offload_threshold": self.crypto_offload_threshold,
+            "crypto_executor_max_queue": self.crypto_executor_max_queue,
+            "crypto_engine": self.crypto_engine,
+            "compression": self.compression,
+            "compression_min_size": self.compression_min_size,
+            "compression_level": self.compression_level,
+            "max_decompressed_size": self.max_decompressed_size,
+            "stream_chunk_size": self.stream_chunk_size,
+            "ndjson_batch_size": self.ndjson_batch_size,
+            "ndjson_max_line_size": self.ndjson_max_line_size,
+            "ndjson_max_in_flight": self.ndjson_max_in_flight,
+            "field_schema_cache_size": self.field_schema_cache_size,
+            "blind_index_key": self.blind_index_key is not None,
+            "health_check_interval": self.health_check_interval,
+            "master_keys": len(self.master_keys),
+            "envelope_key_store": self.envelope_key_store,
+            "envelope_cache_size": self.envelope_cache_size,
+            "envelope_cache_ttl": self.envelope_cache_ttl,
+            "max_body_size": self.max_body_size,
+            "max_stream_body_size": self.max_stream_body_size,
+            "max_concurrent_requests": self.max_concurrent_requests,
+            "route_concurrency": dict(self.route_concurrency),
+            "rate_limit": self.rate_limit,
+            "rate_limit_burst": self.rate_limit_burst,
+            "ws_max_in_flight": self.ws_max_in_flight,
+            "ws_max_message_size": self.ws_max_message_size,
+            "ws_auth_check_interval": self.ws_auth_check_interval,
+            "web_concurrency": self.web_concurrency,
+            "worker_max_requests": self.worker_max_requests,
+            "worker_max_requests_jitter": self.worker_max_requests_jitter,
+            "profiling_enabled": self.profiling_enabled,
+            "profiling_max_seconds": self.profiling_max_seconds,
+            "trace_exporter": self.trace_exporter,
+            "trace_file": self.trace_file,
+            "trace_sample_rate": self.trace_sample_rate,
+            "log_sample_rate": self.log_sample_rate,
+        }
+
+
+def load_settings() -> Settings:
+    """
+    (Re)load settings from the environment and drop the cached cipher.
+
+    Called once by the application lifespan. Missing secrets are logged
+    but not fatal: crypto endpoints answer 503 until they are configured.
+    """
+    global _settings, _cipher
+    settings = Settings.from_env()
+    with _lock:
+        _settings = settings
+        _cipher = None
+
+    missing = settings.missing_secrets()
+    if missing:
+        logger.critical(f"Configuration error: Required secrets are missing: {', '.join(missing)}")
+    if settings.ephemeral_key_store():
+        logger.critical(
+            f"ENVELOPE_KEY_STORE={settings.envelope_key_store} is a relative path. The data keys it holds "
+            "are lost if this directory is not persistent, and every envelope ciphertext with them. "
+            "Set ENVELOPE_KEY_STORE to an absolute path on a persistent volume."
+        )
+    logger.info("Settings loaded", extra={"settings": settings.summary()})
+    return settings
+
+
+def set_settings(settings: Settings) -> None:
+    """
+    Use settings in place of the environment and drop the cached cipher.
+
+    Used by tools that configure the crypto code themselves, such as the
+    worker processes of app.rotate_cli.
+    """
+    global _settings, _cipher
+    with _lock:
+        _settings = settings
+        _cipher = None
+
+
+def preload_settings() -> Settings:
+    """
+    Load settings and build the cipher ahead of the application.
+
+    Used by app.server so that forked workers inherit both instead of
+    building them once per worker; the lifespan then skips its reload.
+    """
+    global _preloaded
+    settings = load_settings()
+    try:
+        get_cipher()
+    except RuntimeError:
+        pass  # Already logged; crypto endpoints answer 503
+    _preloaded = True
+    return settings
+
+
+def settings_preloaded() -> bool:
+    """Return True if preload_settings() ran in this process or its parent."""
+    return _preloaded
+
+
+def get_settings() -> Settings:
+    """Return the loaded settings, loading them on first use."""
+    settings = _settings
+    if settings is None:
+        settings = load_settings()
+    return settings
+
+
+def get_cipher() -> MultiFernet:
+    """
+    Return the shared MultiFernet cipher over the key ring, building it on first use.
+
+    Raises:
+        RuntimeError: If no key is configured or a key is invalid
+    """
+    global _cipher
+    if _cipher is not None:
+        return _cipher
+
+    keys = get_settings().fernet_keys
+    if not keys:
         logger.error("FERNET_KEY environment variable is not set")
         raise RuntimeError("FERNET_KEY environment variable is not set. "
                          "Please set it in your .env file or environment variables.")
-    
-    # Validate the key
+
+    # Validate the keys
     try:
-        cipher_instance = Fernet(key.encode())
-        logger.info("Cipher initialized successfully")
-        return cipher_instance
+        cipher_instance = MultiFernet([Fernet(key.encode()) for key in keys])
     except ValueError as e:
         logger.error(f"Invalid FERNET_KEY format: {e}")
         raise RuntimeError(f"Invalid FERNET_KEY: {e}. "
@@ -59,39 +356,8 @@ def get_cipher():
         logger.error(f"Failed to initialize cipher: {e}")
         raise RuntimeError(f"Failed to initialize cipher: {e}")
 
-def validate_secrets():
-    """Validate that all required secrets are present."""
-    fernet_key = os.getenv("FERNET_KEY")
-    jwt_secret = os.getenv("JWT_SECRET")
-    
-    missing_secrets = []
-    if not fernet_key:
-        missing_secrets.append("FERNET_KEY")
-    if not jwt_secret:
-        missing_secrets.append("JWT_SECRET")
-    
-    if missing_secrets:
-        error_msg = f"Required secrets are missing: {', '.join(missing_secrets)}"
-        logger.error(error_msg)
-        raise RuntimeError(error_msg)
-    
-    logger.info("All required secrets are present")
-    return True
-
-# Validate secrets and create cipher instance
-try:
-    logger.info("Validating required secrets...")
-    validate_secrets()
-    
-    logger.info("Attempting to create cipher instance...")
-    cipher = get_cipher()
-    logger.info("SUCCESS: Cipher instance created")
-    
-    # Export JWT_SECRET for use in other modules
-    JWT_SECRET = os.getenv("JWT_SECRET")
-    logger.info("JWT_SECRET exported for use")
-    
-except RuntimeError as e:
-    logger.critical(f"Configuration error: {e}")
-    cipher = None
-    JWT_SECRET = None
\ No newline at end of file
+    with _lock:
+        if _cipher is None:
+            _cipher = cipher_instance
+            logger.info(f"Cipher initialized successfully with {len(keys)} key(s)")
+        return _cipher
@@ -1,52 +1,163 @@
 # crypto.py
+import base64
+import binascii
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union
 from cryptography.fernet import InvalidToken
 from fastapi import HTTPException
-from .config import cipher
+from . import config
+from .compression import compress, decompress
+from .engines import (
+    ENGINES,
+    TEXT_PREFIX,
+    CipherEngine,
+    FernetEngine,
+    is_sealed,
+    read_header,
+    seal,
+    unseal
+)
 from .logger import setup_logger
 
 # Setup logger for this module
 logger = setup_logger(__name__)
 
-logger.info("Crypto module initialized")
-logger.debug(f"Cipher instance available: {cipher is not None}")
+# The shared cipher comes from app.config on first use. Assigning this
+# attribute overrides it (None means "not configured").
+_UNRESOLVED = object()
+cipher = _UNRESOLVED
 
 
-def encrypt_data(data: str) -> str:
+def _get_cipher():
+    """Return the cipher to use, or None if it is not configured."""
+    if cipher is not _UNRESOLVED:
+        return cipher
+    try:
+        return config.get_cipher()
+    except RuntimeError:
+        return None
+
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+def _as_bytes(data: BytesLike) -> bytes:
+    """Return data as bytes, copying only when it is not bytes already."""
+    return data if isinstance(data, bytes) else bytes(data)
+
+
+@lru_cache(maxsize=8)
+def _aead_engine(name: str, keys: Tuple[str, ...]) -> CipherEngine:
+    return ENGINES[name](keys)
+
+
+def get_engine(name: str, cipher) -> CipherEngine:
     """
-    Encrypt plaintext data using Fernet symmetric encryption.
-    
+    Return the cipher engine called name, keyed from the service key ring.
+
+    Raises:
+        HTTPException: If no engine has that name
+    """
+    if name == FernetEngine.name:
+        return FernetEngine(cipher)
+    if name not in ENGINES:
+        logger.error(f"Unknown cipher engine '{name}' - check CRYPTO_ENGINE")
+        raise HTTPException(
+            status_code=503,
+            detail="Encryption service not properly configured"
+        )
+    return _aead_engine(name, config.get_settings().fernet_keys)
+
+
+def _seal(cipher, data: bytes) -> bytes:
+    """
+    Compress (if enabled) and encrypt with the configured engine.
+
+    The fernet engine emits plain Fernet tokens unless the data was
+    compressed, which has to be recorded in a header.
+    """
+    settings = config.get_settings()
+    data, flags = compress(
+        data, settings.compression, settings.compression_min_size, settings.compression_level
+    )
+    if settings.crypto_engine == FernetEngine.name and not flags:
+        return cipher.encrypt(data)
+    return seal(get_engine(settings.crypto_engine, cipher), data, flags)
+
+
+def _open(cipher, token: bytes) -> bytes:
+    """Decrypt a plain Fernet token or a sealed value, decompressing as flagged."""
+    if not is_sealed(token):
+        return cipher.decrypt(token)
+    try:
+        engine_name, flags = read_header(token)
+    except ValueError:
+        raise InvalidToken
+    data = unseal(get_engine(engine_name, cipher), token)
+    return decompress(data, flags, config.get_settings().max_decompressed_size)
+
+
+def _to_text(ciphertext: bytes) -> str:
+    """Text form of a ciphertext: Fernet tokens as-is, sealed values as URL-safe base64."""
+    if is_sealed(ciphertext):
+        return base64.urlsafe_b64encode(ciphertext).decode()
+    return ciphertext.decode()
+
+
+def _from_text(token: str) -> bytes:
+    """Inverse of _to_text."""
+    if token.startswith(TEXT_PREFIX):
+        try:
+            return base64.urlsafe_b64decode(token.encode())
+        except (binascii.Error, ValueError):
+            pass
+    return token.encode()
+
+
+def encrypt_bytes(data: BytesLike) -> bytes:
+    """
+    Encrypt raw bytes with the configured cipher engine (CRYPTO_ENGINE).
+
+    This is the bytes-native core of encrypt_data: no str encode/decode
+    round trip, so callers that already hold bytes avoid extra copies.
+
     Args:
-        data: The plaintext string to encrypt
-        
+        data: The plaintext bytes (bytes, bytearray or memoryview)
+
     Returns:
-        Base64-encoded ciphertext as a string
-        
+        A Fernet token as ASCII bytes with the fernet engine; otherwise the
+        binary sealed value (header and engine payload)
+
     Raises:
         HTTPException: If encryption fails or cipher is not configured
     """
-    logger.debug(f"encrypt_data called with data length: {len(data)}")
-    
+    logger.debug(f"encrypt_bytes called with data length: {len(data)}")
+
     # Validate input
-    if not data:
+    if not len(data):
         logger.warning("Encryption attempted with empty data")
         raise HTTPException(
             status_code=400,
             detail="Data to encrypt cannot be empty"
         )
-    
+
     # Check if cipher is configured
+
+    cipher = _get_cipher()
+
     if cipher is None:
         logger.error("Cipher not configured - encryption cannot proceed")
         raise HTTPException(
             status_code=503,
             detail="Encryption service not properly configured"
         )
-    
+
     try:
-        encrypted = cipher.encrypt(data.encode())
-        result = encrypted.decode()
-        logger.info(f"Successfully encrypted data (result length: {len(result)})")
+        result = _seal(cipher, _as_bytes(data))
+        logger.debug(f"Successfully encrypted data (result length: {len(result)})")
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Encryption failed: {type(e).__name__}: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -55,41 +166,46 @@ def encrypt_data(data: str) -> str:
         )
 
 
-def decrypt_data(token: str) -> str:
+def decrypt_bytes(token: BytesLike) -> bytes:
     """
-    Decrypt ciphertext using Fernet symmetric encryption.
-    
+    Decrypt a Fernet token or sealed value given as bytes.
+
+    This is the bytes-native core of decrypt_data. The engine is taken
+    from the ciphertext header, so values from any engine are accepted.
+
     Args:
-        token: The base64-encoded ciphertext to decrypt
-        
+        token: The ciphertext (bytes, bytearray or memoryview)
+
     Returns:
-        Decrypted plaintext as a string
-        
+        The decrypted plaintext bytes
+
     Raises:
         HTTPException: If decryption fails or cipher is not configured
     """
-    logger.debug(f"decrypt_data called with token length: {len(token)}")
-    
+    logger.debug(f"decrypt_bytes called with token length: {len(token)}")
+
     # Validate input
-    if not token:
+    if not len(token):
         logger.warning("Decryption attempted with empty token")
         raise HTTPException(
             status_code=400,
             detail="Token to decrypt cannot be empty"
         )
-    
+
     # Check if cipher is configured
+
+    cipher = _get_cipher()
+
     if cipher is None:
         logger.error("Cipher not configured - decryption cannot proceed")
         raise HTTPException(
             status_code=503,
             detail="Decryption service not properly configured"
         )
-    
+
     try:
-        decrypted = cipher.decrypt(token.encode())
-        result = decrypted.decode()
-        logger.info(f"Successfully decrypted data (result length: {len(result)})")
+        result = _open(cipher, _as_bytes(token))
+        logger.debug(f"Successfully decrypted data (result length: {len(result)})")
         return result
     except InvalidToken:
         logger.warning("Decryption failed due to invalid or tampered token")
@@ -97,9 +213,228 @@ def decrypt_data(token: str) -> str:
             status_code=400,
             detail="Invalid or tampered ciphertext"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Decryption failed: {type(e).__name__}: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Decryption failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def encrypt_data(data: str) -> str:
+    """
+    Encrypt plaintext data with the configured cipher engine.
+    
+    Args:
+        data: The plaintext string to encrypt
+        
+    Returns:
+        Base64-encoded ciphertext as a string
+        
+    Raises:
+        HTTPException: If encryption fails or cipher is not configured
+    """
+    return _to_text(encrypt_bytes(data.encode()))
+
+
+def decrypt_data(token: str) -> str:
+    """
+    Decrypt ciphertext produced by any cipher engine.
+    
+    Args:
+        token: The base64-encoded ciphertext to decrypt
+        
+    Returns:
+        Decrypted plaintext as a string
+        
+    Raises:
+        HTTPException: If decryption fails or cipher is not configured
+    """
+    plaintext = decrypt_bytes(_from_text(token))
+    try:
+        return plaintext.decode()
+    except UnicodeDecodeError as e:
+        # Binary plaintexts (e.g. from /encrypt/raw) cannot be returned as str
+        logger.warning(f"Decrypted data is not valid UTF-8: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail="Decrypted data is not valid UTF-8 text; use /decrypt/raw for binary data"
+        )
+
+
+def encrypt_batch(items: List[str]) -> List[Tuple[Optional[str], Optional[Tuple[int, str]]]]:
+    """
+    Encrypt many plaintexts in a single call.
+
+    Applies the same rules as encrypt_data to every item, but logs once per
+    batch instead of once per item and never lets one bad item fail the
+    others.
+
+    Args:
+        items: The plaintext strings to encrypt
+
+    Returns:
+        One (ciphertext, error) pair per input item, in input order. Exactly
+        one of the two is set; error is a (status_code, detail) tuple.
+
+    Raises:
+        HTTPException: If the cipher is not configured
+    """
+    logger.debug(f"encrypt_batch called with {len(items)} items")
+
+    cipher = _get_cipher()
+    if cipher is None:
+        logger.error("Cipher not configured - batch encryption cannot proceed")
+        raise HTTPException(
+            status_code=503,
+            detail="Encryption service not properly configured"
+        )
+
+    results = []
+    failed = 0
+    for data in items:
+        if not data:
+            results.append((None, (400, "Data to encrypt cannot be empty")))
+            failed += 1
+            continue
+        try:
+            results.append((_to_text(_seal(cipher, data.encode())), None))
+        except HTTPException as e:
+            results.append((None, (e.status_code, e.detail)))
+            failed += 1
+        except Exception as e:
+            results.append((None, (500, f"Encryption failed: {str(e)}")))
+            failed += 1
+
+    if failed:
+        logger.warning(f"Batch encryption finished with {failed}/{len(items)} failed items")
+    else:
+        logger.debug(f"Successfully encrypted batch of {len(items)} items")
+    return results
+
+
+def decrypt_batch(tokens: List[str]) -> List[Tuple[Optional[str], Optional[Tuple[int, str]]]]:
+    """
+    Decrypt many ciphertexts in a single call.
+
+    Applies the same rules as decrypt_data to every item, but logs once per
+    batch instead of once per item and never lets one bad item fail the
+    others.
+
+    Args:
+        tokens: The base64-encoded ciphertexts to decrypt
+
+    Returns:
+        One (plaintext, error) pair per input item, in input order. Exactly
+        one of the two is set; error is a (status_code, detail) tuple.
+
+    Raises:
+        HTTPException: If the cipher is not configured
+    """
+    logger.debug(f"decrypt_batch called with {len(tokens)} items")
+
+    cipher = _get_cipher()
+    if cipher is None:
+        logger.error("Cipher not configured - batch decryption cannot proceed")
+        raise HTTPException(
+            status_code=503,
+            detail="Decryption service not properly configured"
+        )
+
+    results = []
+    failed = 0
+    for token in tokens:
+        if not token:
+            results.append((None, (400, "Token to decrypt cannot be empty")))
+            failed += 1
+            continue
+        try:
+            results.append((_open(cipher, _from_text(token)).decode(), None))
+        except InvalidToken:
+            results.append((None, (400, "Invalid or tampered ciphertext")))
+            failed += 1
+        except UnicodeDecodeError:
+            results.append((None, (400, "Decrypted data is not valid UTF-8 text; use /decrypt/raw for binary data")))
+            failed += 1
+        except HTTPException as e:
+            results.append((None, (e.status_code, e.detail)))
+            failed += 1
+        except Exception as e:
+            results.append((None, (500, f"Decryption failed: {str(e)}")))
+            failed += 1
+
+    if failed:
+        logger.warning(f"Batch decryption finished with {failed}/{len(tokens)} failed items")
+    else:
+        logger.debug(f"Successfully decrypted batch of {len(tokens)} items")
+    return results
+
+
+def rotate_batch(tokens: List[str]) -> List[Tuple[Optional[str], Optional[Tuple[int, str]]]]:
+    """
+    Re-encrypt many ciphertexts under the newest key in the ring.
+
+    Tokens already under the newest key are re-encrypted too, so the
+    result is always safe to store in place of the input. Fernet tokens
+    keep their original timestamps; anything not produced by the
+    configured engine is re-encrypted with it.
+
+    Args:
+        tokens: The base64-encoded ciphertexts to rotate
+
+    Returns:
+        One (ciphertext, error) pair per input item, in input order. Exactly
+        one of the two is set; error is a (status_code, detail) tuple.
+
+    Raises:
+        HTTPException: If the cipher is not configured
+    """
+    logger.debug(f"rotate_batch called with {len(tokens)} items")
+
+    cipher = _get_cipher()
+    if cipher is None:
+        logger.error("Cipher not configured - rotation cannot proceed")
+        raise HTTPException(
+            status_code=503,
+            detail="Rotation service not properly configured"
+        )
+
+    rotate_fernet = getattr(cipher, "rotate", None)
+    if rotate_fernet is None:
+        # A single Fernet has no key ring; re-encrypting is the equivalent
+        def rotate_fernet(token: bytes) -> bytes:
+            return cipher.encrypt(cipher.decrypt(token))
+
+    keep_fernet = config.get_settings().crypto_engine == FernetEngine.name
+
+    def rotate(token: bytes) -> bytes:
+        if keep_fernet and not is_sealed(token):
+            return rotate_fernet(token)
+        return _seal(cipher, _open(cipher, token))
+
+    results = []
+    failed = 0
+    for token in tokens:
+        if not token:
+            results.append((None, (400, "Token to rotate cannot be empty")))
+            failed += 1
+            continue
+        try:
+            results.append((_to_text(rotate(_from_text(token))), None))
+        except InvalidToken:
+            results.append((None, (400, "Invalid or tampered ciphertext")))
+            failed += 1
+        except HTTPException as e:
+            results.append((None, (e.status_code, e.detail)))
+            failed += 1
+        except Exception as e:
+            results.append((None, (500, f"Rotation failed: {str(e)}")))
+            failed += 1
+
+    if failed:
+        logger.warning(f"Batch rotation finished with {failed}/{len(tokens)} failed items")
+    else:
+        logger.debug(f"Successfully rotated batch of {len(tokens)} items")
+    return results
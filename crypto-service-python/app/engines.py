@@ -0,0 +1,175 @@
+# engines.py
+"""
+Pluggable cipher engines.
+
+Every engine seals bytes under the service key ring. Output from
+seal() starts with a versioned header:
+
+    header  = magic "SCX" (3 bytes) || version (1 byte) || engine id (1 byte) || flags (1 byte)
+    sealed  = header || engine payload
+
+AEAD engines bind the header as associated data, so the engine id and
+flags cannot be altered without failing authentication. Engines:
+
+    id 0  fernet             AES-128-CBC + HMAC-SHA256; payload is the raw
+                             (base64-decoded) Fernet token
+    id 1  aes-gcm            AES-256-GCM; payload = 12-byte nonce || ciphertext || tag
+    id 2  chacha20-poly1305  ChaCha20-Poly1305; same layout as aes-gcm
+
+The AEAD keys are derived from each Fernet key with HKDF-SHA256 (a
+distinct info string per engine), so no extra secret has to be provisioned.
+Decryption tries every key in the ring, newest first.
+
+Plain Fernet tokens, which have no header, are still produced by the
+default fernet engine and are always accepted on decryption.
+"""
+import base64
+import os
+import struct
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"SCX"
+VERSION = 1
+NONCE_SIZE = 12
+
+_HEADER = struct.Struct(">3sBBB")
+HEADER_SIZE = _HEADER.size
+
+# Text form of MAGIC: 3 bytes encode to exactly 4 base64 characters, so
+# every sealed value in base64 starts with it. Fernet tokens start with "gAAAAA".
+TEXT_PREFIX = base64.urlsafe_b64encode(MAGIC).decode()
+
+
+class CipherEngine:
+    """Interface for a cipher engine; aad is the header of the sealed value."""
+
+    name = ""
+    engine_id = -1
+
+    def encrypt(self, data: bytes, aad: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decrypt(self, payload: bytes, aad: bytes) -> bytes:
+        """Raises InvalidToken when the payload fails authentication."""
+        raise NotImplementedError
+
+
+class FernetEngine(CipherEngine):
+    """
+    Fernet over the service cipher.
+
+    Fernet has no associated data, so the header is not authenticated; a
+    changed header fails later (unknown engine or flags that do not match
+    the payload).
+    """
+
+    name = "fernet"
+    engine_id = 0
+
+    def __init__(self, cipher):
+        self.cipher = cipher
+
+    def encrypt(self, data: bytes, aad: bytes) -> bytes:
+        return base64.urlsafe_b64decode(self.cipher.encrypt(data))
+
+    def decrypt(self, payload: bytes, aad: bytes) -> bytes:
+        return self.cipher.decrypt(base64.urlsafe_b64encode(payload))
+
+
+@lru_cache(maxsize=16)
+def derive_key(key: str, info: bytes) -> bytes:
+    """Derive a 256-bit engine key from a Fernet key."""
+    Fernet(key.encode())  # validates the key format
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(key.encode())
+
+
+class AEADEngine(CipherEngine):
+    """AEAD engine with a random 96-bit nonce per message."""
+
+    algorithm = None
+    info = b""
+
+    def __init__(self, keys: Sequence[str]):
+        if not keys:
+            raise ValueError("At least one key is required")
+        self._aeads = [self.algorithm(derive_key(key, self.info)) for key in keys]
+
+    def encrypt(self, data: bytes, aad: bytes) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aeads[0].encrypt(nonce, data, aad)
+
+    def decrypt(self, payload: bytes, aad: bytes) -> bytes:
+        nonce = payload[:NONCE_SIZE]
+        sealed = payload[NONCE_SIZE:]
+        if len(nonce) == NONCE_SIZE:
+            for aead in self._aeads:
+                try:
+                    return aead.decrypt(nonce, sealed, aad)
+                except InvalidTag:
+                    continue
+        raise InvalidToken
+
+
+class AESGCMEngine(AEADEngine):
+    name = "aes-gcm"
+    engine_id = 1
+    algorithm = AESGCM
+    info = b"crypto-service engine aes-gcm v1"
+
+
+class ChaCha20Poly1305Engine(AEADEngine):
+    name = "chacha20-poly1305"
+    engine_id = 2
+    algorithm = ChaCha20Poly1305
+    info = b"crypto-service engine chacha20-poly1305 v1"
+
+
+ENGINES: Dict[str, type] = {
+    engine.name: engine
+    for engine in (FernetEngine, AESGCMEngine, ChaCha20Poly1305Engine)
+}
+ENGINE_NAMES: Dict[int, str] = {engine.engine_id: name for name, engine in ENGINES.items()}
+
+
+def is_sealed(data: bytes) -> bool:
+    """True if data starts with an engine header (rather than being a plain Fernet token)."""
+    return data[:len(MAGIC)] == MAGIC
+
+
+def seal(engine: CipherEngine, data: bytes, flags: int = 0) -> bytes:
+    """Encrypt data with engine and prepend the versioned header."""
+    header = _HEADER.pack(MAGIC, VERSION, engine.engine_id, flags)
+    return header + engine.encrypt(data, header)
+
+
+def read_header(data: bytes) -> Tuple[str, int]:
+    """
+    Parse the header of a sealed value.
+
+    Returns:
+        (engine name, flags)
+
+    Raises:
+        ValueError: If the header is truncated, of an unknown version or
+            names an unknown engine
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Truncated ciphertext header")
+    magic, version, engine_id, flags = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported ciphertext version {version}")
+    name = ENGINE_NAMES.get(engine_id)
+    if name is None:
+        raise ValueError(f"Unknown cipher engine id {engine_id}")
+    return name, flags
+
+
+def unseal(engine: CipherEngine, data: bytes) -> bytes:
+    """Decrypt a sealed value whose header was checked with read_header."""
+    return engine.decrypt(data[HEADER_SIZE:], data[:HEADER_SIZE])
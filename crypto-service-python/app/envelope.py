@@ -0,0 +1,441 @@
+# envelope.py
+"""
+Envelope encryption with per-tenant data keys.
+
+A master key (MASTER_KEYS, or the Fernet key ring) wraps one Fernet data
+key per tenant or dataset. Wrapped data keys live in a small SQLite key
+store; unwrapped ones are kept in a bounded LRU cache with a TTL, so
+encrypting for a hot tenant only touches the master key when its data key
+is first loaded or its cache entry expires.
+
+Ciphertext format:
+
+    envelope = header || Fernet token (raw bytes, base64-decoded)
+    header   = magic "SCE2" (4 bytes) || key_id length (1 byte) || key_id (ASCII)
+
+The key id in the header selects the data key on decryption, and the
+caller must name the tenant that owns it. Fernet has no associated data,
+so the header is authenticated by sealing it together with the payload:
+the token encrypts header || plaintext, and decryption rejects a token
+whose sealed header differs from the one in front of it. Envelopes with
+the "SCE1" magic, written before the header was sealed, still decrypt.
+Over JSON the envelope is carried as URL-safe base64.
+
+Revoking a data key only marks it in the store and evicts it from the
+cache; the tenant gets a fresh data key on its next encryption. Rotating
+the master key re-wraps the stored data keys and never touches payloads.
+Other worker processes stop using a revoked key once their cache entry
+expires (ENVELOPE_CACHE_TTL).
+"""
+import base64
+import binascii
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from fastapi import HTTPException
+from .config import get_settings
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+MAGIC = b"SCE2"
+LEGACY_MAGIC = b"SCE1"
+MAX_KEY_ID_LENGTH = 255
+
+
+class DataKeyCache:
+    """
+    Bounded LRU cache with a per-entry TTL.
+
+    Used for unwrapped data keys (by key id) and for each tenant's active
+    key id, so the hot encryption path needs neither the key store nor the
+    master key.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """Cache value for ttl seconds, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, key: str):
+        """Drop key from the cache, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every cached entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+class KeyStore:
+    """
+    SQLite store of wrapped data keys.
+
+    A tenant's active key is its newest key that has not been revoked.
+    Older keys stay available for decryption until they are revoked.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS data_keys (
+            key_id TEXT PRIMARY KEY,
+            tenant TEXT NOT NULL,
+            wrapped BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            revoked_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS data_keys_tenant ON data_keys (tenant, created_at);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(self._SCHEMA)
+
+    def get(self, key_id: str) -> Optional[Tuple[str, bytes, bool]]:
+        """Return (tenant, wrapped key, revoked) for key_id, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tenant, wrapped, revoked_at FROM data_keys WHERE key_id = ?",
+                (key_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2] is not None
+
+    def active(self, tenant: str) -> Optional[Tuple[str, bytes]]:
+        """Return (key id, wrapped key) of the tenant's active key, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key_id, wrapped FROM data_keys "
+                "WHERE tenant = ? AND revoked_at IS NULL "
+                "ORDER BY created_at DESC, rowid DESC LIMIT 1",
+                (tenant,)
+            ).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    def add(self, key_id: str, tenant: str, wrapped: bytes):
+        """Store a new wrapped key; it becomes the tenant's active key."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO data_keys (key_id, tenant, wrapped, created_at) VALUES (?, ?, ?, ?)",
+                (key_id, tenant, wrapped, time.time())
+            )
+
+    def revoke(self, key_id: str) -> Optional[str]:
+        """Mark key_id revoked; returns its tenant, or None if it is unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tenant FROM data_keys WHERE key_id = ?", (key_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE data_keys SET revoked_at = COALESCE(revoked_at, ?) WHERE key_id = ?",
+                (time.time(), key_id)
+            )
+        return row[0]
+
+    def rewrap(self, rewrap_key) -> int:
+        """Replace every wrapped key with rewrap_key(wrapped) in one transaction."""
+        with self._lock:
+            rows = self._conn.execute("SELECT key_id, wrapped FROM data_keys").fetchall()
+            updated = [(rewrap_key(wrapped), key_id) for key_id, wrapped in rows]
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("UPDATE data_keys SET wrapped = ? WHERE key_id = ?", updated)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(updated)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _new_key_id() -> str:
+    return f"dk_{secrets.token_hex(8)}"
+
+
+def encode_envelope(data: bytes) -> str:
+    """Encode a binary envelope as URL-safe base64 text."""
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_envelope(text: str) -> bytes:
+    """
+    Decode URL-safe base64 envelope text.
+
+    Raises:
+        HTTPException: If the text is not valid base64
+    """
+    try:
+        return base64.urlsafe_b64decode(text.encode())
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid envelope encoding")
+
+
+def read_key_id(envelope: bytes) -> Tuple[str, int]:
+    """
+    Parse the envelope header.
+
+    Returns:
+        (key id, offset of the Fernet token)
+
+    Raises:
+        HTTPException: If the header is missing or malformed
+    """
+    offset = len(MAGIC) + 1
+    if len(envelope) < offset or envelope[:len(MAGIC)] not in (MAGIC, LEGACY_MAGIC):
+        raise HTTPException(status_code=400, detail="Invalid envelope header")
+    end = offset + envelope[len(MAGIC)]
+    if len(envelope) <= end:
+        raise HTTPException(status_code=400, detail="Invalid envelope header")
+    try:
+        return envelope[offset:end].decode("ascii"), end
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid envelope header")
+
+
+class EnvelopeService:
+    """Encrypts and decrypts under per-tenant data keys wrapped by a master key."""
+
+    def __init__(self, store: KeyStore, master: MultiFernet, cache_size: int = 1024, cache_ttl: float = 300):
+        self.store = store
+        self.master = master
+        self.data_keys = DataKeyCache(cache_size, cache_ttl)
+        self.active_keys = DataKeyCache(cache_size, cache_ttl)
+        self.master_unwraps = 0
+        self._create_lock = threading.Lock()
+
+    def _unwrap(self, wrapped: bytes) -> Fernet:
+        self.master_unwraps += 1
+        return Fernet(self.master.decrypt(wrapped))
+
+    def _data_key(self, key_id: str) -> Tuple[str, Fernet]:
+        """Return (tenant, data key) for key_id, loading it from the store on a miss."""
+        cached = self.data_keys.get(key_id)
+        if cached is not None:
+            return cached
+
+        record = self.store.get(key_id)
+        if record is None:
+            logger.warning(f"Envelope references unknown data key {key_id}")
+            raise HTTPException(status_code=400, detail="Unknown data key")
+        tenant, wrapped, revoked = record
+        if revoked:
+            logger.warning(f"Envelope references revoked data key {key_id}")
+            raise HTTPException(status_code=403, detail="Data key has been revoked")
+
+        entry = (tenant, self._unwrap(wrapped))
+        self.data_keys.put(key_id, entry)
+        return entry
+
+    def active_key(self, tenant: str) -> Tuple[str, Fernet]:
+        """Return (key id, data key) used to encrypt for tenant, creating one if needed."""
+        key_id = self.active_keys.get(tenant)
+        if key_id is not None:
+            cached = self.data_keys.get(key_id)
+            if cached is not None:
+                return key_id, cached[1]
+
+        with self._create_lock:
+            record = self.store.active(tenant)
+            if record is None:
+                return self._create_key(tenant)
+            key_id, wrapped = record
+            fernet = self._unwrap(wrapped)
+            self.data_keys.put(key_id, (tenant, fernet))
+            self.active_keys.put(tenant, key_id)
+            return key_id, fernet
+
+    def _create_key(self, tenant: str) -> Tuple[str, Fernet]:
+        raw_key = Fernet.generate_key()
+        key_id = _new_key_id()
+        self.store.add(key_id, tenant, self.master.encrypt(raw_key))
+        fernet = Fernet(raw_key)
+        self.data_keys.put(key_id, (tenant, fernet))
+        self.active_keys.put(tenant, key_id)
+        logger.info(f"Created data key {key_id} for tenant {tenant}")
+        return key_id, fernet
+
+    def encrypt(self, tenant: str, data: bytes) -> bytes:
+        """Encrypt data under the tenant's active data key and return the envelope."""
+        key_id, fernet = self.active_key(tenant)
+        key_id_bytes = key_id.encode("ascii")
+        header = MAGIC + bytes((len(key_id_bytes),)) + key_id_bytes
+        return header + base64.urlsafe_b64decode(fernet.encrypt(header + data))
+
+    def decrypt(self, tenant: str, envelope: bytes) -> Tuple[str, bytes]:
+        """
+        Decrypt an envelope for tenant.
+
+        Returns:
+            (key id, plaintext)
+
+        Raises:
+            HTTPException: 403 if the data key belongs to another tenant or
+                was revoked, 400 if the envelope is malformed, tampered with
+                or references an unknown data key
+        """
+        key_id, offset = read_key_id(envelope)
+        owner, fernet = self._data_key(key_id)
+        if owner != tenant:
+            logger.warning(f"Tenant {tenant} presented an envelope under data key {key_id} of tenant {owner}")
+            raise HTTPException(status_code=403, detail="Data key does not belong to this tenant")
+        try:
+            plaintext = fernet.decrypt(base64.urlsafe_b64encode(envelope[offset:]))
+        except InvalidToken:
+            logger.warning(f"Envelope under data key {key_id} failed authentication")
+            raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+        if envelope.startswith(LEGACY_MAGIC):
+            return key_id, plaintext
+        if plaintext[:offset] != envelope[:offset]:
+            logger.warning(f"Envelope header does not match the header sealed under data key {key_id}")
+            raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+        return key_id, plaintext[offset:]
+
+    def rotate_key(self, tenant: str) -> str:
+        """Give tenant a new active data key; older keys still decrypt."""
+        with self._create_lock:
+            key_id, _ = self._create_key(tenant)
+        return key_id
+
+    def revoke_key(self, key_id: str) -> str:
+        """
+        Revoke a data key: it is marked in the store and evicted from the cache.
+
+        Returns:
+            The tenant the key belonged to
+
+        Raises:
+            HTTPException: If the key id is unknown
+        """
+        tenant = self.store.revoke(key_id)
+        if tenant is None:
+            raise HTTPException(status_code=404, detail="Unknown data key")
+        self.data_keys.evict(key_id)
+        self.active_keys.evict(tenant)
+        logger.info(f"Revoked data key {key_id} of tenant {tenant}")
+        return tenant
+
+    def rewrap_keys(self) -> int:
+        """Re-wrap every stored data key under the newest master key."""
+        count = self.store.rewrap(self.master.rotate)
+        logger.info(f"Re-wrapped {count} data keys under the newest master key")
+        return count
+
+    def stats(self) -> dict:
+        """Return cache counters and the number of master key unwraps."""
+        return {
+            "data_keys": self.data_keys.stats(),
+            "active_keys": self.active_keys.stats(),
+            "master_unwraps": self.master_unwraps
+        }
+
+
+_lock = threading.Lock()
+_service: Optional[EnvelopeService] = None
+
+
+def get_envelope_service() -> EnvelopeService:
+    """
+    Return the shared envelope service, built from the settings on first use.
+
+    Raises:
+        HTTPException: 503 if no master key is configured or it is invalid
+    """
+    global _service
+    if _service is not None:
+        return _service
+
+    settings = get_settings()
+    if not settings.master_keys:
+        logger.error("Master key not configured - envelope encryption cannot proceed")
+        raise HTTPException(status_code=503, detail="Encryption service not properly configured")
+    try:
+        master = MultiFernet([Fernet(key.encode()) for key in settings.master_keys])
+    except ValueError as e:
+        logger.error(f"Invalid MASTER_KEYS format: {e}")
+        raise HTTPException(status_code=503, detail="Encryption service not properly configured")
+
+    with _lock:
+        if _service is None:
+            _service = EnvelopeService(
+                KeyStore(settings.envelope_key_store),
+                master,
+                cache_size=settings.envelope_cache_size,
+                cache_ttl=settings.envelope_cache_ttl
+            )
+            logger.info(f"Envelope key store opened at {settings.envelope_key_store}")
+        return _service
+
+
+def close_envelope_service():
+    """Close the shared key store, if it was opened."""
+    global _service
+    with _lock:
+        if _service is not None:
+            _service.store.close()
+            _service = None
+
+
+def envelope_encrypt(tenant: str, data: bytes) -> bytes:
+    """Encrypt data for tenant; runs through the crypto executor as a partial."""
+    if not len(data):
+        raise HTTPException(status_code=400, detail="Data to encrypt cannot be empty")
+    return get_envelope_service().encrypt(tenant, bytes(data))
+
+
+def envelope_decrypt(tenant: str, envelope: bytes) -> Tuple[str, bytes]:
+    """Decrypt an envelope for tenant; returns (key id, plaintext)."""
+    return get_envelope_service().decrypt(tenant, envelope)
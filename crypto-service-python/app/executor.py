@@ -0,0 +1,156 @@
+# executor.py
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from fastapi import HTTPException
+from .config import get_settings
+from .logger import setup_logger
+from .metrics import count_bytes, track_stage
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+def _call(func: Callable[[Any], Any], arg: Any):
+    """
+    Run func(arg) inside a pool worker.
+
+    HTTPException cannot be pickled, so errors are returned as plain
+    (status_code, detail) tuples and re-raised on the event loop side.
+    """
+    try:
+        return func(arg), None
+    except HTTPException as e:
+        return None, (e.status_code, e.detail)
+
+
+class CryptoExecutor:
+    """
+    Decides whether a crypto call runs inline or in a worker pool.
+
+    Payloads smaller than the threshold are cheap enough to run directly on
+    the event loop. Larger ones are handed to a bounded thread pool
+    (OpenSSL releases the GIL) or process pool. When more than max_queue
+    calls are already waiting for the pool, new ones are rejected with 503
+    instead of queueing behind them; a max_queue of 0 means no limit.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        max_workers: int = 1,
+        threshold: int = 65536,
+        max_queue: int = 64
+    ):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode '{mode}'. Expected one of: {', '.join(EXECUTOR_MODES)}")
+
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.threshold = threshold
+        self.max_queue = max_queue
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of offloaded calls currently queued or running."""
+        return self._pending
+
+    @property
+    def saturation(self) -> float:
+        """Queue depth as a fraction of max_queue."""
+        if self.max_queue <= 0:
+            return 0.0
+        return self._pending / self.max_queue
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                # Imported here so thread/inline deployments never load multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="crypto"
+                )
+            logger.info(f"Started {self.mode} pool with {self.max_workers} workers")
+        return self._pool
+
+    async def run(self, func: Callable[[Any], Any], arg: Any, size: int):
+        """
+        Run func(arg), offloading it when size reaches the threshold.
+
+        Args:
+            func: A module-level crypto function such as encrypt_data, or a
+                functools.partial of one
+            arg: The single argument passed to func
+            size: Payload size used to choose inline vs offloaded execution
+
+        Returns:
+            Whatever func returns
+
+        Raises:
+            HTTPException: 503 when max_queue calls are already pending, or any HTTPException
+                raised by func
+        """
+        count_bytes(getattr(func, "func", func).__name__, size)
+
+        if self.mode == "inline" or size < self.threshold:
+            with track_stage("crypto"):
+                return func(arg)
+
+        if 0 < self.max_queue <= self._pending:
+            logger.warning(f"Crypto executor saturated ({self._pending} pending) - rejecting request")
+            raise HTTPException(
+                status_code=503,
+                detail="Crypto service is busy, retry later",
+                headers={"Retry-After": "1"}
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if self.mode == "thread":
+                # run_in_executor does not carry contextvars over (unlike
+                # asyncio.to_thread), so copy them for logging and tracing.
+                # A Context cannot be pickled, so process workers go without.
+                call = (contextvars.copy_context().run, _call, func, arg)
+            else:
+                call = (_call, func, arg)
+            with track_stage("crypto"):
+                result, error = await loop.run_in_executor(self._get_pool(), *call)
+        finally:
+            self._pending -= 1
+
+        if error is not None:
+            raise HTTPException(status_code=error[0], detail=error[1])
+        return result
+
+    def shutdown(self):
+        """Stop the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info("Crypto executor pool shut down")
+
+
+_crypto_executor: Optional[CryptoExecutor] = None
+
+
+def get_crypto_executor() -> CryptoExecutor:
+    """Return the shared executor, configured from the settings on first use."""
+    global _crypto_executor
+    if _crypto_executor is None:
+        settings = get_settings()
+        _crypto_executor = CryptoExecutor(
+            mode=settings.crypto_executor,
+            max_workers=settings.crypto_executor_workers,
+            threshold=settings.crypto_offload_threshold,
+            max_queue=settings.crypto_executor_max_queue
+        )
+    return _crypto_executor
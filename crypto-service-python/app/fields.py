@@ -0,0 +1,224 @@
+# fields.py
+"""
+Field-level encryption of JSON documents.
+
+Field paths use dots for object keys and brackets for array elements:
+
+    user.email          key "email" inside object "user"
+    cards[0].number     first element of array "cards"
+    cards[*].number     every element of "cards"
+    contacts.*.phone    every value of object "contacts"
+
+A set of paths is compiled once into a prefix tree, so documents are
+walked a single time however many paths share a prefix. Compiled sets are
+cached: by schema_id when the client names its document shape (later
+calls may then omit the paths), and by the path list itself otherwise.
+
+Each selected value is replaced by the ciphertext of its JSON encoding, so
+numbers, booleans and nested values come back unchanged on decryption.
+Paths that do not exist in a document are skipped. All values of a call
+are encrypted through a single encrypt_batch/decrypt_batch call.
+"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from .config import get_settings
+from .crypto import decrypt_batch, encrypt_batch
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+# Tree markers; both survive pickling, which the process executor needs
+WILDCARD = Ellipsis
+LEAF = None
+
+_SEGMENT = re.compile(r"^([^.\[\]]*)((?:\[(?:\d+|\*)\])*)$")
+_INDEX = re.compile(r"\[(\d+|\*)\]")
+
+
+def parse_path(path: str) -> Tuple[Any, ...]:
+    """
+    Split a field path into steps: str keys, int indexes and WILDCARD.
+
+    Raises:
+        ValueError: If the path is malformed
+    """
+    steps = []
+    for segment in path.split("."):
+        match = _SEGMENT.match(segment)
+        if match is None or not (match.group(1) or match.group(2)):
+            raise ValueError(f"Invalid field path '{path}'")
+        name, indexes = match.groups()
+        if name:
+            steps.append(WILDCARD if name == "*" else name)
+        for index in _INDEX.findall(indexes):
+            steps.append(WILDCARD if index == "*" else int(index))
+    return tuple(steps)
+
+
+class FieldPaths:
+    """A compiled, immutable set of field paths."""
+
+    __slots__ = ("paths", "tree")
+
+    def __init__(self, paths: Sequence[str]):
+        if not paths:
+            raise ValueError("At least one field path is required")
+        self.paths = tuple(dict.fromkeys(paths))
+        self.tree: Dict[Any, Any] = {}
+        for path in self.paths:
+            node = self.tree
+            steps = parse_path(path)
+            for i, step in enumerate(steps):
+                last = i == len(steps) - 1
+                child = node.get(step, {})
+                if child is LEAF or (last and child):
+                    raise ValueError(f"Field path '{path}' overlaps another path")
+                if last:
+                    node[step] = LEAF
+                else:
+                    node = node.setdefault(step, child)
+
+    def __reduce__(self):
+        return FieldPaths, (self.paths,)
+
+    def targets(self, document: Any) -> List[Tuple[Any, Any]]:
+        """Return (container, key) for every value selected in document."""
+        found = []
+        self._walk(document, self.tree, found)
+        return found
+
+    def _walk(self, node: Any, tree: Dict[Any, Any], found: List[Tuple[Any, Any]]):
+        for step, subtree in tree.items():
+            if step is WILDCARD:
+                if isinstance(node, list):
+                    keys = range(len(node))
+                elif isinstance(node, dict):
+                    keys = list(node)
+                else:
+                    continue
+            elif isinstance(step, int):
+                if not isinstance(node, list) or step >= len(node):
+                    continue
+                keys = (step,)
+            else:
+                if not isinstance(node, dict) or step not in node:
+                    continue
+                keys = (step,)
+
+            for key in keys:
+                if subtree is LEAF:
+                    found.append((node, key))
+                else:
+                    self._walk(node[key], subtree, found)
+
+
+@lru_cache(maxsize=256)
+def _compile(paths: Tuple[str, ...]) -> FieldPaths:
+    return FieldPaths(paths)
+
+
+_schemas: "OrderedDict[str, FieldPaths]" = OrderedDict()
+_schemas_lock = threading.Lock()
+
+
+def get_field_paths(paths: Optional[Sequence[str]] = None, schema_id: Optional[str] = None) -> FieldPaths:
+    """
+    Return the compiled paths for a request.
+
+    With a schema_id, the compiled set is cached under it: later calls
+    with the same schema_id may omit paths, and calls that send different
+    paths replace the cached set.
+
+    Raises:
+        HTTPException: 400 if a path is invalid, or if neither paths nor a
+            known schema_id are given
+    """
+    if schema_id is not None:
+        with _schemas_lock:
+            compiled = _schemas.get(schema_id)
+            if compiled is not None and (not paths or tuple(dict.fromkeys(paths)) == compiled.paths):
+                _schemas.move_to_end(schema_id)
+                return compiled
+
+    if not paths:
+        raise HTTPException(
+            status_code=400,
+            detail="Field paths are required" if schema_id is None else f"Unknown schema_id '{schema_id}'"
+        )
+    try:
+        compiled = _compile(tuple(paths))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if schema_id is not None:
+        with _schemas_lock:
+            _schemas[schema_id] = compiled
+            _schemas.move_to_end(schema_id)
+            while len(_schemas) > get_settings().field_schema_cache_size:
+                _schemas.popitem(last=False)
+    return compiled
+
+
+def encrypt_documents(fields: FieldPaths, documents: List[Any]) -> List[Any]:
+    """
+    Encrypt the selected fields of every document in place.
+
+    Documents are only modified once every value has been encrypted.
+
+    Returns:
+        The same documents
+
+    Raises:
+        HTTPException: If encryption fails
+    """
+    targets = [target for document in documents for target in fields.targets(document)]
+    values = [json.dumps(container[key], separators=(",", ":")) for container, key in targets]
+    ciphertexts = []
+    for ciphertext, error in encrypt_batch(values):
+        if error is not None:
+            raise HTTPException(status_code=error[0], detail=error[1])
+        ciphertexts.append(ciphertext)
+
+    for (container, key), ciphertext in zip(targets, ciphertexts):
+        container[key] = ciphertext
+    return documents
+
+
+def decrypt_documents(fields: FieldPaths, documents: List[Any]) -> List[Any]:
+    """
+    Decrypt the selected fields of every document in place.
+
+    Documents are only modified once every value has been decrypted.
+
+    Returns:
+        The same documents
+
+    Raises:
+        HTTPException: 400 if a selected value is not a valid ciphertext
+    """
+    targets = [target for document in documents for target in fields.targets(document)]
+    values = []
+    for container, key in targets:
+        value = container[key]
+        if not isinstance(value, str):
+            raise HTTPException(status_code=400, detail=f"Field '{key}' is not a ciphertext")
+        values.append(value)
+
+    decoded = []
+    for (_, key), (plaintext, error) in zip(targets, decrypt_batch(values)):
+        if error is not None:
+            raise HTTPException(status_code=error[0], detail=f"Field '{key}': {error[1]}")
+        try:
+            decoded.append(json.loads(plaintext))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Field '{key}' did not decrypt to JSON")
+
+    for (container, key), value in zip(targets, decoded):
+        container[key] = value
+    return documents
@@ -0,0 +1,94 @@
+# health.py
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from .config import get_settings
+from .crypto import encrypt_data, decrypt_data
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+SELF_TEST_DATA = "health_check_test"
+
+
+class HealthMonitor:
+    """
+    Runs the crypto self-test on a background schedule and caches the result.
+
+    /health serves the cached snapshot instead of running encrypt/decrypt on
+    every probe. If no snapshot exists yet, or the background task has
+    stopped and the snapshot is older than max_age, it is refreshed inline.
+    """
+
+    def __init__(self, interval: Optional[float] = None, max_age: Optional[float] = None):
+        self._interval = interval
+        self._max_age = max_age
+        self._snapshot: Optional[dict] = None
+        self._checked_monotonic = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def interval(self) -> float:
+        """Seconds between self-tests (default: HEALTH_CHECK_INTERVAL)."""
+        if self._interval is None:
+            return get_settings().health_check_interval
+        return self._interval
+
+    @property
+    def max_age(self) -> float:
+        """Age after which a snapshot is refreshed inline (default: 3 intervals)."""
+        return self._max_age if self._max_age is not None else self.interval * 3
+
+    def run_self_test(self) -> dict:
+        """Run one encrypt/decrypt round trip and store the result."""
+        try:
+            decrypted = decrypt_data(encrypt_data(SELF_TEST_DATA))
+            if decrypted != SELF_TEST_DATA:
+                raise RuntimeError("Crypto self-test failed")
+            snapshot = {"healthy": True, "error": None}
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            if self._snapshot is None or self._snapshot["healthy"]:
+                logger.error(f"Crypto self-test failed: {detail}")
+            snapshot = {"healthy": False, "error": detail}
+
+        snapshot["checked_at"] = datetime.now(timezone.utc)
+        self._snapshot = snapshot
+        self._checked_monotonic = time.monotonic()
+        return snapshot
+
+    def snapshot(self) -> dict:
+        """Return the cached self-test result with its age in seconds."""
+        if self._snapshot is None or self.age() > self.max_age:
+            self.run_self_test()
+        return {**self._snapshot, "age_seconds": round(self.age(), 3)}
+
+    def age(self) -> float:
+        """Seconds since the last self-test."""
+        return time.monotonic() - self._checked_monotonic
+
+    async def _run(self):
+        while True:
+            self.run_self_test()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background self-test loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Health self-test scheduled every {self.interval}s")
+
+    async def stop(self):
+        """Cancel the background loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_monitor = HealthMonitor()
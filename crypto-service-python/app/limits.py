@@ -0,0 +1,242 @@
+# limits.py
+"""
+Admission control: request body size, per-route concurrency and a
+per-client request rate.
+
+Every limit rejects immediately instead of queueing, so one oversized or
+bursty client cannot stall the requests of everyone else:
+
+- Bodies larger than MAX_BODY_SIZE get 413. Streaming routes use
+  MAX_STREAM_BODY_SIZE instead, where 0 means unlimited. A Content-Length
+  over the limit is rejected before any of the body is read. Bodies
+  without one are counted as they arrive and rejected as soon as they
+  cross the limit.
+- A route that already has its limit of requests in progress answers 429
+  with Retry-After. Limits are set per route by ROUTE_CONCURRENCY, e.g.
+  "/encrypt/stream=4,/encrypt/batch=16", and otherwise by
+  MAX_CONCURRENT_REQUESTS (0: unlimited).
+- Each JWT subject has a token bucket refilled at RATE_LIMIT requests per
+  second, holding at most RATE_LIMIT_BURST. A request that finds the
+  bucket empty gets 429 with Retry-After set to when the next token is
+  due.
+
+All limits are per worker process.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import get_settings
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+
+class ConcurrencyLimiter:
+    """
+    Counts requests in progress per route and refuses those over the route's limit.
+
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, default_limit: int = 0, route_limits: Optional[Dict[str, int]] = None):
+        self.default_limit = default_limit
+        self.route_limits = dict(route_limits or {})
+        self._active: Dict[str, int] = {}
+
+    def limit(self, route: str) -> int:
+        """Return the limit for route (0: unlimited)."""
+        return self.route_limits.get(route, self.default_limit)
+
+    def try_acquire(self, route: str) -> bool:
+        """Take a slot for route, or return False if the route is at its limit."""
+        active = self._active.get(route, 0)
+        limit = self.limit(route)
+        if 0 < limit <= active:
+            return False
+        self._active[route] = active + 1
+        return True
+
+    def release(self, route: str):
+        """Give back a slot taken by try_acquire."""
+        self._active[route] -= 1
+
+    def active(self, route: str) -> int:
+        """Number of requests in progress on route."""
+        return self._active.get(route, 0)
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per client key.
+
+    Buckets are refilled lazily from the time elapsed since their last use.
+    At most max_clients buckets are kept; the least recently used is
+    dropped first, which only ever gives its client a full bucket again.
+    """
+
+    def __init__(self, rate: float, burst: int = 0, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst if burst > 0 else max(1, math.ceil(rate))
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token from key's bucket.
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+_rate_limiter: Optional[TokenBucketLimiter] = None
+_concurrency_limiter: Optional[ConcurrencyLimiter] = None
+
+
+def get_rate_limiter() -> Optional[TokenBucketLimiter]:
+    """Return the shared per-subject limiter, or None when RATE_LIMIT is off."""
+    global _rate_limiter
+    settings = get_settings()
+    if settings.rate_limit <= 0:
+        return None
+    if _rate_limiter is None:
+        _rate_limiter = TokenBucketLimiter(settings.rate_limit, settings.rate_limit_burst)
+    return _rate_limiter
+
+
+def get_concurrency_limiter() -> ConcurrencyLimiter:
+    """Return the shared per-route concurrency limiter, built from the settings on first use."""
+    global _concurrency_limiter
+    if _concurrency_limiter is None:
+        settings = get_settings()
+        _concurrency_limiter = ConcurrencyLimiter(
+            settings.max_concurrent_requests,
+            dict(settings.route_concurrency)
+        )
+    return _concurrency_limiter
+
+
+def check_rate_limit(token: dict):
+    """
+    Charge one request to the token's subject.
+
+    Raises:
+        HTTPException: 429 with Retry-After when the subject's bucket is empty
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return
+    subject = str(token.get("sub", ""))
+    wait = limiter.acquire(subject)
+    if wait > 0:
+        logger.warning(f"Rate limit exceeded for subject {subject!r}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded, retry later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+def _content_length(scope: Scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _body_too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds {limit} bytes"
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware enforcing the body size and per-route concurrency limits.
+
+    Args:
+        app: The wrapped application
+        route_label: Maps a request scope to its route label, as used for metrics
+        stream_paths: Paths whose bodies are limited by MAX_STREAM_BODY_SIZE
+    """
+
+    def __init__(self, app: ASGIApp, route_label: Callable[[Scope], str], stream_paths: Collection[str] = ()):
+        self.app = app
+        self.route_label = route_label
+        self.stream_paths = frozenset(stream_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        path = scope["path"]
+        limit = settings.max_stream_body_size if path in self.stream_paths else settings.max_body_size
+        if limit > 0:
+            length = _content_length(scope)
+            if length is not None and length > limit:
+                await self._reject(scope, receive, send, _body_too_large(limit))
+                return
+            receive = self._limit_body(receive, limit)
+
+        route = self.route_label(scope)
+        limiter = get_concurrency_limiter()
+        if not limiter.try_acquire(route):
+            logger.warning(f"Concurrency limit of {limiter.limit(route)} reached on {route} - rejecting request")
+            await self._reject(scope, receive, send, HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent requests, retry later",
+                headers={"Retry-After": "1"}
+            ))
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(route)
+
+    @staticmethod
+    def _limit_body(receive: Receive, limit: int) -> Receive:
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the app, which turns it into the 413 response
+                    raise _body_too_large(limit)
+            return message
+
+        return limited_receive
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, error: HTTPException):
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+        await response(scope, receive, send)
@@ -1,41 +1,183 @@
 # logger.py
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import threading
+from datetime import datetime, timezone
 
-def setup_logger(name: str, level=logging.DEBUG):
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+_queue_handler = None
+_listener = None
+_shut_down = False
+_lock = threading.Lock()
+
+# Fields added to every record logged in the current context (e.g. the
+# request id set by app.tracing)
+log_context: contextvars.ContextVar[dict] = contextvars.ContextVar("log_context", default={})
+
+
+def get_log_level() -> int:
+    """Return the level named by LOG_LEVEL (default: INFO)."""
+    name = os.getenv("LOG_LEVEL", "INFO").upper()
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else logging.INFO
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller.
+
+    When the listener falls behind and the queue is full, records are
+    dropped and counted rather than stalling request handling.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs on the thread that logged, where the request's context is visible
+        record = super().prepare(record)
+        fields = log_context.get()
+        if fields:
+            record.__dict__.update(fields)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if _listener is None:
+            _ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter(
+            fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(
+        _queue, _build_output_handler(), respect_handler_level=False
+    )
+    _listener.start()
+
+
+def _ensure_listener():
+    # Started on the first record rather than at import, so importing the
+    # app (tests, CLIs, forked workers) does not spawn a thread up front
+    with _lock:
+        if _listener is None and not _shut_down:
+            _start_listener()
+
+
+def _restart_listener_in_child():
+    # The listener thread does not survive fork; the child starts its own on demand
+    global _queue, _listener
+    if _queue_handler is None:
+        return
+    _queue = queue.Queue(_queue.maxsize)
+    _queue_handler.queue = _queue
+    _listener = None
+
+
+def _get_queue_handler() -> DroppingQueueHandler:
+    global _queue_handler
+    with _lock:
+        if _queue_handler is None:
+            _queue_handler = DroppingQueueHandler(_queue)
+            atexit.register(shutdown_logging)
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=_restart_listener_in_child)
+        return _queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer thread."""
+    global _listener, _shut_down
+    _shut_down = True
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_log_records() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def should_sample(rate: float) -> bool:
     """
-    Setup a logger with console output.
-    
+    Decide whether a sampled log line (e.g. per-request logging) is emitted.
+
+    Args:
+        rate: Fraction of lines to keep, e.g. Settings.log_sample_rate
+    """
+    return rate >= 1.0 or random.random() < rate
+
+
+def setup_logger(name: str, level=None):
+    """
+    Setup a logger that writes through the shared non-blocking queue.
+
+    Records are put on an in-memory queue on the calling thread; a single
+    background listener thread formats them (JSON by default, or text with
+    LOG_FORMAT=text) and writes them to stdout.
+
     Args:
         name: Logger name (typically __name__)
-        level: Logging level (default: DEBUG)
-    
+        level: Logging level (default: LOG_LEVEL from the environment, or INFO)
+
     Returns:
         Configured logger instance
     """
     # Create logger
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
+    logger.setLevel(level if level is not None else get_log_level())
+
     # Prevent duplicate handlers
     if logger.handlers:
         return logger
-    
-    # Create console handler with formatting
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(formatter)
-    
-    # Add handler to logger
-    logger.addHandler(console_handler)
-    
+
+    logger.addHandler(_get_queue_handler())
+
     # Prevent propagation to root logger (avoids duplicate logs)
     logger.propagate = False
-    
-    return logger
\ No newline at end of file
+
+    return logger
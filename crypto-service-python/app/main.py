@@ -1,100 +1,264 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
+from starlette.types import Scope
 from datetime import datetime, timezone
-import logging
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional
 from .schemas import (
     EncryptRequest,
     EncryptResponse,
     DecryptRequest,
     DecryptResponse,
-    HealthResponse
+    BatchEncryptRequest,
+    BatchEncryptResponse,
+    BatchEncryptResult,
+    BatchDecryptRequest,
+    BatchDecryptResponse,
+    BatchDecryptResult,
+    BatchItemError,
+    BatchRotateRequest,
+    BatchRotateResponse,
+    BlindIndexRequest,
+    BlindIndexResponse,
+    BlindIndexBatchRequest,
+    BlindIndexBatchResponse,
+    BlindIndexResult,
+    FieldsRequest,
+    FieldsResponse,
+    EnvelopeEncryptRequest,
+    EnvelopeEncryptResponse,
+    EnvelopeDecryptRequest,
+    EnvelopeDecryptResponse,
+    DataKeyResponse,
+    RewrapResponse,
+    HealthResponse,
+    LivenessResponse,
+    ExecutorStatus,
+    ReadinessResponse,
+    MemoryDiffResponse,
+    LoopLagResponse
 )
-from .crypto import encrypt_data, decrypt_data
-from .security import verify_token
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+from .crypto import (
+    encrypt_data,
+    decrypt_data,
+    encrypt_bytes,
+    decrypt_bytes,
+    encrypt_batch,
+    decrypt_batch,
+    rotate_batch
 )
-logger = logging.getLogger(__name__)
+from .blind_index import blind_index_batch
+from .channel import serve_channel
+from .config import get_cipher, get_settings, load_settings, settings_preloaded
+from .envelope import (
+    close_envelope_service,
+    decode_envelope,
+    encode_envelope,
+    envelope_decrypt,
+    envelope_encrypt,
+    get_envelope_service,
+    read_key_id
+)
+from .executor import get_crypto_executor
+from .fields import decrypt_documents, encrypt_documents, get_field_paths
+from .health import health_monitor
+from .limits import AdmissionMiddleware
+from .streaming import (
+    BodyStreamingResponse,
+    StreamReader,
+    get_stream_keys,
+    encrypt_stream,
+    read_stream_header,
+    decrypt_stream
+)
+from .tracing import TracingMiddleware, shutdown_tracing
+from .profiling import check_duration, loop_lag, memory_diff, require_profiling, sample_stacks
+from .ndjson import NDJSON_MEDIA_TYPE, decrypt_records, encrypt_records, parse_fields, transform_stream
+from .security import require_admin, verify_token
+from .serialization import FastJSONResponse, json_body, json_body_openapi
+from .logger import setup_logger, should_sample
+from .metrics import TimedJSONResponse, in_flight_gauge, mark_started, observe_request, render_metrics
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load settings and start background work on startup; release it on shutdown."""
+    logger.info("Application startup")
+    mark_started()
+    # app.server loads the settings and builds the cipher once in the
+    # parent; forked workers reuse them instead of reloading
+    settings = get_settings() if settings_preloaded() else load_settings()
+    try:
+        get_cipher()
+        logger.info("Cipher available: True")
+    except RuntimeError as e:
+        logger.error(f"Cipher available: False ({e})")
+    logger.info(f"JWT_SECRET available: {settings.jwt_secret is not None}")
 
-print("[MAIN] Initializing FastAPI application...")
+    health_monitor.start()
+    try:
+        yield
+    finally:
+        logger.info("Application shutdown")
+        await health_monitor.stop()
+        get_crypto_executor().shutdown()
+        close_envelope_service()
+        shutdown_tracing()
 
 app = FastAPI(
     title="Crypto Service API",
     description="A secure encryption/decryption microservice using Fernet symmetric encryption with JWT authentication",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan
 )
 
-print("[MAIN] FastAPI app created")
+def _route_label(scope: Scope) -> str:
+    """
+    Map a request to a bounded metrics label: the path template of the route it matches.
+
+    Routes with path parameters are labelled by their template
+    (e.g. /envelope/keys/{tenant}/rotate), so label values stay bounded.
+    A path matched only with another method is labelled with that route,
+    as it is answered by it with 405. The label is resolved once per
+    request and cached in scope["state"] for the other middlewares.
+
+    Args:
+        scope: The ASGI scope of the HTTP request
+
+    Returns:
+        The matched route's path template, or "unmatched"
+    """
+    state = scope.setdefault("state", {})
+    label = state.get("route_label")
+    if label is None:
+        fallback = None
+        for route in app.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                label = route.path_format
+                break
+            if match == Match.PARTIAL and fallback is None:
+                fallback = route.path_format
+        label = state["route_label"] = label or fallback or "unmatched"
+    return label
+
+# Request bodies on these routes are read incrementally, with bounded memory
+STREAM_PATHS = ("/encrypt/stream", "/decrypt/stream", "/encrypt/ndjson", "/decrypt/ndjson")
+
+app.add_middleware(AdmissionMiddleware, route_label=_route_label, stream_paths=STREAM_PATHS)
 
-# Add CORS middleware (adjust origins as needed)
+# Add CORS middleware (adjust origins as needed). Added after admission so
+# it wraps it and the 413/429/503 rejections carry CORS headers too.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Restrict this in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "traceparent"],
 )
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup."""
-    logger.info("Application startup event triggered")
-    logger.info("Checking crypto module status...")
-    from .crypto import cipher
-    logger.info(f"Cipher available: {cipher is not None}")
-    
-    logger.info("Checking JWT configuration...")
-    from .config import JWT_SECRET, JWT_ISSUER, JWT_AUDIENCE
-    logger.info(f"JWT_SECRET available: {JWT_SECRET is not None}")
-    logger.info(f"JWT_ISSUER: {JWT_ISSUER}")
-    logger.info(f"JWT_AUDIENCE: {JWT_AUDIENCE}")
-
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Middleware to log all requests."""
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.debug(f"Headers: {dict(request.headers)}")
-    
-    response = await call_next(request)
-    
-    logger.info(f"Response: {response.status_code}")
+    """
+    Middleware to record metrics for and log one line per request.
+    Successful requests are sampled at LOG_SAMPLE_RATE; errors are always logged.
+    """
+    route = _route_label(request.scope)
+    in_flight = in_flight_gauge(route)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        in_flight.dec()
+    duration = time.perf_counter() - start
+    duration_ms = duration * 1000
+    observe_request(request.method, route, response.status_code, duration)
+
+    if response.status_code >= 400 or should_sample(get_settings().log_sample_rate):
+        logger.info(
+            f"{request.method} {request.url.path} {response.status_code} {duration_ms:.2f}ms",
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 3)
+            }
+        )
     return response
 
+# Added last so it wraps every other middleware, including request logging
+app.add_middleware(TracingMiddleware, route_label=_route_label)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint for service monitoring (no authentication required)."""
-    logger.info("Health check endpoint called")
-    try:
-        # Test encryption/decryption as part of health check
-        test_data = "health_check_test"
-        encrypted = encrypt_data(test_data)
-        decrypted = decrypt_data(encrypted)
-        
-        if decrypted != test_data:
-            raise HTTPException(status_code=503, detail="Crypto self-test failed")
-            
+    """
+    Health check endpoint for service monitoring (no authentication required).
+    Serves the cached result of the background crypto self-test.
+    """
+    logger.debug("Health check endpoint called")
+    snapshot = health_monitor.snapshot()
+    if snapshot["healthy"]:
         return HealthResponse(
             status="healthy",
             service="crypto-service",
             timestamp=datetime.now(timezone.utc),
             version="1.0.0",
+            checked_at=snapshot["checked_at"],
+            age_seconds=snapshot["age_seconds"],
             details={"crypto_test": "passed"}
         )
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return HealthResponse(
-            status="unhealthy",
-            service="crypto-service",
-            timestamp=datetime.now(timezone.utc),
-            version="1.0.0",
-            error=str(e)
-        )
+    return HealthResponse(
+        status="unhealthy",
+        service="crypto-service",
+        timestamp=datetime.now(timezone.utc),
+        version="1.0.0",
+        checked_at=snapshot["checked_at"],
+        age_seconds=snapshot["age_seconds"],
+        details={"crypto_test": "failed"},
+        error=snapshot["error"]
+    )
+
+@app.get("/health/live", response_model=LivenessResponse)
+async def liveness():
+    """Liveness probe: the process is up and the event loop is responsive."""
+    return LivenessResponse(status="alive")
+
+@app.get("/health/ready", response_model=ReadinessResponse)
+async def readiness(response: Response):
+    """
+    Readiness probe: the cached self-test passed and the crypto executor
+    still has queue capacity. Returns 503 when not ready.
+    """
+    snapshot = health_monitor.snapshot()
+    crypto_executor = get_crypto_executor()
+    executor = ExecutorStatus(
+        mode=crypto_executor.mode,
+        queue_depth=crypto_executor.depth,
+        max_queue=crypto_executor.max_queue,
+        saturation=round(crypto_executor.saturation, 3)
+    )
+    ready = snapshot["healthy"] and crypto_executor.saturation < 1.0
+    if not ready:
+        response.status_code = 503
+
+    return ReadinessResponse(
+        status="ready" if ready else "not_ready",
+        crypto_test="passed" if snapshot["healthy"] else "failed",
+        age_seconds=snapshot["age_seconds"],
+        executor=executor,
+        error=snapshot["error"] or (None if ready else "Crypto executor saturated")
+    )
 
 @app.post("/encrypt", response_model=EncryptResponse)
 async def encrypt(
@@ -105,13 +269,13 @@ async def encrypt(
     Encrypt plaintext data.
     Requires valid JWT token in Authorization header.
     """
-    logger.info(f"/encrypt endpoint called by user: {token.get('sub', 'unknown')}")
+    logger.debug(f"/encrypt endpoint called by user: {token.get('sub', 'unknown')}")
     logger.debug(f"Request plaintext length: {len(req.plaintext)}")
     
     try:
-        ciphertext = encrypt_data(req.plaintext)
-        logger.info("Encryption successful")
-        return EncryptResponse(ciphertext=ciphertext)
+        ciphertext = await get_crypto_executor().run(encrypt_data, req.plaintext, len(req.plaintext))
+        logger.debug("Encryption successful")
+        return FastJSONResponse({"ciphertext": ciphertext})
     except HTTPException as e:
         logger.error(f"HTTPException in encrypt: {e.status_code} - {e.detail}")
         raise
@@ -131,13 +295,13 @@ async def decrypt(
     Decrypt ciphertext data.
     Requires valid JWT token in Authorization header.
     """
-    logger.info(f"/decrypt endpoint called by user: {token.get('sub', 'unknown')}")
+    logger.debug(f"/decrypt endpoint called by user: {token.get('sub', 'unknown')}")
     logger.debug(f"Request ciphertext length: {len(req.ciphertext)}")
     
     try:
-        plaintext = decrypt_data(req.ciphertext)
-        logger.info("Decryption successful")
-        return DecryptResponse(plaintext=plaintext)
+        plaintext = await get_crypto_executor().run(decrypt_data, req.ciphertext, len(req.ciphertext))
+        logger.debug("Decryption successful")
+        return FastJSONResponse({"plaintext": plaintext})
     except HTTPException as e:
         logger.error(f"HTTPException in decrypt: {e.status_code} - {e.detail}")
         raise
@@ -148,12 +312,423 @@ async def decrypt(
             detail=f"Internal server error during decryption: {str(e)}"
         )
 
-# Optional: Add metrics endpoint
-@app.get("/metrics")
+@app.post(
+    "/encrypt/raw",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}}
+)
+async def encrypt_raw(
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Encrypt a raw application/octet-stream body.
+    The Fernet token is returned as the raw response body, skipping the
+    JSON string round trip in both directions.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/encrypt/raw endpoint called by user: {token.get('sub', 'unknown')}")
+    body = await request.body()
+    ciphertext = await get_crypto_executor().run(encrypt_bytes, body, len(body))
+    return Response(content=ciphertext, media_type="application/octet-stream")
+
+@app.post(
+    "/decrypt/raw",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}}
+)
+async def decrypt_raw(
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Decrypt a Fernet token sent as a raw request body.
+    The plaintext bytes are returned as the raw response body.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/decrypt/raw endpoint called by user: {token.get('sub', 'unknown')}")
+    body = await request.body()
+    plaintext = await get_crypto_executor().run(decrypt_bytes, body, len(body))
+    return Response(content=plaintext, media_type="application/octet-stream")
+
+@app.post("/encrypt/batch", response_model=BatchEncryptResponse, openapi_extra=json_body_openapi(BatchEncryptRequest))
+async def encrypt_batch_endpoint(
+    token: dict = Depends(verify_token),
+    req: BatchEncryptRequest = Depends(json_body(BatchEncryptRequest))
+):
+    """
+    Encrypt a batch of plaintexts in one request.
+    Each item is reported individually; a bad item does not fail the batch.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/encrypt/batch endpoint called by user: {token.get('sub', 'unknown')} ({len(req.items)} items)")
+
+    plaintexts = [item.plaintext for item in req.items]
+    outcomes = await get_crypto_executor().run(encrypt_batch, plaintexts, sum(map(len, plaintexts)))
+    results = []
+    failed = 0
+    for item, (ciphertext, error) in zip(req.items, outcomes):
+        if error is None:
+            results.append(BatchEncryptResult(id=item.id, ciphertext=ciphertext))
+        else:
+            failed += 1
+            results.append(BatchEncryptResult(
+                id=item.id,
+                error=BatchItemError(status_code=error[0], detail=error[1])
+            ))
+
+    return BatchEncryptResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+@app.post("/decrypt/batch", response_model=BatchDecryptResponse, openapi_extra=json_body_openapi(BatchDecryptRequest))
+async def decrypt_batch_endpoint(
+    token: dict = Depends(verify_token),
+    req: BatchDecryptRequest = Depends(json_body(BatchDecryptRequest))
+):
+    """
+    Decrypt a batch of ciphertexts in one request.
+    Each item is reported individually; a bad item does not fail the batch.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/decrypt/batch endpoint called by user: {token.get('sub', 'unknown')} ({len(req.items)} items)")
+
+    ciphertexts = [item.ciphertext for item in req.items]
+    outcomes = await get_crypto_executor().run(decrypt_batch, ciphertexts, sum(map(len, ciphertexts)))
+    results = []
+    failed = 0
+    for item, (plaintext, error) in zip(req.items, outcomes):
+        if error is None:
+            results.append(BatchDecryptResult(id=item.id, plaintext=plaintext))
+        else:
+            failed += 1
+            results.append(BatchDecryptResult(
+                id=item.id,
+                error=BatchItemError(status_code=error[0], detail=error[1])
+            ))
+
+    return BatchDecryptResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+@app.post("/rotate", response_model=BatchRotateResponse, openapi_extra=json_body_openapi(BatchRotateRequest))
+async def rotate_endpoint(
+    token: dict = Depends(verify_token),
+    req: BatchRotateRequest = Depends(json_body(BatchRotateRequest))
+):
+    """
+    Re-encrypt a batch of ciphertexts under the newest key in FERNET_KEYS.
+    Each item is reported individually; a bad item does not fail the batch.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/rotate endpoint called by user: {token.get('sub', 'unknown')} ({len(req.items)} items)")
+
+    ciphertexts = [item.ciphertext for item in req.items]
+    outcomes = await get_crypto_executor().run(rotate_batch, ciphertexts, sum(map(len, ciphertexts)))
+    results = []
+    failed = 0
+    for item, (ciphertext, error) in zip(req.items, outcomes):
+        if error is None:
+            results.append(BatchEncryptResult(id=item.id, ciphertext=ciphertext))
+        else:
+            failed += 1
+            results.append(BatchEncryptResult(
+                id=item.id,
+                error=BatchItemError(status_code=error[0], detail=error[1])
+            ))
+
+    return BatchRotateResponse(
+        results=results,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+@app.post("/blind-index", response_model=BlindIndexResponse)
+async def blind_index_endpoint(
+    req: BlindIndexRequest,
+    token: dict = Depends(verify_token)
+):
+    """
+    Compute the blind index (keyed HMAC) of a value for equality lookups
+    on encrypted columns. Optional normalization steps run first; the
+    result can be truncated to fewer bytes.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/blind-index endpoint called by user: {token.get('sub', 'unknown')}")
+    [index] = await get_crypto_executor().run(
+        partial(blind_index_batch, context=req.context, normalization=req.normalize, length=req.length),
+        [req.value],
+        len(req.value)
+    )
+    return BlindIndexResponse(index=index)
+
+@app.post("/blind-index/batch", response_model=BlindIndexBatchResponse, openapi_extra=json_body_openapi(BlindIndexBatchRequest))
+async def blind_index_batch_endpoint(
+    token: dict = Depends(verify_token),
+    req: BlindIndexBatchRequest = Depends(json_body(BlindIndexBatchRequest))
+):
+    """
+    Compute blind indexes for many values with the same options.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/blind-index/batch endpoint called by user: {token.get('sub', 'unknown')} ({len(req.items)} items)")
+    values = [item.value for item in req.items]
+    indexes = await get_crypto_executor().run(
+        partial(blind_index_batch, context=req.context, normalization=req.normalize, length=req.length),
+        values,
+        sum(map(len, values))
+    )
+    return BlindIndexBatchResponse(
+        results=[BlindIndexResult(id=item.id, index=index) for item, index in zip(req.items, indexes)]
+    )
+
+async def _transform_fields(process, req: FieldsRequest, request: Request) -> FieldsResponse:
+    fields = get_field_paths(req.fields, req.schema_id)
+    documents = req.documents if req.documents is not None else [req.document]
+    size = int(request.headers.get("content-length") or 0)
+    documents = await get_crypto_executor().run(partial(process, fields), documents, size)
+    if req.documents is not None:
+        return FieldsResponse(documents=documents)
+    return FieldsResponse(document=documents[0])
+
+@app.post("/encrypt/fields", response_model=FieldsResponse, response_model_exclude_none=True)
+async def encrypt_fields_endpoint(
+    req: FieldsRequest,
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Encrypt selected fields of a JSON document, or a batch of documents, in place.
+    Paths look like "email", "address.street" or "cards[*].number". Send
+    a schema_id to have the compiled paths cached; later calls with the
+    same schema_id may omit "fields".
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/encrypt/fields endpoint called by user: {token.get('sub', 'unknown')}")
+    return await _transform_fields(encrypt_documents, req, request)
+
+@app.post("/decrypt/fields", response_model=FieldsResponse, response_model_exclude_none=True)
+async def decrypt_fields_endpoint(
+    req: FieldsRequest,
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Decrypt fields encrypted by /encrypt/fields, restoring their original JSON values.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/decrypt/fields endpoint called by user: {token.get('sub', 'unknown')}")
+    return await _transform_fields(decrypt_documents, req, request)
+
+@app.post("/envelope/encrypt", response_model=EnvelopeEncryptResponse)
+async def envelope_encrypt_endpoint(
+    req: EnvelopeEncryptRequest,
+    token: dict = Depends(verify_token)
+):
+    """
+    Encrypt plaintext under the tenant's data key (envelope encryption).
+    The data key is created on first use and cached unwrapped, so the
+    master key is not needed on the hot path.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/envelope/encrypt endpoint called by user: {token.get('sub', 'unknown')} for tenant {req.tenant}")
+    data = req.plaintext.encode("utf-8")
+    envelope = await get_crypto_executor().run(partial(envelope_encrypt, req.tenant), data, len(data))
+    key_id, _ = read_key_id(envelope)
+    return EnvelopeEncryptResponse(ciphertext=encode_envelope(envelope), key_id=key_id)
+
+@app.post("/envelope/decrypt", response_model=EnvelopeDecryptResponse)
+async def envelope_decrypt_endpoint(
+    req: EnvelopeDecryptRequest,
+    token: dict = Depends(verify_token)
+):
+    """
+    Decrypt an envelope produced by /envelope/encrypt.
+    The data key is selected by the key id in the envelope header and must
+    belong to the given tenant.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/envelope/decrypt endpoint called by user: {token.get('sub', 'unknown')} for tenant {req.tenant}")
+    envelope = decode_envelope(req.ciphertext)
+    key_id, plaintext = await get_crypto_executor().run(partial(envelope_decrypt, req.tenant), envelope, len(envelope))
+    try:
+        return EnvelopeDecryptResponse(plaintext=plaintext.decode("utf-8"), key_id=key_id)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Decrypted data is not valid UTF-8 text")
+
+@app.post("/envelope/keys/{tenant}/rotate", response_model=DataKeyResponse)
+async def rotate_data_key(tenant: str, token: dict = Depends(require_admin)):
+    """
+    Give a tenant a new active data key. Older keys keep decrypting.
+    Requires a JWT with the Admin role.
+    """
+    logger.info(f"Data key rotation for tenant {tenant} requested by {token.get('sub', 'unknown')}")
+    # Key store calls are synchronous SQLite; keep them off the event loop
+    key_id = await asyncio.to_thread(get_envelope_service().rotate_key, tenant)
+    return DataKeyResponse(tenant=tenant, key_id=key_id)
+
+@app.post("/envelope/keys/{key_id}/revoke", response_model=DataKeyResponse)
+async def revoke_data_key(key_id: str, token: dict = Depends(require_admin)):
+    """
+    Revoke a data key: data under it can no longer be decrypted, and the
+    tenant gets a new data key on its next encryption.
+    Requires a JWT with the Admin role.
+    """
+    logger.info(f"Revocation of data key {key_id} requested by {token.get('sub', 'unknown')}")
+    tenant = await asyncio.to_thread(get_envelope_service().revoke_key, key_id)
+    return DataKeyResponse(tenant=tenant, key_id=key_id, revoked=True)
+
+@app.post("/envelope/keys/rewrap", response_model=RewrapResponse)
+async def rewrap_data_keys(token: dict = Depends(require_admin)):
+    """
+    Re-wrap every stored data key under the newest master key, e.g. after
+    adding a key to the front of MASTER_KEYS. Payloads are not touched.
+    Requires a JWT with the Admin role.
+    """
+    logger.info(f"Data key re-wrap requested by {token.get('sub', 'unknown')}")
+    return RewrapResponse(rewrapped=await asyncio.to_thread(get_envelope_service().rewrap_keys))
+
+@app.post("/encrypt/stream", response_class=BodyStreamingResponse)
+async def encrypt_stream_endpoint(
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Encrypt a raw request body of any size as a chunked stream.
+    The body is read incrementally and the framed ciphertext is streamed
+    back, so memory use does not grow with the payload.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/encrypt/stream endpoint called by user: {token.get('sub', 'unknown')}")
+    key = get_stream_keys()[0]
+    return BodyStreamingResponse(
+        encrypt_stream(request.stream(), key),
+        media_type="application/octet-stream"
+    )
+
+@app.post("/decrypt/stream", response_class=BodyStreamingResponse)
+async def decrypt_stream_endpoint(
+    request: Request,
+    token: dict = Depends(verify_token)
+):
+    """
+    Decrypt a framed stream produced by /encrypt/stream.
+    Each chunk is authenticated before it is returned. A reordered,
+    tampered or truncated stream aborts the response, so clients must treat
+    an incomplete body as a failure.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/decrypt/stream endpoint called by user: {token.get('sub', 'unknown')}")
+    keys = get_stream_keys()
+    reader = StreamReader(request.stream())
+    header = await read_stream_header(reader)
+    return BodyStreamingResponse(
+        decrypt_stream(reader, header, keys),
+        media_type="application/octet-stream"
+    )
+
+@app.post("/encrypt/ndjson", response_class=BodyStreamingResponse)
+async def encrypt_ndjson_endpoint(
+    request: Request,
+    fields: Optional[str] = None,
+    schema_id: Optional[str] = None,
+    token: dict = Depends(verify_token)
+):
+    """
+    Encrypt a newline-delimited JSON body record by record.
+    Records are read incrementally and results are streamed back in input
+    order, one line per record. With ?fields=a,b.c only those field paths
+    of each object are encrypted (see /encrypt/fields; ?schema_id= caches
+    the compiled paths).
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/encrypt/ndjson endpoint called by user: {token.get('sub', 'unknown')}")
+    return BodyStreamingResponse(
+        transform_stream(request.stream(), encrypt_records, parse_fields(fields, schema_id)),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+@app.post("/decrypt/ndjson", response_class=BodyStreamingResponse)
+async def decrypt_ndjson_endpoint(
+    request: Request,
+    fields: Optional[str] = None,
+    schema_id: Optional[str] = None,
+    token: dict = Depends(verify_token)
+):
+    """
+    Decrypt newline-delimited JSON produced by /encrypt/ndjson.
+    Pass the same ?fields=... (or ?schema_id=...) that was used for encryption.
+    Requires valid JWT token in Authorization header.
+    """
+    logger.debug(f"/decrypt/ndjson endpoint called by user: {token.get('sub', 'unknown')}")
+    return BodyStreamingResponse(
+        transform_stream(request.stream(), decrypt_records, parse_fields(fields, schema_id)),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+@app.websocket("/ws")
+async def crypto_channel(websocket: WebSocket):
+    """
+    Persistent channel for pipelined encrypt/decrypt operations (see app.channel).
+    Requires a valid JWT token in the Authorization header or the token query parameter.
+    """
+    await serve_channel(websocket)
+
+@app.post("/debug/profile", response_class=Response, dependencies=[Depends(require_profiling)])
+async def profile_stacks(
+    seconds: float = Query(10, gt=0),
+    interval: float = Query(0.005, ge=0.001, le=0.1),
+    token: dict = Depends(require_admin)
+):
+    """
+    Sample every thread's stack for the given number of seconds and return
+    them in collapsed format, for flamegraph.pl or speedscope.
+    Requires PROFILING_ENABLED and a JWT with the Admin role.
+    """
+    check_duration(seconds)
+    logger.info(f"Stack profile for {seconds}s requested by {token.get('sub', 'unknown')}")
+    sampler = await sample_stacks(seconds, interval)
+    return Response(
+        content=sampler.collapsed(),
+        media_type="text/plain",
+        headers={"X-Profile-Samples": str(sampler.samples)}
+    )
+
+@app.post("/debug/memory", response_model=MemoryDiffResponse, dependencies=[Depends(require_profiling)])
+async def profile_memory(
+    seconds: float = Query(10, gt=0),
+    limit: int = Query(25, ge=1, le=500),
+    frames: int = Query(1, ge=1, le=25),
+    token: dict = Depends(require_admin)
+):
+    """
+    Trace allocations for the given number of seconds and report the
+    allocation sites whose memory grew the most.
+    Requires PROFILING_ENABLED and a JWT with the Admin role.
+    """
+    check_duration(seconds)
+    logger.info(f"Memory profile for {seconds}s requested by {token.get('sub', 'unknown')}")
+    return await memory_diff(seconds, limit, frames)
+
+@app.get("/debug/loop-lag", response_model=LoopLagResponse, dependencies=[Depends(require_profiling)])
+async def profile_loop_lag(
+    seconds: float = Query(5, gt=0),
+    interval: float = Query(0.01, ge=0.001, le=1),
+    token: dict = Depends(require_admin)
+):
+    """
+    Measure how late the event loop wakes up over the given number of seconds.
+    Requires PROFILING_ENABLED and a JWT with the Admin role.
+    """
+    check_duration(seconds)
+    return await loop_lag(seconds, interval)
+
+@app.get("/metrics", response_class=Response)
 async def metrics():
-    """Simple metrics endpoint."""
-    return {
-        "service": "crypto-service",
-        "uptime": datetime.now(timezone.utc) - app.startup_time if hasattr(app, 'startup_time') else "unknown",
-        "endpoints": ["/health", "/encrypt", "/decrypt", "/docs", "/redoc"]
-    }
\ No newline at end of file
+    """Prometheus metrics in text exposition format (aggregated across workers)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
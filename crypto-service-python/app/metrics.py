@@ -0,0 +1,148 @@
+# metrics.py
+"""
+Prometheus instrumentation for the crypto service.
+
+When PROMETHEUS_MULTIPROC_DIR is set (multi-worker deployments), every
+worker writes its samples to that directory and /metrics aggregates them
+across workers. Otherwise the in-process default registry is used.
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+from prometheus_client import multiprocess
+from fastapi.responses import JSONResponse
+from .tracing import record_span
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+REQUESTS = Counter(
+    "crypto_http_requests_total",
+    "HTTP requests handled, by route and status code",
+    ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "crypto_http_request_duration_seconds",
+    "End-to-end HTTP request latency, by route and status code",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "crypto_stage_duration_seconds",
+    "Time spent in each processing stage (jwt_verify, crypto, serialization)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+BYTES_PROCESSED = Counter(
+    "crypto_bytes_processed_total",
+    "Payload bytes passed to crypto operations",
+    ["operation"]
+)
+IN_FLIGHT = Gauge(
+    "crypto_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["route"],
+    multiprocess_mode="livesum"
+)
+START_TIME = Gauge(
+    "crypto_service_start_time_seconds",
+    "Unix time at which the service process started",
+    multiprocess_mode="min"
+)
+
+# Methods recorded as-is; anything else a client sends is labelled "other"
+# so the method label stays bounded
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+# Label lookups are a large share of the recording cost, so the labelled
+# children are resolved once and reused. Label values are bounded (routes
+# are mapped to templates), so these caches stay small.
+_stage_children = {}
+_request_children = {}
+_bytes_children = {}
+_in_flight_children = {}
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Record the duration of the enclosed block under the given stage, and as a span when traced."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        child = _stage_children.get(stage)
+        if child is None:
+            child = _stage_children[stage] = STAGE_LATENCY.labels(stage=stage)
+        child.observe(end - start)
+        record_span(stage, start, end)
+
+
+def count_bytes(operation: str, size: int):
+    """Add size to the bytes-processed counter for operation."""
+    child = _bytes_children.get(operation)
+    if child is None:
+        child = _bytes_children[operation] = BYTES_PROCESSED.labels(operation=operation)
+    child.inc(size)
+
+
+def in_flight_gauge(route: str) -> Gauge:
+    """Return the in-flight gauge child for route."""
+    child = _in_flight_children.get(route)
+    if child is None:
+        child = _in_flight_children[route] = IN_FLIGHT.labels(route=route)
+    return child
+
+
+def mark_started():
+    """Set the start-time gauge to now; called when the application starts up."""
+    START_TIME.set(time.time())
+
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    """Record one finished HTTP request."""
+    if method not in HTTP_METHODS:
+        method = "other"
+    key = (method, route, status)
+    children = _request_children.get(key)
+    if children is None:
+        labels = {"method": method, "route": route, "status": str(status)}
+        children = _request_children[key] = (
+            REQUESTS.labels(**labels),
+            REQUEST_LATENCY.labels(**labels)
+        )
+    children[0].inc()
+    children[1].observe(duration)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records JSON encoding time as the serialization stage."""
+
+    def render(self, content) -> bytes:
+        with track_stage("serialization"):
+            return super().render(content)
+
+
+def render_metrics() -> tuple:
+    """
+    Return (body, content_type) in Prometheus text format.
+
+    Aggregates across workers when PROMETHEUS_MULTIPROC_DIR is set.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,257 @@
+# ndjson.py
+"""
+Newline-delimited JSON bulk encryption for pipeline jobs.
+
+The request body is read incrementally and split into records (one JSON
+value per line). Records are processed in groups of NDJSON_BATCH_SIZE
+through the crypto executor and written back in input order, one output
+line per input record, as soon as each group completes.
+
+Without a field list, a whole record is encrypted into
+{"ciphertext": "..."} and decryption turns that back into the original
+line. With field paths (see app.fields), each record must be a JSON
+object and only the selected fields are encrypted, one crypto call per
+group; fields a record does not have are skipped.
+
+A record that cannot be processed produces {"line": n, "error": {...}} in
+its place; other records are unaffected. Memory is bounded: lines longer
+than NDJSON_MAX_LINE_SIZE end the stream with an error line, and at most
+NDJSON_MAX_IN_FLIGHT groups are buffered, so a slow client stops the body
+from being read rather than growing a backlog.
+"""
+import asyncio
+import json
+from collections import deque
+from functools import partial
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+from fastapi import HTTPException
+from .config import get_settings
+from .crypto import decrypt_data, encrypt_data
+from .executor import get_crypto_executor
+from .fields import FieldPaths, decrypt_documents, encrypt_documents, get_field_paths
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+Record = Tuple[int, bytes]
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _error_line(line_number: int, status_code: int, detail: str) -> bytes:
+    return _dumps({"line": line_number, "error": {"status_code": status_code, "detail": detail}})
+
+
+def _load_object(line: bytes) -> dict:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON record")
+    if not isinstance(record, dict):
+        raise HTTPException(status_code=400, detail="Record must be a JSON object")
+    return record
+
+
+def encrypt_record(line: bytes) -> bytes:
+    """Encrypt one whole NDJSON record into {"ciphertext": ...}."""
+    try:
+        json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON record")
+    return _dumps({"ciphertext": encrypt_data(line.decode())})
+
+
+def decrypt_record(line: bytes) -> bytes:
+    """Reverse encrypt_record."""
+    record = _load_object(line)
+    ciphertext = record.get("ciphertext")
+    if not isinstance(ciphertext, str):
+        raise HTTPException(status_code=400, detail="Record has no ciphertext field")
+    plaintext = decrypt_data(ciphertext)
+    try:
+        json.loads(plaintext)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Decrypted record is not JSON")
+    return plaintext.encode()
+
+
+def _transform_records(
+    transform_record: Callable[[bytes], bytes],
+    transform_documents: Callable[[FieldPaths, List[Any]], List[Any]],
+    fields: Optional[FieldPaths],
+    records: List[Record]
+) -> bytes:
+    output: List[Optional[bytes]] = [None] * len(records)
+
+    if fields is None:
+        for i, (line_number, line) in enumerate(records):
+            try:
+                output[i] = transform_record(line)
+            except HTTPException as e:
+                output[i] = _error_line(line_number, e.status_code, e.detail)
+    else:
+        parsed = []
+        for i, (line_number, line) in enumerate(records):
+            try:
+                parsed.append((i, _load_object(line)))
+            except HTTPException as e:
+                output[i] = _error_line(line_number, e.status_code, e.detail)
+
+        # One crypto call for the whole group; if any record fails, redo
+        # record by record so the failure stays with that record
+        try:
+            transform_documents(fields, [document for _, document in parsed])
+        except HTTPException:
+            for i, document in parsed:
+                try:
+                    transform_documents(fields, [document])
+                except HTTPException as e:
+                    output[i] = _error_line(records[i][0], e.status_code, e.detail)
+        for i, document in parsed:
+            if output[i] is None:
+                output[i] = _dumps(document)
+
+    output.append(b"")
+    return b"\n".join(output)
+
+
+def encrypt_records(fields: Optional[FieldPaths], records: List[Record]) -> bytes:
+    """Encrypt a group of (line number, line) records into NDJSON output."""
+    return _transform_records(encrypt_record, encrypt_documents, fields, records)
+
+
+def decrypt_records(fields: Optional[FieldPaths], records: List[Record]) -> bytes:
+    """Decrypt a group of (line number, line) records into NDJSON output."""
+    return _transform_records(decrypt_record, decrypt_documents, fields, records)
+
+
+def parse_fields(fields: Optional[str], schema_id: Optional[str] = None) -> Optional[FieldPaths]:
+    """
+    Compile a comma-separated list of field paths (see app.fields).
+
+    Returns None, meaning whole records, when neither fields nor a
+    schema_id are given.
+    """
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if not names and schema_id is None:
+        return None
+    return get_field_paths(names, schema_id)
+
+
+class LineTooLong(Exception):
+    def __init__(self, line_number: int):
+        self.line_number = line_number
+
+
+async def iter_records(chunks: AsyncIterator[bytes], max_line_size: int) -> AsyncIterator[Record]:
+    """
+    Split a byte stream into (line number, line) records.
+
+    Blank lines are skipped but still counted.
+
+    Raises:
+        LineTooLong: If a line exceeds max_line_size bytes
+    """
+    buffer = bytearray()
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            line = bytes(buffer[start:end]).strip()
+            if len(line) > max_line_size:
+                raise LineTooLong(line_number)
+            if line:
+                yield line_number, line
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_size:
+            raise LineTooLong(line_number + 1)
+
+    line = bytes(buffer).strip()
+    if line:
+        yield line_number + 1, line
+
+
+async def transform_stream(
+    chunks: AsyncIterator[bytes],
+    process: Callable[[Optional[FieldPaths], List[Record]], bytes],
+    fields: Optional[FieldPaths],
+    batch_size: Optional[int] = None,
+    max_line_size: Optional[int] = None,
+    max_in_flight: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Run process over groups of records read from chunks, yielding output in order.
+
+    At most max_in_flight groups are processed or waiting to be sent at
+    any time; the body is not read further until the oldest one is sent.
+
+    Args:
+        chunks: The request body
+        process: encrypt_records or decrypt_records
+        fields: Compiled field paths to transform, or None for whole records
+        batch_size: Records per group (default: NDJSON_BATCH_SIZE)
+        max_line_size: Longest accepted line, in bytes (default: NDJSON_MAX_LINE_SIZE)
+        max_in_flight: Groups buffered at once (default: NDJSON_MAX_IN_FLIGHT)
+
+    Yields:
+        NDJSON output, one group at a time
+    """
+    settings = get_settings()
+    batch_size = batch_size or settings.ndjson_batch_size
+    max_line_size = max_line_size or settings.ndjson_max_line_size
+    max_in_flight = max_in_flight or settings.ndjson_max_in_flight
+    executor = get_crypto_executor()
+    func = partial(process, fields)
+    pending = deque()
+
+    def submit(group: List[Record]):
+        size = sum(len(line) for _, line in group)
+        line_numbers = [line_number for line_number, _ in group]
+        pending.append((line_numbers, asyncio.ensure_future(executor.run(func, group, size))))
+
+    async def next_output() -> bytes:
+        line_numbers, task = pending.popleft()
+        try:
+            return await task
+        except HTTPException as e:
+            # The whole group failed (e.g. the executor is saturated); keep
+            # one output line per record
+            return b"".join(
+                _error_line(line_number, e.status_code, e.detail) + b"\n"
+                for line_number in line_numbers
+            )
+
+    group: List[Record] = []
+    try:
+        async for record in iter_records(chunks, max_line_size):
+            group.append(record)
+            if len(group) >= batch_size:
+                submit(group)
+                group = []
+                if len(pending) >= max_in_flight:
+                    yield await next_output()
+        if group:
+            submit(group)
+        while pending:
+            yield await next_output()
+    except LineTooLong as e:
+        logger.warning(f"NDJSON line {e.line_number} exceeds {max_line_size} bytes - aborting stream")
+        if group:
+            submit(group)
+        while pending:
+            yield await next_output()
+        yield _error_line(e.line_number, 413, f"Line exceeds {max_line_size} bytes") + b"\n"
+    finally:
+        for _, task in pending:
+            task.cancel()
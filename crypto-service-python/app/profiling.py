@@ -0,0 +1,204 @@
+# profiling.py
+"""
+On-demand profiling for the admin-only /debug endpoints.
+
+Nothing here runs until an admin asks for it, and everything stops when
+the request finishes, so leaving PROFILING_ENABLED on costs nothing
+between profiles:
+
+- sample_stacks: a background thread samples every thread's Python stack
+  at a fixed interval for N seconds and returns them in collapsed
+  ("folded") format, one "root;caller;callee count" line per distinct
+  stack, as read by flamegraph.pl, speedscope and inferno.
+- memory_diff: traces allocations with tracemalloc for N seconds and
+  reports the allocation sites whose live memory grew the most.
+- loop_lag: measures how late the event loop wakes up from short sleeps
+  for N seconds. Lag is time the loop spent running other callbacks,
+  i.e. blocking work on the event loop.
+
+Each worker process is profiled on its own; under app.server a request
+reaches one worker, reported as "pid". Work in the process executor is
+not visible to the stack sampler.
+"""
+import asyncio
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List
+from fastapi import HTTPException
+from .config import get_settings
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+_running = set()
+
+
+def require_profiling():
+    """Dependency: hide the /debug endpoints unless PROFILING_ENABLED is set."""
+    if not get_settings().profiling_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def check_duration(seconds: float):
+    """
+    Reject profiling windows longer than PROFILING_MAX_SECONDS.
+
+    Raises:
+        HTTPException: 400 when seconds is out of range
+    """
+    limit = get_settings().profiling_max_seconds
+    if seconds > limit:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {limit}")
+
+
+@contextmanager
+def _exclusive(kind: str):
+    """Allow one profile of each kind at a time in this process."""
+    if kind in _running:
+        raise HTTPException(status_code=409, detail=f"A {kind} profile is already running")
+    _running.add(kind)
+    try:
+        yield
+    finally:
+        _running.discard(kind)
+
+
+def _frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples the Python stacks of all other threads from a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)).replace(" ", "_"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """The samples in collapsed format, most frequent stack first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def sample_stacks(seconds: float, interval: float) -> StackSampler:
+    """
+    Sample all thread stacks every interval seconds for seconds seconds.
+
+    Raises:
+        HTTPException: 409 if a stack profile is already running
+    """
+    with _exclusive("stack"):
+        sampler = StackSampler(interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        logger.info(f"Stack profile finished: {sampler.samples} samples, {len(sampler.stacks)} distinct stacks")
+        return sampler
+
+
+def _compare(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, frames: int) -> List[tracemalloc.StatisticDiff]:
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    key = "traceback" if frames > 1 else "lineno"
+    return after.filter_traces(filters).compare_to(before.filter_traces(filters), key)
+
+
+async def memory_diff(seconds: float, limit: int, frames: int) -> Dict:
+    """
+    Trace allocations for seconds seconds and report the largest growth by allocation site.
+
+    Allocations made before tracing started are invisible to tracemalloc,
+    so when it was off, the result is memory allocated during the window
+    and still alive at its end.
+
+    Raises:
+        HTTPException: 409 if a memory profile is already running
+    """
+    with _exclusive("memory"):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        try:
+            before = await asyncio.to_thread(tracemalloc.take_snapshot)
+            await asyncio.sleep(seconds)
+            after = await asyncio.to_thread(tracemalloc.take_snapshot)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        stats = await asyncio.to_thread(_compare, before, after, frames)
+        return {
+            "pid": os.getpid(),
+            "seconds": seconds,
+            "traced_current": current,
+            "traced_peak": peak,
+            "size_diff": sum(stat.size_diff for stat in stats),
+            "top": [
+                {
+                    "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size": stat.size,
+                    "size_diff": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+
+def _percentile_ms(ordered: List[float], q: float) -> float:
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+
+async def loop_lag(seconds: float, interval: float) -> Dict:
+    """Measure event-loop wake-up lag with interval-second sleeps for seconds seconds."""
+    loop = asyncio.get_running_loop()
+    lags = []
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+
+    ordered = sorted(lags)
+    return {
+        "pid": os.getpid(),
+        "samples": len(lags),
+        "interval_ms": round(interval * 1000, 3),
+        "mean_ms": round(sum(lags) / len(lags) * 1000, 3),
+        "p50_ms": _percentile_ms(ordered, 0.5),
+        "p99_ms": _percentile_ms(ordered, 0.99),
+        "max_ms": _percentile_ms(ordered, 1.0),
+    }
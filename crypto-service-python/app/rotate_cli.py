@@ -0,0 +1,191 @@
+# rotate_cli.py
+"""
+Offline bulk re-wrap of ciphertexts under the newest key in FERNET_KEYS.
+
+Tokens are rotated like POST /rotate does (crypto.rotate_batch): plain
+Fernet tokens and sealed values (AEAD engines, compressed payloads) are
+both accepted and re-encrypted with the configured CRYPTO_ENGINE and
+COMPRESSION.
+
+Reads one token per line from a file or stdin and writes the rotated
+tokens, line for line, to an output file. Work is split into chunks that
+are rotated in parallel across processes; after each chunk is written the
+progress is checkpointed, so an interrupted run resumes where it stopped.
+
+Lines that cannot be rotated are written back unchanged (they still
+decrypt with the old key) and reported with their line numbers.
+
+Usage:
+    python -m app.rotate_cli -i tokens.txt -o rotated.txt --checkpoint rotate.ckpt
+    cat tokens.txt | python -m app.rotate_cli -o rotated.txt --workers 8
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+from cryptography.fernet import Fernet, MultiFernet
+from .config import Settings, get_settings, get_usable_cpus, set_settings
+from .crypto import rotate_batch
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+def _init_worker(settings: Settings):
+    set_settings(settings)
+
+
+def _rotate_chunk(lines: List[str]) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """Rotate one chunk; returns output lines and (index, error) failures."""
+    tokens = [line.strip() for line in lines]
+    results = iter(rotate_batch([token for token in tokens if token]))
+    output = []
+    failures = []
+    for index, token in enumerate(tokens):
+        if not token:
+            output.append("")
+            continue
+        rotated, error = next(results)
+        if error is None:
+            output.append(rotated)
+        else:
+            output.append(token)
+            failures.append((index, error[1]))
+    return output, failures
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(lines)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _load_checkpoint(path: Optional[str]) -> dict:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"lines_done": 0, "output_offset": 0, "failed": 0}
+
+
+def _save_checkpoint(path: Optional[str], state: dict):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def rotate_stream(
+    lines: Iterable[str],
+    output_path: str,
+    keys: List[str],
+    workers: int = 1,
+    chunk_size: int = 10000,
+    checkpoint_path: Optional[str] = None
+) -> dict:
+    """
+    Rotate every token in lines and write the results to output_path.
+
+    If checkpoint_path points at an existing checkpoint, the lines it
+    records as done are skipped and the output file is truncated back to
+    the matching offset before appending.
+
+    Returns:
+        The final checkpoint state (lines_done, output_offset, failed)
+    """
+    if not keys:
+        raise RuntimeError("No Fernet keys configured. Set FERNET_KEYS or FERNET_KEY.")
+    # Fail here on an invalid key rather than on every line in the workers
+    MultiFernet([Fernet(key.encode()) for key in keys])
+    settings = dataclasses.replace(get_settings(), fernet_keys=tuple(keys))
+
+    state = _load_checkpoint(checkpoint_path)
+    if state["lines_done"]:
+        logger.info(f"Resuming from checkpoint at line {state['lines_done']}")
+
+    lines = iter(lines)
+    for _ in islice(lines, state["lines_done"]):
+        pass
+
+    if state["lines_done"] and not os.path.exists(output_path):
+        raise RuntimeError(f"Checkpoint found but output file {output_path} is missing")
+
+    mode = "r+" if state["lines_done"] else "w"
+    max_in_flight = max(1, workers) * 2
+
+    with open(output_path, mode) as out, Pool(max(1, workers), _init_worker, (settings,)) as pool:
+        out.seek(state["output_offset"])
+        out.truncate()
+
+        def write(chunk_start: int, result):
+            rotated, failures = result
+            out.write("\n".join(rotated) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            for index, error in failures:
+                logger.warning(f"line {chunk_start + index + 1}: {error}")
+
+            state["lines_done"] = chunk_start + len(rotated)
+            state["output_offset"] = out.tell()
+            state["failed"] += len(failures)
+            _save_checkpoint(checkpoint_path, state)
+            logger.info(f"Rotated {state['lines_done']} lines ({state['failed']} failed)")
+
+        pending = deque()
+        next_start = state["lines_done"]
+        for chunk in _chunks(lines, chunk_size):
+            pending.append((next_start, pool.apply_async(_rotate_chunk, (chunk,))))
+            next_start += len(chunk)
+            if len(pending) >= max_in_flight:
+                start, result = pending.popleft()
+                write(start, result.get())
+
+        while pending:
+            start, result = pending.popleft()
+            write(start, result.get())
+
+    return state
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt ciphertexts under the newest key in FERNET_KEYS."
+    )
+    parser.add_argument("-i", "--input", default="-",
+                        help="File with one token per line, or '-' for stdin (default)")
+    parser.add_argument("-o", "--output", required=True,
+                        help="File to write rotated tokens to, line for line")
+    parser.add_argument("--checkpoint",
+                        help="Progress file; an existing one resumes the run")
+    parser.add_argument("--workers", type=int, default=get_usable_cpus(),
+                        help="Worker processes (default: usable CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="Tokens per work unit and checkpoint (default: 10000)")
+    args = parser.parse_args(argv)
+
+    keys = list(get_settings().fernet_keys)
+    if args.input == "-":
+        state = rotate_stream(sys.stdin, args.output, keys, args.workers,
+                              args.chunk_size, args.checkpoint)
+    else:
+        with open(args.input) as f:
+            state = rotate_stream(f, args.output, keys, args.workers,
+                                  args.chunk_size, args.checkpoint)
+
+    logger.info(f"Rotation complete: {state['lines_done']} lines, {state['failed']} failed")
+    return 1 if state["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
 #schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from .config import get_settings
+
+
+def _check_batch_size(items: list) -> list:
+    limit = get_settings().batch_max_items
+    if len(items) > limit:
+        raise ValueError(f"Batch may contain at most {limit} items")
+    return items
 
 class EncryptRequest(BaseModel):
     plaintext: str
@@ -43,12 +51,317 @@ class DecryptResponse(BaseModel):
             }
         }
 
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str
+
+class BatchEncryptItem(BaseModel):
+    id: str
+    plaintext: str
+
+class BatchEncryptRequest(BaseModel):
+    items: List[BatchEncryptItem] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def check_batch_size(cls, items):
+        return _check_batch_size(items)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "1", "plaintext": "Hello, World!"},
+                    {"id": "2", "plaintext": "Another secret"}
+                ]
+            }
+        }
+
+class BatchEncryptResult(BaseModel):
+    id: str
+    ciphertext: Optional[str] = None
+    error: Optional[BatchItemError] = None
+
+class BatchEncryptResponse(BaseModel):
+    results: List[BatchEncryptResult]
+    succeeded: int
+    failed: int
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"id": "1", "ciphertext": "gAAAAABl..."},
+                    {"id": "2", "error": {"status_code": 400, "detail": "Data to encrypt cannot be empty"}}
+                ],
+                "succeeded": 1,
+                "failed": 1
+            }
+        }
+
+class BatchDecryptItem(BaseModel):
+    id: str
+    ciphertext: str
+
+class BatchDecryptRequest(BaseModel):
+    items: List[BatchDecryptItem] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def check_batch_size(cls, items):
+        return _check_batch_size(items)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "1", "ciphertext": "gAAAAABl..."}
+                ]
+            }
+        }
+
+class BatchDecryptResult(BaseModel):
+    id: str
+    plaintext: Optional[str] = None
+    error: Optional[BatchItemError] = None
+
+class BatchDecryptResponse(BaseModel):
+    results: List[BatchDecryptResult]
+    succeeded: int
+    failed: int
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"id": "1", "plaintext": "Hello, World!"}
+                ],
+                "succeeded": 1,
+                "failed": 0
+            }
+        }
+
+class BatchRotateRequest(BaseModel):
+    items: List[BatchDecryptItem] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def check_batch_size(cls, items):
+        return _check_batch_size(items)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "1", "ciphertext": "gAAAAABl..."}
+                ]
+            }
+        }
+
+class BatchRotateResponse(BaseModel):
+    results: List[BatchEncryptResult]
+    succeeded: int
+    failed: int
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"id": "1", "ciphertext": "gAAAAABm..."}
+                ],
+                "succeeded": 1,
+                "failed": 0
+            }
+        }
+
+class BlindIndexOptions(BaseModel):
+    context: str = Field("", max_length=256)
+    normalize: List[str] = Field(default_factory=list)
+    length: int = Field(32, ge=4, le=32)
+
+    @field_validator("context")
+    @classmethod
+    def check_context(cls, context):
+        # NUL separates the context from the value in the HMAC input
+        if "\x00" in context:
+            raise ValueError("context may not contain NUL characters")
+        return context
+
+class BlindIndexRequest(BlindIndexOptions):
+    value: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "value": " Jane.Doe@Example.com ",
+                "context": "users.email",
+                "normalize": ["trim", "lower"],
+                "length": 16
+            }
+        }
+
+class BlindIndexResponse(BaseModel):
+    index: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "index": "q3Jx0bS7mJ1vW8k2c9Yf1A"
+            }
+        }
+
+class BlindIndexItem(BaseModel):
+    id: str
+    value: str
+
+class BlindIndexBatchRequest(BlindIndexOptions):
+    items: List[BlindIndexItem] = Field(..., min_length=1)
+
+    @field_validator("items")
+    @classmethod
+    def check_batch_size(cls, items):
+        return _check_batch_size(items)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "1", "value": "jane@example.com"},
+                    {"id": "2", "value": "john@example.com"}
+                ],
+                "context": "users.email",
+                "normalize": ["trim", "lower"]
+            }
+        }
+
+class BlindIndexResult(BaseModel):
+    id: str
+    index: str
+
+class BlindIndexBatchResponse(BaseModel):
+    results: List[BlindIndexResult]
+
+class FieldsRequest(BaseModel):
+    fields: Optional[List[str]] = None
+    schema_id: Optional[str] = Field(None, min_length=1, max_length=128)
+    document: Optional[Dict[str, Any]] = None
+    documents: Optional[List[Dict[str, Any]]] = None
+
+    @field_validator("documents")
+    @classmethod
+    def check_batch_size(cls, documents):
+        return _check_batch_size(documents) if documents is not None else documents
+
+    @model_validator(mode="after")
+    def check_one_payload(self):
+        if (self.document is None) == (self.documents is None):
+            raise ValueError("Provide exactly one of 'document' or 'documents'")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "schema_id": "customer-v1",
+                "fields": ["email", "address.street", "cards[*].number"],
+                "document": {
+                    "id": 42,
+                    "email": "jane@example.com",
+                    "address": {"street": "1 Main St", "city": "Springfield"},
+                    "cards": [{"number": "4111111111111111", "expiry": "12/30"}]
+                }
+            }
+        }
+
+class FieldsResponse(BaseModel):
+    document: Optional[Dict[str, Any]] = None
+    documents: Optional[List[Dict[str, Any]]] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "document": {
+                    "id": 42,
+                    "email": "gAAAAABl...",
+                    "address": {"street": "gAAAAABl...", "city": "Springfield"},
+                    "cards": [{"number": "gAAAAABl...", "expiry": "12/30"}]
+                }
+            }
+        }
+
+class EnvelopeEncryptRequest(BaseModel):
+    tenant: str = Field(..., min_length=1, max_length=128, pattern=r"^[A-Za-z0-9_.:-]+$")
+    plaintext: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "tenant": "acme",
+                "plaintext": "Hello, World!"
+            }
+        }
+
+class EnvelopeEncryptResponse(BaseModel):
+    ciphertext: str
+    key_id: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ciphertext": "U0NFMhNka18...",
+                "key_id": "dk_3f2a9c1d7e6b5a40"
+            }
+        }
+
+class EnvelopeDecryptRequest(BaseModel):
+    tenant: str = Field(..., min_length=1, max_length=128, pattern=r"^[A-Za-z0-9_.:-]+$")
+    ciphertext: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "tenant": "acme",
+                "ciphertext": "U0NFMhNka18..."
+            }
+        }
+
+class EnvelopeDecryptResponse(BaseModel):
+    plaintext: str
+    key_id: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "plaintext": "Hello, World!",
+                "key_id": "dk_3f2a9c1d7e6b5a40"
+            }
+        }
+
+class DataKeyResponse(BaseModel):
+    tenant: str
+    key_id: str
+    revoked: bool = False
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "tenant": "acme",
+                "key_id": "dk_3f2a9c1d7e6b5a40",
+                "revoked": False
+            }
+        }
+
+class RewrapResponse(BaseModel):
+    rewrapped: int
+
 class HealthResponse(BaseModel):
     status: str
     service: str
     timestamp: datetime
     version: str
-    details: Optional[str] = None
+    checked_at: Optional[datetime] = None
+    age_seconds: Optional[float] = None
+    details: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
     class Config:
         json_schema_extra = {
@@ -57,6 +370,103 @@ class HealthResponse(BaseModel):
                 "service": "crypto-service",
                 "timestamp": "2024-01-01T12:00:00Z",
                 "version": "1.0.0",
-                "details": "Service is running normally"
+                "checked_at": "2024-01-01T11:59:50Z",
+                "age_seconds": 10.2,
+                "details": {"crypto_test": "passed"}
+            }
+        }
+
+class LivenessResponse(BaseModel):
+    status: str
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": "alive"
+            }
+        }
+
+class ExecutorStatus(BaseModel):
+    mode: str
+    queue_depth: int
+    max_queue: int
+    saturation: float
+
+class ReadinessResponse(BaseModel):
+    status: str
+    crypto_test: str
+    age_seconds: float
+    executor: ExecutorStatus
+    error: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": "ready",
+                "crypto_test": "passed",
+                "age_seconds": 10.2,
+                "executor": {
+                    "mode": "thread",
+                    "queue_depth": 3,
+                    "max_queue": 64,
+                    "saturation": 0.047
+                }
             }
-        }
\ No newline at end of file
+        }
+
+class MemoryStat(BaseModel):
+    traceback: List[str]
+    size: int
+    size_diff: int
+    count: int
+    count_diff: int
+
+class MemoryDiffResponse(BaseModel):
+    pid: int
+    seconds: float
+    traced_current: int
+    traced_peak: int
+    size_diff: int
+    top: List[MemoryStat]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "pid": 4242,
+                "seconds": 10,
+                "traced_current": 1048576,
+                "traced_peak": 2097152,
+                "size_diff": 524288,
+                "top": [
+                    {
+                        "traceback": ["/app/app/security.py:120"],
+                        "size": 262144,
+                        "size_diff": 262144,
+                        "count": 512,
+                        "count_diff": 512
+                    }
+                ]
+            }
+        }
+
+class LoopLagResponse(BaseModel):
+    pid: int
+    samples: int
+    interval_ms: float
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "pid": 4242,
+                "samples": 480,
+                "interval_ms": 10,
+                "mean_ms": 0.21,
+                "p50_ms": 0.08,
+                "p99_ms": 3.5,
+                "max_ms": 12.7
+            }
+        }
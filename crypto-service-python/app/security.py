@@ -1,32 +1,153 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from .config import JWT_SECRET, JWT_ISSUER, JWT_AUDIENCE
+from .metrics import track_stage
+from .config import get_settings
+from .limits import check_rate_limit
 
 security = HTTPBearer()
 
-def verify_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-):
+
+class TokenCache:
+    """
+    Bounded LRU cache of already-verified JWT payloads.
+
+    Entries are keyed by the SHA-256 of the raw token, so tokens are never
+    held in memory as cache keys, and expire after ttl seconds or at the
+    token's own exp claim, whichever comes first. Only successful
+    verifications are cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached payload for token, or None on a miss."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(payload)
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: dict):
+        """Cache a verified payload until min(now + ttl, exp)."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+_token_cache: Optional[TokenCache] = None
+
+
+def get_token_cache() -> TokenCache:
+    """Return the shared verified-token cache, sized from the settings on first use."""
+    global _token_cache
+    if _token_cache is None:
+        settings = get_settings()
+        _token_cache = TokenCache(maxsize=settings.jwt_cache_size, ttl=settings.jwt_cache_ttl)
+    return _token_cache
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a raw JWT and return its payload, using the verified-token cache.
+
+    Raises:
+        HTTPException: 503 if JWT_SECRET is not configured, 401 if the
+            token is invalid or expired
+    """
+    settings = get_settings()
     # Add this check
-    if JWT_SECRET is None:
+    if settings.jwt_secret is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="JWT configuration not available"
         )
     
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(
-            token,
-            JWT_SECRET,
-            algorithms=["HS256"],
-            issuer=JWT_ISSUER,
-            audience=JWT_AUDIENCE
-        )
-        return payload
-    except JWTError as e:
+    token_cache = get_token_cache()
+    with track_stage("jwt_verify"):
+        payload = token_cache.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token,
+                    settings.jwt_secret,
+                    algorithms=["HS256"],
+                    issuer=settings.jwt_issuer,
+                    audience=settings.jwt_audience
+                )
+            except JWTError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail=f"Invalid or expired token: {str(e)}"
+                )
+            token_cache.put(token, payload)
+    return payload
+
+
+async def verify_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    # async so FastAPI calls it on the event loop: a cache hit is a dict
+    # lookup and an HS256 check takes microseconds, less than a threadpool hop
+    payload = decode_token(credentials.credentials)
+    check_rate_limit(payload)
+    return payload
+
+
+async def require_admin(token: dict = Depends(verify_token)) -> dict:
+    """Like verify_token, but the token must carry role "Admin"."""
+    if token.get("role") != "Admin":
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Invalid or expired token: {str(e)}"
-        )
\ No newline at end of file
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin role required"
+        )
+    return token
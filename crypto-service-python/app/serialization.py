@@ -0,0 +1,99 @@
+# serialization.py
+"""
+Fast JSON encoding and decoding for the hot endpoints.
+
+Responses: for a route with a response_model, FastAPI validates the
+returned value against the model and then serializes it. For /encrypt and
+/decrypt that only re-checks a string the service has just produced.
+Those endpoints return a FastJSONResponse instead, which FastAPI sends
+as is. The response_model stays on the route for the OpenAPI schema.
+
+Requests: FastAPI decodes a JSON body with the stdlib json module and
+then validates the resulting dicts. json_body() validates the raw bytes
+in a single pass with pydantic's model_validate_json. Validation errors
+are reported in FastAPI's usual 422 format.
+
+Encoding and decoding use orjson.
+"""
+import time
+from typing import Any, Callable, Dict, Type, TypeVar, Union
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+import orjson
+from .metrics import track_stage
+from .tracing import record_span
+
+Model = TypeVar("Model", bound=BaseModel)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON."""
+    return orjson.dumps(content)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode JSON.
+
+    Raises:
+        ValueError: If data is not valid JSON
+    """
+    return orjson.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps(), timed as the serialization stage."""
+
+    def render(self, content: Any) -> bytes:
+        with track_stage("serialization"):
+            return dumps(content)
+
+
+def json_body(model: Type[Model]) -> Callable[[Request], Any]:
+    """
+    Return a dependency that parses the request body into model straight from JSON bytes.
+
+    Raises:
+        RequestValidationError: If the body is not valid JSON or does not match model
+    """
+    async def parse(request: Request) -> Model:
+        body = await request.body()
+        start = time.perf_counter()
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as e:
+            errors = e.errors(include_url=False)
+            for error in errors:
+                error["loc"] = ("body", *error["loc"])
+                # Validator exceptions are not JSON serializable
+                if "ctx" in error:
+                    error["ctx"] = {key: str(value) for key, value in error["ctx"].items()}
+            raise RequestValidationError(errors, body=body)
+        finally:
+            record_span("body_parse", start)
+
+    return parse
+
+
+def _inline_refs(node: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/$defs/"):
+            return _inline_refs(defs[ref[len("#/$defs/"):]], defs)
+        return {key: _inline_refs(value, defs) for key, value in node.items() if key != "$defs"}
+    if isinstance(node, list):
+        return [_inline_refs(value, defs) for value in node]
+    return node
+
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Return openapi_extra documenting model as the request body of a json_body() route."""
+    schema = model.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": _inline_refs(schema, schema.get("$defs", {}))}}
+        }
+    }
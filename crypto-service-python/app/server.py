@@ -0,0 +1,250 @@
+# server.py
+"""
+Multi-process server entry point.
+
+    python -m app.server [--host 0.0.0.0] [--port 8002] [--workers N]
+
+The parent process loads the settings, builds the cipher and imports the
+application once, binds the listening socket, and then forks
+WEB_CONCURRENCY workers (default: the number of usable cores). Workers
+accept on the shared socket and inherit the initialized state
+copy-on-write. Anything that owns threads, processes or file handles is
+created lazily in each worker after the fork: the log writer, the crypto
+executor pool, the health monitor and the envelope key store.
+
+A worker exits gracefully after WORKER_MAX_REQUESTS requests, plus a
+random 0..WORKER_MAX_REQUESTS_JITTER so that workers do not all recycle
+together. It stops accepting first and answers every request on the
+connections it has already accepted; new connections wait on the shared
+socket for the other workers. The parent then starts a replacement,
+which caps slow memory growth. Crashed workers are replaced the same way.
+
+Prometheus samples are written to PROMETHEUS_MULTIPROC_DIR (a temporary
+directory when unset), so /metrics on any worker reports the sum over
+all workers. Live gauges of exited workers are dropped. Each worker has
+its own crypto executor pool of CRYPTO_EXECUTOR_WORKERS threads. In-memory
+caches are per worker and warm independently: verified JWTs, envelope
+data keys and field schemas registered by schema_id. A client that sends
+only a schema_id may reach a worker that has not seen it yet, and then
+gets a 400 and must resend the field paths.
+
+With one worker, or on platforms without fork, uvicorn runs directly.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import signal
+import tempfile
+import time
+from typing import Dict, List, Optional
+import uvicorn
+from .config import preload_settings
+from .logger import setup_logger, shutdown_logging
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+# A worker that exits sooner than this after starting is treated as
+# crashing on startup, and its replacement is delayed
+MIN_WORKER_LIFETIME = 1.0
+
+# How long an exiting worker waits for requests on connections it has
+# accepted but not read a request from yet
+DRAIN_TIMEOUT = 1.0
+
+
+def _prepare_metrics_dir() -> Optional[str]:
+    """
+    Point prometheus_client at an empty multiprocess directory.
+
+    Must run before prometheus_client is imported. Returns the directory
+    if it was created here (and should be removed on exit).
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        # Samples left by a previous run would be added to this one
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith(".db"):
+                os.remove(os.path.join(path, name))
+        return None
+    path = tempfile.mkdtemp(prefix="crypto-metrics-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+class WorkerServer(uvicorn.Server):
+    """
+    uvicorn server that drains its accepted connections before exiting.
+
+    On shutdown uvicorn closes every connection that has no request in
+    progress. A connection accepted just before the request limit was
+    reached may not have delivered its request yet, and closing it drops
+    that request without a response. This server stops accepting, then
+    waits up to DRAIN_TIMEOUT for such connections to start their
+    request, which uvicorn answers before the worker exits.
+
+    This uses uvicorn internals (Server.servers, ServerState.connections
+    and the protocols' cycle attribute), so requirements.txt pins uvicorn
+    to the minor version it was written against.
+    """
+
+    async def shutdown(self, sockets: Optional[List] = None):
+        for server in self.servers:
+            server.close()
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        while True:
+            # Lets sockets accepted before the close get their protocol and read
+            await asyncio.sleep(0.01)
+            waiting = [c for c in self.server_state.connections if c.cycle is None]
+            if not waiting or time.monotonic() >= deadline:
+                break
+        await super().shutdown(sockets)
+
+
+class Supervisor:
+    """
+    Forks the workers, replaces those that exit, and stops them on SIGTERM/SIGINT.
+
+    The first signal asks workers to shut down gracefully; a second one
+    kills them.
+    """
+
+    def __init__(self, config, sock, workers: int, max_requests: int = 0, jitter: int = 0):
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self):
+        if self.max_requests > 0:
+            self.config.limit_max_requests = self.max_requests + random.randint(0, max(0, self.jitter))
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def _run_worker(self):
+        code = 0
+        try:
+            # Inherited from the parent; uvicorn installs its own handlers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            WorkerServer(self.config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+            code = 1
+        finally:
+            shutdown_logging()
+            # Skip the parent's atexit handlers (e.g. metrics directory cleanup)
+            os._exit(code)
+
+    def _signal(self, signum, frame):
+        sig = signal.SIGKILL if self.stopping else signal.SIGTERM
+        self.stopping = True
+        logger.info(f"Received {signal.Signals(signum).name}, stopping {len(self.children)} workers")
+        for pid in self.children:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self, pid: int, status: int):
+        started = self.children.pop(pid, None)
+        if started is None:
+            return
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+        code = os.waitstatus_to_exitcode(status)
+        if self.stopping:
+            return
+        if code == 0:
+            logger.info(f"Worker {pid} exited after its request limit, replacing it")
+        else:
+            logger.warning(f"Worker {pid} exited with status {code}, replacing it")
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+        self.spawn()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._signal)
+        signal.signal(signal.SIGINT, self._signal)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self._reap(pid, status)
+        logger.info("All workers stopped")
+
+
+def serve(host: str = "0.0.0.0", port: int = 8002, workers: Optional[int] = None):
+    """
+    Run the service with the given number of worker processes.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        workers: Worker processes (default: WEB_CONCURRENCY)
+    """
+    settings = preload_settings()
+    workers = workers or settings.web_concurrency
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need fork(); running a single worker")
+        workers = 1
+
+    # Before the app (and with it prometheus_client) is imported
+    cleanup_dir = _prepare_metrics_dir() if workers > 1 else None
+    try:
+        if workers > 1 and settings.envelope_key_store == ":memory:":
+            logger.warning("ENVELOPE_KEY_STORE=:memory: is not shared between workers; "
+                           "envelope data keys will only be readable by the worker that created them")
+
+        from .main import app
+        from .metrics import mark_started
+
+        # The parent's gauge file counts too; without this it reports 0
+        mark_started()
+
+        config = uvicorn.Config(app, host=host, port=port)
+        if workers == 1:
+            # Without a supervisor to replace it, a single worker is not recycled
+            uvicorn.Server(config).run()
+            return
+
+        config.load()
+        sock = config.bind_socket()
+        logger.info(f"Starting {workers} workers on {host}:{port}")
+        Supervisor(
+            config,
+            sock,
+            workers,
+            max_requests=settings.worker_max_requests,
+            jitter=settings.worker_max_requests_jitter
+        ).run()
+        sock.close()
+    finally:
+        if cleanup_dir is not None:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the crypto service")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8002")))
+    parser.add_argument("--workers", type=int, help="Worker processes (default: WEB_CONCURRENCY or the core count)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
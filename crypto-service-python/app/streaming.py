@@ -0,0 +1,349 @@
+# streaming.py
+"""
+Chunked streaming encryption for payloads too large to buffer.
+
+Framing format (all integers are unsigned big-endian):
+
+    stream  = header || frame_0 || frame_1 || ... || frame_n
+    header  = magic "SCS2" (4 bytes) || chunk_size (4 bytes) || salt (16 bytes) || nonce_prefix (7 bytes)
+    frame_i = length (4 bytes) || AES-256-GCM ciphertext_i (length bytes, includes 16-byte tag)
+
+Every frame holds at most chunk_size bytes of plaintext and is sealed with
+
+    key     = HKDF-SHA256(Fernet key, salt, "crypto-service stream v2")
+    nonce_i = nonce_prefix || i (4 bytes) || last (1 byte, 0x01 on frame_n, else 0x00)
+    aad     = header
+
+so each frame can be authenticated on its own as soon as it arrives.
+Reordered or replayed frames fail authentication because their index does
+not match, and a stream cut off before the frame flagged as last is
+rejected as truncated. An empty input still produces one (empty) final
+frame.
+
+Each stream has its own AES key, derived from the newest Fernet key and
+a random salt, so no extra secret has to be provisioned and nonces only
+have to be unique within one stream. (With one key shared by all
+streams, random 56-bit nonce prefixes would be expected to collide after
+about 2^28 streams.) Decryption accepts a key derived from any key in
+the ring; the first frame selects which one.
+
+Streams in the earlier "SCS1" format, which has no salt and uses one
+HKDF-derived key per Fernet key, are still decrypted.
+
+Frames of at least CRYPTO_OFFLOAD_THRESHOLD bytes are sealed and opened
+on the crypto executor, like the buffered endpoints.
+"""
+import os
+import struct
+from functools import lru_cache, partial
+from typing import AsyncIterator, List, Optional
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from . import crypto
+from .config import get_settings
+from .executor import get_crypto_executor
+from .logger import setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+MAGIC = b"SCS2"
+LEGACY_MAGIC = b"SCS1"
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+HEADER_SIZE = len(MAGIC) + 4 + SALT_SIZE + NONCE_PREFIX_SIZE
+LEGACY_HEADER_SIZE = len(LEGACY_MAGIC) + 4 + NONCE_PREFIX_SIZE
+TAG_SIZE = 16
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_FRAMES = 2 ** 32
+
+_LENGTH = struct.Struct(">I")
+
+
+@lru_cache(maxsize=4)
+def _derive_legacy_key(key: str) -> bytes:
+    """Derive the AES-256-GCM key shared by every SCS1 stream under a Fernet key."""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"crypto-service stream v1",
+    ).derive(key.encode())
+
+
+def _derive_stream_key(key: str, salt: bytes) -> bytes:
+    """Derive the AES-256-GCM key of one stream from a Fernet key and the stream's salt."""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"crypto-service stream v2",
+    ).derive(key.encode())
+
+
+def _stream_keys(header: bytes, keys: List[str]) -> List[bytes]:
+    """Return the AES keys a stream with header may be sealed under, one per key in the ring."""
+    if header.startswith(LEGACY_MAGIC):
+        return [_derive_legacy_key(key) for key in keys]
+    salt = header[len(MAGIC) + 4:len(MAGIC) + 4 + SALT_SIZE]
+    return [_derive_stream_key(key, salt) for key in keys]
+
+
+@lru_cache(maxsize=64)
+def _aead(key: bytes) -> AESGCM:
+    return AESGCM(key)
+
+
+def encrypt_stream_chunk(key: bytes, nonce: bytes, aad: bytes, data: bytes) -> bytes:
+    """Seal one frame; module-level so the crypto executor can run it in any pool."""
+    return _aead(key).encrypt(nonce, data, aad)
+
+
+def decrypt_stream_chunk(key: bytes, nonce: bytes, aad: bytes, sealed: bytes) -> Optional[bytes]:
+    """Open one frame, or return None if it does not authenticate under key."""
+    try:
+        return _aead(key).decrypt(nonce, sealed, aad)
+    except InvalidTag:
+        return None
+
+
+def get_stream_keys() -> List[str]:
+    """
+    Return the Fernet key ring that stream keys are derived from.
+
+    The first key encrypts; any of them may decrypt.
+
+    Raises:
+        HTTPException: If the cipher is not configured
+    """
+    keys = get_settings().fernet_keys
+    if crypto._get_cipher() is None or not keys:
+        logger.error("Cipher not configured - streaming cannot proceed")
+        raise HTTPException(
+            status_code=503,
+            detail="Encryption service not properly configured"
+        )
+    for key in keys:
+        Fernet(key.encode())  # validates the key format
+    return list(keys)
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose generator is still reading the request body.
+
+    The stock StreamingResponse listens for client disconnects by calling
+    receive() concurrently with the generator, which would swallow request
+    body chunks the generator needs. Here the generator is the only reader;
+    a client that goes away surfaces as ClientDisconnect from
+    request.stream() or as an error on send.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index >= MAX_FRAMES:
+        raise HTTPException(status_code=413, detail="Stream has too many chunks")
+    return prefix + _LENGTH.pack(index) + (b"\x01" if last else b"\x00")
+
+
+async def encrypt_stream(
+    chunks: AsyncIterator[bytes],
+    key: str,
+    chunk_size: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Encrypt an async byte stream into the framed format.
+
+    Input is re-chunked to chunk_size, and one full chunk is held back so
+    the final frame can be flagged. Peak memory stays around two chunks no
+    matter how large the input is.
+
+    Args:
+        chunks: Plaintext byte chunks of any size
+        key: The encrypting Fernet key, get_stream_keys()[0]
+        chunk_size: Plaintext bytes per frame (default: STREAM_CHUNK_SIZE)
+
+    Yields:
+        The header, then one encoded frame at a time
+    """
+    if chunk_size is None:
+        chunk_size = get_settings().stream_chunk_size
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+
+    salt = os.urandom(SALT_SIZE)
+    prefix = os.urandom(NONCE_PREFIX_SIZE)
+    header = MAGIC + _LENGTH.pack(chunk_size) + salt + prefix
+    stream_key = _derive_stream_key(key, salt)
+    executor = get_crypto_executor()
+
+    async def seal(data: bytes, index: int, last: bool) -> bytes:
+        sealed = await executor.run(
+            partial(encrypt_stream_chunk, stream_key, _nonce(prefix, index, last), header), data, len(data)
+        )
+        return _LENGTH.pack(len(sealed)) + sealed
+
+    yield header
+
+    index = 0
+    total = 0
+    buffer = bytearray()
+    pending: Optional[bytes] = None
+
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= chunk_size:
+            if pending is not None:
+                yield await seal(pending, index, False)
+                index += 1
+            pending = bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+            total += chunk_size
+
+    if pending is not None and buffer:
+        yield await seal(pending, index, False)
+        index += 1
+        pending = None
+
+    total += len(buffer)
+    final = pending if pending is not None else bytes(buffer)
+    yield await seal(final, index, True)
+
+    logger.debug(f"Successfully encrypted stream ({total} bytes in {index + 1} chunks)")
+
+
+class StreamReader:
+    """Reads exact byte counts from an async chunk iterator."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = bytearray()
+        self._exhausted = False
+
+    async def _fill(self, size: int):
+        while len(self._buffer) < size and not self._exhausted:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+
+    async def read_exact(self, size: int) -> Optional[bytes]:
+        """Return exactly size bytes, or None if the stream ends first."""
+        await self._fill(size)
+        if len(self._buffer) < size:
+            return None
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def at_eof(self) -> bool:
+        """True once every byte of the stream has been consumed."""
+        await self._fill(1)
+        return not self._buffer
+
+
+async def read_stream_header(reader: StreamReader) -> bytes:
+    """
+    Read and validate the stream header.
+
+    Raises:
+        HTTPException: If the header is missing or malformed
+    """
+    magic = await reader.read_exact(len(MAGIC))
+    size = {MAGIC: HEADER_SIZE, LEGACY_MAGIC: LEGACY_HEADER_SIZE}.get(magic)
+    rest = await reader.read_exact(size - len(magic)) if size is not None else None
+    if rest is None:
+        logger.warning("Stream decryption attempted with invalid header")
+        raise HTTPException(status_code=400, detail="Invalid stream header")
+    header = magic + rest
+
+    chunk_size = _LENGTH.unpack_from(header, len(MAGIC))[0]
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        logger.warning(f"Stream header declares unsupported chunk size {chunk_size}")
+        raise HTTPException(status_code=400, detail="Invalid stream header")
+    return header
+
+
+async def decrypt_stream(
+    reader: StreamReader,
+    header: bytes,
+    keys: List[str]
+) -> AsyncIterator[bytes]:
+    """
+    Decrypt frames following a header read by read_stream_header.
+
+    Each frame is authenticated before its plaintext is yielded. Because the
+    response may already be under way, failures are raised as HTTPException
+    and abort the stream; callers must treat an incomplete body as an error.
+
+    Args:
+        reader: The stream, positioned after the header
+        header: The header returned by read_stream_header
+        keys: The Fernet key ring, get_stream_keys()
+
+    Yields:
+        Plaintext chunks in order
+    """
+    chunk_size = _LENGTH.unpack_from(header, len(MAGIC))[0]
+    prefix = header[-NONCE_PREFIX_SIZE:]
+    candidates = _stream_keys(header, keys)
+    executor = get_crypto_executor()
+    index = 0
+    total = 0
+
+    while True:
+        length_bytes = await reader.read_exact(4)
+        if length_bytes is None:
+            logger.warning("Stream ended before the final chunk")
+            raise HTTPException(status_code=400, detail="Truncated stream")
+
+        length = _LENGTH.unpack(length_bytes)[0]
+        if not TAG_SIZE <= length <= chunk_size + TAG_SIZE:
+            logger.warning(f"Stream chunk {index} has invalid length {length}")
+            raise HTTPException(status_code=400, detail="Invalid or tampered ciphertext")
+
+        sealed = await reader.read_exact(length)
+        if sealed is None:
+            logger.warning("Stream ended in the middle of a chunk")
+            raise HTTPException(status_code=400, detail="Truncated stream")
+
+        last = await reader.at_eof()
+        nonce = _nonce(prefix, index, last)
+        plaintext = None
+        for candidate in candidates:
+            plaintext = await executor.run(
+                partial(decrypt_stream_chunk, candidate, nonce, header), sealed, len(sealed)
+            )
+            if plaintext is not None:
+                # Later frames must use the key that opened the first one
+                candidates = [candidate]
+                break
+
+        if plaintext is None:
+            logger.warning(f"Stream chunk {index} failed authentication")
+            detail = "Truncated or tampered stream" if last else "Invalid or tampered ciphertext"
+            raise HTTPException(status_code=400, detail=detail)
+
+        total += len(plaintext)
+        if plaintext:
+            yield plaintext
+        if last:
+            break
+        index += 1
+
+    logger.debug(f"Successfully decrypted stream ({total} bytes in {index + 1} chunks)")
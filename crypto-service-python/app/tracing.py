@@ -0,0 +1,338 @@
+# tracing.py
+"""
+Request correlation and distributed tracing.
+
+Every HTTP request gets a trace context. It comes from an incoming W3C
+traceparent header, e.g. from the API gateway, or is generated when the
+header is missing or malformed. A request id comes from X-Request-ID,
+when that is a safe token, and otherwise equals the trace id. Every
+response carries both headers back. The request id and trace id are also
+added to every log line written while the request is handled.
+
+Sampled requests also record spans: the request itself plus one child
+span per processing stage (jwt_verify, body_parse, crypto,
+serialization, ...). The spans are handed to the configured exporter
+once the response is sent:
+
+- TRACE_EXPORTER=none (default): nothing is recorded
+- TRACE_EXPORTER=file: JSON lines appended to TRACE_FILE by a background thread
+- TRACE_EXPORTER=memory: kept in memory (tests, debugging)
+- TRACE_EXPORTER=package.module:factory: a custom SpanExporter
+
+Sampling is parent-based. A request whose traceparent has the sampled
+flag is always recorded, and one without a traceparent is recorded with
+probability TRACE_SAMPLE_RATE. An unsampled request costs an id, two
+response headers and a context variable lookup per stage.
+"""
+import atexit
+import contextvars
+import importlib
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import get_settings
+from .logger import log_context, setup_logger
+
+# Setup logger for this module
+logger = setup_logger(__name__)
+
+_TRACEPARENT = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?")
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._:\-]{1,128}")
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{secrets.randbits(bits) or 1:0{bits // 4}x}"
+
+
+def parse_traceparent(value: str):
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        (trace_id, parent_id, sampled), or None if the header is invalid
+    """
+    match = _TRACEPARENT.fullmatch(value.strip())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest) or set(trace_id) == {"0"} or set(parent_id) == {"0"}:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+@dataclass
+class Span:
+    """A finished span; times are Unix epoch nanoseconds."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class Trace:
+    """The trace context of one request, and its spans when sampled."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "sampled", "request_id", "spans", "_wall_ns", "_perf_start")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], sampled: bool, request_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.request_id = request_id or trace_id
+        self.spans: List[Span] = []
+        self._wall_ns = time.time_ns()
+        self._perf_start = time.perf_counter()
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def _to_ns(self, perf: float) -> int:
+        return self._wall_ns + int((perf - self._perf_start) * 1e9)
+
+    def add_span(self, name: str, start: float, end: float, **attributes):
+        """Record a child span of the request between two perf_counter() readings."""
+        self.spans.append(Span(
+            name, self.trace_id, _new_id(64), self.span_id, self._to_ns(start), self._to_ns(end), attributes
+        ))
+
+    def finish(self, name: str, **attributes) -> List[Span]:
+        """Close the request span and return all spans of the request."""
+        self.spans.append(Span(
+            name, self.trace_id, self.span_id, self.parent_id,
+            self._wall_ns, self._to_ns(time.perf_counter()), attributes
+        ))
+        return self.spans
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the request being handled, if any."""
+    return _current.get()
+
+
+def record_span(name: str, start: float, end: Optional[float] = None):
+    """Record a stage span on the current request if it is sampled; otherwise a no-op."""
+    trace = _current.get()
+    if trace is not None and trace.sampled:
+        trace.add_span(name, start, time.perf_counter() if end is None else end)
+
+
+class SpanExporter:
+    """Receives the spans of each sampled request. Must not block."""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        """Flush and release resources."""
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the most recent spans in memory."""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(spans)
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """
+    Appends spans to a file as JSON lines, from a background thread.
+
+    Like the log queue, a full queue drops spans instead of blocking
+    request handling. The thread is started on first use in each process.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def export(self, spans: List[Span]):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A thread started before fork does not exist in the child
+            self._queue = queue.Queue(self._queue.maxsize)
+            self._thread = threading.Thread(target=self._write, name="span-exporter", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _write(self):
+        with open(self.path, "a", encoding="utf-8") as out:
+            while True:
+                spans = self._queue.get()
+                if spans is None:
+                    return
+                for span in spans:
+                    out.write(json.dumps(span.to_dict(), default=str) + "\n")
+                if self._queue.empty():
+                    out.flush()
+
+    def shutdown(self):
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+            self._pid = None
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_loaded = False
+
+
+def _build_exporter(name: str, path: str) -> Optional[SpanExporter]:
+    if name == "none":
+        return None
+    if name == "memory":
+        return InMemoryExporter()
+    if name == "file":
+        return FileExporter(path)
+    module, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown TRACE_EXPORTER {name!r}: expected none, file, memory or module:factory")
+    factory: Callable[[], SpanExporter] = getattr(importlib.import_module(module), attr)
+    return factory()
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    """Return the configured span exporter, or None when tracing is off."""
+    global _exporter, _exporter_loaded
+    if not _exporter_loaded:
+        settings = get_settings()
+        try:
+            _exporter = _build_exporter(settings.trace_exporter, settings.trace_file)
+        except (ImportError, AttributeError, ValueError) as e:
+            logger.error(f"Tracing disabled: cannot load exporter {settings.trace_exporter!r}: {e}")
+            _exporter = None
+        _exporter_loaded = True
+    return _exporter
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Replace the span exporter, e.g. with a custom one at startup."""
+    global _exporter, _exporter_loaded
+    _exporter = exporter
+    _exporter_loaded = True
+
+
+def shutdown_tracing():
+    """Flush and close the span exporter."""
+    if _exporter is not None:
+        _exporter.shutdown()
+
+
+def start_trace(traceparent: Optional[str], request_id: Optional[str], sample: bool) -> Trace:
+    """
+    Build the trace context for a request from its headers.
+
+    Args:
+        traceparent: The incoming traceparent header, if any
+        request_id: The incoming X-Request-ID header, if any
+        sample: Whether tracing is on at all (an exporter is configured)
+    """
+    parent = parse_traceparent(traceparent) if traceparent else None
+    if request_id is not None and not _REQUEST_ID.fullmatch(request_id):
+        request_id = None
+    if parent is None:
+        sampled = sample and random.random() < get_settings().trace_sample_rate
+        return Trace(_new_id(128), None, sampled, request_id)
+    trace_id, parent_id, sampled = parent
+    return Trace(trace_id, parent_id, sample and sampled, request_id)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that sets up the trace context of each HTTP request.
+
+    Args:
+        app: The wrapped application
+        route_label: Maps a request scope to its route label, as used for metrics
+    """
+
+    def __init__(self, app: ASGIApp, route_label: Callable[[Scope], str]):
+        self.app = app
+        self.route_label = route_label
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = request_id = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+            elif name == b"x-request-id":
+                request_id = value.decode("latin-1")
+
+        exporter = get_exporter()
+        trace = start_trace(traceparent, request_id, exporter is not None)
+        status_code = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", trace.request_id.encode("latin-1")))
+                headers.append((b"traceparent", trace.traceparent.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        trace_token = _current.set(trace)
+        log_token = log_context.set({"request_id": trace.request_id, "trace_id": trace.trace_id})
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            log_context.reset(log_token)
+            _current.reset(trace_token)
+            if trace.sampled:
+                route = self.route_label(scope)
+                spans = trace.finish(
+                    f"{scope['method']} {route}",
+                    method=scope["method"],
+                    route=route,
+                    status=status_code,
+                    request_id=trace.request_id
+                )
+                try:
+                    exporter.export(spans)
+                except Exception as e:
+                    logger.error(f"Span export failed: {type(e).__name__}: {str(e)}")
@@ -0,0 +1,94 @@
+# bench_channel.py
+"""
+Per-operation latency of /encrypt over HTTP versus the /ws channel.
+
+A single-worker server is started on a local port and driven over real
+connections:
+
+    http            sequential POST /encrypt on one keep-alive connection
+    ws_sequential   one operation in flight on one WebSocket
+    ws_pipelined    --window operations in flight on one WebSocket
+
+Usage:
+    python -m benchmarks.bench_channel [--requests 2000] [--window 32] [--size 64] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import websockets
+from . import common
+
+
+async def _http(url: str, headers: dict, requests: int, size: int) -> dict:
+    payload = {"plaintext": "x" * size}
+    samples = []
+    async with httpx.AsyncClient(base_url=url, headers=headers) as client:
+        await client.post("/encrypt", json=payload)  # warm up
+        start = time.perf_counter()
+        for _ in range(requests):
+            begin = time.perf_counter()
+            response = await client.post("/encrypt", json=payload)
+            samples.append(time.perf_counter() - begin)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+    return {"ops_per_sec": round(requests / elapsed, 2), "latency": common.percentiles(samples)}
+
+
+async def _ws(url: str, token: str, requests: int, size: int, window: int) -> dict:
+    message = {"op": "encrypt", "data": "x" * size}
+    sent_at = {}
+    samples = []
+    async with websockets.connect(f"{url}/ws?token={token}", max_size=None) as ws:
+        await ws.send(json.dumps(dict(message, id=-1)))
+        await ws.recv()  # warm up
+        start = time.perf_counter()
+        next_id = 0
+        while next_id < min(window, requests):
+            sent_at[next_id] = time.perf_counter()
+            await ws.send(json.dumps(dict(message, id=next_id)))
+            next_id += 1
+        for _ in range(requests):
+            reply = json.loads(await ws.recv())
+            samples.append(time.perf_counter() - sent_at.pop(reply["id"]))
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            if next_id < requests:
+                sent_at[next_id] = time.perf_counter()
+                await ws.send(json.dumps(dict(message, id=next_id)))
+                next_id += 1
+        elapsed = time.perf_counter() - start
+    return {"ops_per_sec": round(requests / elapsed, 2), "latency": common.percentiles(samples)}
+
+
+def run(requests: int = 2000, window: int = 32, size: int = 64) -> dict:
+    token = common.mint_token()
+    port = common.free_port()
+    server = common.start_server(1, port)
+    try:
+        results = {
+            "http": asyncio.run(_http(f"http://127.0.0.1:{port}", common.auth_headers(), requests, size)),
+            "ws_sequential": asyncio.run(_ws(f"ws://127.0.0.1:{port}", token, requests, size, 1)),
+            "ws_pipelined": asyncio.run(_ws(f"ws://127.0.0.1:{port}", token, requests, size, window)),
+        }
+    finally:
+        common.stop_server(server)
+    return {"requests": requests, "window": window, "payload_bytes": size, **results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP versus WebSocket channel latency")
+    parser.add_argument("--requests", type=int, default=2000, help="Operations per scenario")
+    parser.add_argument("--window", type=int, default=32, help="Operations in flight when pipelined")
+    parser.add_argument("--size", type=int, default=64, help="Plaintext bytes")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/channel-<rev>.json)")
+    args = parser.parse_args()
+
+    results = run(args.requests, args.window, args.size)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('channel', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench_crypto.py
+"""
+Function-level benchmark of encrypt_data and decrypt_data.
+
+Measures throughput across payload sizes with no HTTP or auth involved.
+
+Usage:
+    python -m benchmarks.bench_crypto [--sizes 64,1024,65536] [--min-time 0.5] [--output FILE]
+"""
+import argparse
+import json
+import time
+from . import common
+from app.crypto import encrypt_data, decrypt_data
+
+
+def _measure(func, arg, min_time: float) -> dict:
+    """Run func(arg) repeatedly for at least min_time seconds."""
+    func(arg)  # warm up
+    iterations = 0
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - start)
+        iterations += 1
+    total = sum(samples)
+    return {
+        "ops_per_sec": round(iterations / total, 2),
+        "latency": common.percentiles(samples),
+    }
+
+
+def run(sizes=common.PAYLOAD_SIZES, min_time: float = 0.5) -> dict:
+    results = {}
+    for size in sizes:
+        plaintext = "x" * size
+        ciphertext = encrypt_data(plaintext)
+        encrypt = _measure(encrypt_data, plaintext, min_time)
+        decrypt = _measure(decrypt_data, ciphertext, min_time)
+        for stats in (encrypt, decrypt):
+            stats["mb_per_sec"] = round(stats["ops_per_sec"] * size / 1e6, 2)
+        results[str(size)] = {
+            "encrypt_data": encrypt,
+            "decrypt_data": decrypt,
+            "ciphertext_bytes": len(ciphertext),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Function-level crypto benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, common.PAYLOAD_SIZES)),
+                        help="Comma-separated payload sizes in bytes")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="Seconds to spend per measurement")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/crypto-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.min_time)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('crypto', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_endpoints.py
+"""
+Endpoint-level benchmark driving the ASGI app in-process.
+
+Requests go through httpx's ASGI transport, so the full FastAPI stack
+(middleware, JWT verification, validation, serialization) is measured
+without a network or the external auth service. Tokens are minted
+locally from JWT_SECRET.
+
+Usage:
+    python -m benchmarks.bench_endpoints [--sizes 64,1024] [--requests 500] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from . import common
+from app.main import app
+
+
+async def _measure(client: httpx.AsyncClient, method: str, url: str, requests: int, **kwargs) -> dict:
+    await client.request(method, url, **kwargs)  # warm up
+    samples = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        samples.append(time.perf_counter() - t0)
+        response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {"requests_per_sec": round(requests / elapsed, 2), "latency": common.percentiles(samples)}
+
+
+async def run_async(sizes=(64, 1024, 64 * 1024), requests: int = 500) -> dict:
+    headers = common.auth_headers()
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        results["health"] = await _measure(client, "GET", "/health", requests)
+        for size in sizes:
+            plaintext = "x" * size
+            encrypted = await client.post("/encrypt", json={"plaintext": plaintext})
+            ciphertext = encrypted.json()["ciphertext"]
+            results[str(size)] = {
+                "encrypt": await _measure(client, "POST", "/encrypt", requests,
+                                          json={"plaintext": plaintext}),
+                "decrypt": await _measure(client, "POST", "/decrypt", requests,
+                                          json={"ciphertext": ciphertext}),
+            }
+    return results
+
+
+def run(sizes=(64, 1024, 64 * 1024), requests: int = 500) -> dict:
+    return asyncio.run(run_async(sizes, requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint-level ASGI benchmark")
+    parser.add_argument("--sizes", default="64,1024,65536",
+                        help="Comma-separated plaintext sizes in bytes")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="Sequential requests per measurement")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/endpoints-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.requests)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('endpoints', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
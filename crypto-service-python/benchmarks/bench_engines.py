@@ -0,0 +1,65 @@
+# bench_engines.py
+"""
+Compares the cipher engines on throughput and output size.
+
+Each engine is driven through app.crypto (encrypt_bytes/decrypt_bytes), so
+the numbers include header handling but no HTTP, auth or JSON.
+
+Usage:
+    python -m benchmarks.bench_engines [--sizes 64,1024,65536] [--min-time 0.5] [--output FILE]
+"""
+import argparse
+import dataclasses
+import json
+from . import common
+from .bench_crypto import _measure
+from app import config
+from app.crypto import decrypt_bytes, encrypt_bytes
+from app.engines import ENGINES
+
+
+def run(sizes=common.PAYLOAD_SIZES, min_time: float = 0.5, engines=tuple(ENGINES)) -> dict:
+    original = config.get_settings()
+    results = {}
+    try:
+        for name in engines:
+            config._settings = dataclasses.replace(original, crypto_engine=name)
+            per_size = {}
+            for size in sizes:
+                plaintext = b"x" * size
+                ciphertext = encrypt_bytes(plaintext)
+                encrypt = _measure(encrypt_bytes, plaintext, min_time)
+                decrypt = _measure(decrypt_bytes, ciphertext, min_time)
+                for stats in (encrypt, decrypt):
+                    stats["mb_per_sec"] = round(stats["ops_per_sec"] * size / 1e6, 2)
+                per_size[str(size)] = {
+                    "encrypt": encrypt,
+                    "decrypt": decrypt,
+                    "ciphertext_bytes": len(ciphertext),
+                    "overhead_ratio": round(len(ciphertext) / size, 3),
+                }
+            results[name] = per_size
+    finally:
+        config._settings = original
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cipher engine comparison")
+    parser.add_argument("--sizes", default=",".join(map(str, common.PAYLOAD_SIZES)),
+                        help="Comma-separated payload sizes in bytes")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="Seconds to spend per measurement")
+    parser.add_argument("--engines", default=",".join(ENGINES),
+                        help="Comma-separated engine names")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/engines-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.min_time, args.engines.split(","))
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('engines', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_load.py
+"""
+Concurrent load scenario against the in-process ASGI app.
+
+A fixed number of concurrent clients send /encrypt requests back to back
+for a fixed duration; throughput and p50/p99 latency are reported.
+
+Usage:
+    python -m benchmarks.bench_load [--concurrency 32] [--duration 10] [--size 1024] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from . import common
+from app.main import app
+
+
+async def run_async(concurrency: int = 32, duration: float = 10.0, size: int = 1024) -> dict:
+    headers = common.auth_headers()
+    payload = {"plaintext": "x" * size}
+    samples = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        await client.post("/encrypt", json=payload)  # warm up
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/encrypt", json=payload)
+                samples.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "payload_bytes": size,
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "latency": common.percentiles(samples),
+    }
+
+
+def run(concurrency: int = 32, duration: float = 10.0, size: int = 1024) -> dict:
+    return asyncio.run(run_async(concurrency, duration, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load benchmark")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--size", type=int, default=1024, help="Plaintext bytes")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run(args.concurrency, args.duration, args.size)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('load', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
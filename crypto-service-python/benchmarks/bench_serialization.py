@@ -0,0 +1,101 @@
+# bench_serialization.py
+"""
+Per-request JSON cost of the /encrypt, /decrypt and batch endpoints,
+before and after app.serialization.
+
+Responses:
+    model       build the response model, validate it, dump it to JSON and
+                wrap it in a Response (FastAPI's path for a route with a
+                response_model)
+    fast        FastJSONResponse of a plain dict (orjson)
+
+Batch requests (100 items per request):
+    stdlib      json.loads and then model validation (FastAPI's body parsing)
+    json_body   model_validate_json on the raw bytes
+
+Usage:
+    python -m benchmarks.bench_serialization [--sizes 64,1024,65536] [--min-time 0.5] [--output FILE]
+"""
+import argparse
+import json
+from fastapi import Response
+from pydantic import TypeAdapter
+from . import common
+from .bench_crypto import _measure
+from app.crypto import encrypt_data
+from app.schemas import BatchEncryptRequest, DecryptResponse, EncryptResponse
+from app.serialization import FastJSONResponse
+
+BATCH_ITEMS = 100
+
+
+def _model_path(model, field: str):
+    adapter = TypeAdapter(model)
+
+    def serialize(value: str) -> bytes:
+        content = adapter.dump_json(adapter.validate_python(model(**{field: value})))
+        return Response(content=content, media_type="application/json").body
+    return serialize
+
+
+def _fast_path(field: str):
+    def serialize(value: str) -> bytes:
+        return FastJSONResponse({field: value}).body
+    return serialize
+
+
+def _speedup(before: dict, after: dict) -> float:
+    return round(after["ops_per_sec"] / before["ops_per_sec"], 2)
+
+
+def run(sizes=common.PAYLOAD_SIZES, min_time: float = 0.5) -> dict:
+    results = {"encoder": "orjson"}
+    for size in sizes:
+        plaintext = "x" * size
+        ciphertext = encrypt_data(plaintext)
+        batch = json.dumps({"items": [{"id": str(i), "plaintext": plaintext} for i in range(BATCH_ITEMS)]}).encode()
+
+        encrypt_model = _measure(_model_path(EncryptResponse, "ciphertext"), ciphertext, min_time)
+        encrypt_fast = _measure(_fast_path("ciphertext"), ciphertext, min_time)
+        decrypt_model = _measure(_model_path(DecryptResponse, "plaintext"), plaintext, min_time)
+        decrypt_fast = _measure(_fast_path("plaintext"), plaintext, min_time)
+        batch_stdlib = _measure(lambda body: BatchEncryptRequest.model_validate(json.loads(body)), batch, min_time)
+        batch_json_body = _measure(BatchEncryptRequest.model_validate_json, batch, min_time)
+
+        results[str(size)] = {
+            "encrypt_response": {
+                "model": encrypt_model,
+                "fast": encrypt_fast,
+                "speedup": _speedup(encrypt_model, encrypt_fast),
+            },
+            "decrypt_response": {
+                "model": decrypt_model,
+                "fast": decrypt_fast,
+                "speedup": _speedup(decrypt_model, decrypt_fast),
+            },
+            "batch_request": {
+                "stdlib": batch_stdlib,
+                "json_body": batch_json_body,
+                "speedup": _speedup(batch_stdlib, batch_json_body),
+            },
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, common.PAYLOAD_SIZES)),
+                        help="Comma-separated payload sizes in bytes")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="Seconds to spend per measurement")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/serialization-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.min_time)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('serialization', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
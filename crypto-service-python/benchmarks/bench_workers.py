@@ -0,0 +1,125 @@
+# bench_workers.py
+"""
+Throughput scaling of the multi-process server (app.server) with the
+number of workers.
+
+For each worker count, the server is started as a subprocess on a local
+port and driven over real HTTP by several client processes (one client
+process cannot saturate more than about one server core). Reports
+throughput, p50/p99 latency and speedup relative to one worker.
+
+Scaling is bounded by the cores on the machine, and the client processes
+use some of them: on a machine with N cores expect near-linear scaling
+up to about N/2 workers.
+
+Usage:
+    python -m benchmarks.bench_workers [--workers 1,2,4] [--clients 4] [--concurrency 16]
+                                       [--duration 10] [--size 1024] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import httpx
+from . import common
+
+
+async def _client(url: str, headers: dict, concurrency: int, duration: float, size: int) -> tuple:
+    payload = {"plaintext": "x" * size}
+    samples = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/encrypt", json=payload)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                samples.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors
+
+
+def _client_process(args: tuple) -> tuple:
+    return asyncio.run(_client(*args))
+
+
+def run(
+    worker_counts=None,
+    clients: int = 4,
+    concurrency: int = 16,
+    duration: float = 10.0,
+    size: int = 1024
+) -> dict:
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    if not worker_counts:
+        worker_counts = sorted({1, 2, 4, max(1, cores // 2), cores} - {0})
+    headers = common.auth_headers()
+    results = []
+
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        for workers in worker_counts:
+            port = common.free_port()
+            server = common.start_server(workers, port)
+            try:
+                url = f"http://127.0.0.1:{port}"
+                # Warm up every worker's connections and caches
+                pool.map(_client_process, [(url, headers, concurrency, 1.0, size)] * clients)
+                start = time.perf_counter()
+                outputs = pool.map(_client_process, [(url, headers, concurrency, duration, size)] * clients)
+                elapsed = time.perf_counter() - start
+            finally:
+                common.stop_server(server)
+
+            samples = [sample for client_samples, _ in outputs for sample in client_samples]
+            results.append({
+                "workers": workers,
+                "requests": len(samples),
+                "errors": sum(errors for _, errors in outputs),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "latency": common.percentiles(samples),
+            })
+
+    baseline = results[0]["throughput_rps"] or 1
+    for result in results:
+        result["speedup"] = round(result["throughput_rps"] / baseline, 2)
+
+    return {
+        "cores": cores,
+        "clients": clients,
+        "concurrency_per_client": concurrency,
+        "duration_s": duration,
+        "payload_bytes": size,
+        "runs": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker scaling benchmark")
+    parser.add_argument("--workers", help="Comma-separated worker counts (default: 1, 2, 4, cores/2, cores)")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per worker count")
+    parser.add_argument("--size", type=int, default=1024, help="Plaintext bytes")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/workers-<rev>.json)")
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(",")] if args.workers else None
+    results = run(worker_counts, args.clients, args.concurrency, args.duration, args.size)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('workers', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
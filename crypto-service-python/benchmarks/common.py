@@ -0,0 +1,185 @@
+# common.py
+"""
+Shared helpers for the benchmark suite.
+
+Secrets come from the environment and .env, as for the service.
+Benchmarks that only drive the app in this process call
+use_local_secrets() to fall back to throwaway keys when none are set.
+Anything that talks to a server (one started here or a deployment) uses
+the configured secrets, so its tokens are signed with the server's
+JWT_SECRET.
+"""
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+SERVICE_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = SERVICE_ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(SERVICE_ROOT))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+PAYLOAD_SIZES = (64, 1024, 64 * 1024, 1024 * 1024)
+
+# Throwaway secrets for benchmarks that never leave this process
+LOCAL_FERNET_KEY = "AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA="
+LOCAL_JWT_SECRET = "benchmark_jwt_secret_for_local_token_minting"
+
+
+def use_local_secrets():
+    """
+    Fall back to throwaway FERNET_KEY and JWT_SECRET when neither the
+    environment nor .env sets them.
+
+    Only for benchmarks that drive the app in this process; call it
+    before the settings are first loaded.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv(SERVICE_ROOT / ".env")
+    if not (os.getenv("FERNET_KEYS") or os.getenv("FERNET_KEY")):
+        os.environ["FERNET_KEY"] = LOCAL_FERNET_KEY
+    if not os.getenv("JWT_SECRET"):
+        os.environ["JWT_SECRET"] = LOCAL_JWT_SECRET
+
+
+def mint_token(sub: str = "benchmark", role: str = "Admin", expires_in=timedelta(hours=1)) -> str:
+    """
+    Mint a JWT accepted by app.security, signed with the configured JWT_SECRET.
+
+    Exits with an error if no JWT_SECRET is configured.
+    """
+    from jose import jwt
+    from app.config import get_settings
+
+    settings = get_settings()
+    if not settings.jwt_secret:
+        sys.exit("JWT_SECRET is not set: export it or add it to .env, using the secret of the service under test")
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": sub,
+        "role": role,
+        "iss": settings.jwt_issuer,
+        "aud": settings.jwt_audience,
+        "iat": int(now.timestamp()),
+        "exp": int((now + expires_in).timestamp()),
+    }
+    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+
+
+def auth_headers() -> dict:
+    return {"Authorization": f"Bearer {mint_token()}"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    """
+    Start app.server with workers processes on port and wait until it answers.
+
+    The server reads its secrets from the environment and .env like any
+    deployment. Exits with an error if some are missing.
+    """
+    import httpx
+    from app.config import get_settings
+
+    missing = get_settings().missing_secrets()
+    if missing:
+        sys.exit(f"Cannot start a server: {', '.join(missing)} not set (export them or add them to .env)")
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), LOG_LEVEL="WARNING")
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=SERVICE_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Summarize latency samples (seconds) as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 4)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "p999_ms": pct(99.9),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SERVICE_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment() -> dict:
+    return {
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_results(name: str, results: dict, output: Optional[str] = None) -> Path:
+    """
+    Write results as JSON, tagged with the environment and git revision.
+
+    Defaults to benchmarks/results/<name>-<revision>.json so runs from
+    different commits can be compared with benchmarks.compare.
+    """
+    document = {"name": name, "environment": environment(), "results": results}
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{name}-{document['environment']['git_revision']}.json"
+    path.write_text(json.dumps(document, indent=2))
+    return path
@@ -0,0 +1,79 @@
+# compare.py
+"""
+Compares two benchmark result files and flags regressions.
+
+Throughput metrics (*_per_sec, *_rps) regress when they drop; latency and
+overhead metrics (*_ms, *_us*) regress when they grow. Exits with status 1
+if any metric moved the wrong way by more than the threshold.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+HIGHER_IS_BETTER = ("_per_sec", "_rps")
+LOWER_IS_BETTER = ("_ms", "_us_per_request")
+
+
+def _flatten(value, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flat.update(_flatten(child, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def _direction(key: str) -> Optional[int]:
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 0.10) -> list:
+    """Return (key, old, new, change, regressed) rows for comparable metrics."""
+    old = _flatten(baseline.get("results", baseline))
+    new = _flatten(candidate.get("results", candidate))
+    rows = []
+    for key in sorted(old.keys() & new.keys()):
+        direction = _direction(key)
+        if direction is None or old[key] == 0:
+            continue
+        change = (new[key] - old[key]) / old[key]
+        regressed = change * direction < -threshold
+        rows.append((key, old[key], new[key], change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    regressions = 0
+    for key, old, new, change, regressed in rows:
+        marker = "REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{key:70} {old:14.3f} -> {new:14.3f} {change:+8.1%} {marker}")
+
+    print(f"\n{len(rows)} metrics compared, {regressions} regressions over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
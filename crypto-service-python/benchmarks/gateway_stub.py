@@ -0,0 +1,161 @@
+# gateway_stub.py
+"""
+Lightweight stand-in for the API gateway hop, for load tests.
+
+Forwards every request to the crypto service the way
+api-gateway-dotnet's ProxyService.ForwardAsync does:
+
+- the request body is read in full before it is forwarded
+- the Authorization header is forwarded; failing that, an access_token
+  cookie becomes a Bearer token
+- Content-Type, User-Agent, Accept, Accept-Language, traceparent and
+  tracestate are copied, X-Forwarded-For is extended, and X-Request-ID is
+  kept or generated
+- the response is buffered and returned; upstream timeouts give 504 and
+  connection errors 502
+
+It uses one pooled keep-alive connection set to the upstream, or the
+given httpx transport (e.g. an ASGITransport to run in-process). It is not
+a reimplementation of the gateway (no auth endpoints or CORS);
+it only adds a realistic extra hop.
+
+Usage:
+    python -m benchmarks.gateway_stub --upstream http://127.0.0.1:8002 [--host 127.0.0.1] [--port 8000]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import uuid
+from http.cookies import SimpleCookie
+from typing import Optional
+import httpx
+from . import common
+
+COPIED_HEADERS = (b"content-type", b"user-agent", b"accept", b"accept-language", b"traceparent", b"tracestate")
+
+
+class GatewayStub:
+    """ASGI app forwarding every request to upstream."""
+
+    def __init__(
+        self,
+        upstream: str,
+        timeout: float = 30.0,
+        max_connections: int = 100,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.upstream = upstream.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport = transport
+        self.client = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._forward(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._connect()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.client.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _connect(self):
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        self.client = httpx.AsyncClient(timeout=self.timeout, limits=limits, transport=self.transport)
+
+    def _headers(self, scope) -> dict:
+        incoming = {}
+        for name, value in scope["headers"]:
+            incoming.setdefault(name, value.decode("latin-1"))
+
+        headers = {name.decode(): incoming[name] for name in COPIED_HEADERS if name in incoming}
+        if b"authorization" in incoming:
+            headers["authorization"] = incoming[b"authorization"]
+        elif b"cookie" in incoming:
+            cookie = SimpleCookie(incoming[b"cookie"]).get("access_token")
+            if cookie is not None:
+                headers["authorization"] = f"Bearer {cookie.value}"
+
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        forwarded = incoming.get(b"x-forwarded-for")
+        headers["x-forwarded-for"] = f"{forwarded}, {client_ip}" if forwarded else client_ip
+        headers["x-request-id"] = incoming.get(b"x-request-id") or uuid.uuid4().hex
+        return headers
+
+    async def _forward(self, scope, receive, send):
+        chunks = []
+        more = True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        if self.client is None:
+            # Driven without a lifespan, e.g. through httpx.ASGITransport
+            self._connect()
+        url = self.upstream + scope["path"]
+        if scope["query_string"]:
+            url += "?" + scope["query_string"].decode("latin-1")
+        try:
+            response = await self.client.request(scope["method"], url, content=body or None, headers=self._headers(scope))
+            status, content = response.status_code, response.content
+            headers = [
+                (name.encode(), value.encode("latin-1")) for name, value in response.headers.items()
+                if name in ("content-type", "x-request-id", "traceparent", "retry-after")
+            ]
+        except httpx.TimeoutException:
+            status, content, headers = 504, f"Request to {url} timed out".encode(), []
+        except httpx.HTTPError as e:
+            status, content, headers = 502, f"Error forwarding request: {e}".encode(), []
+
+        headers.append((b"content-length", str(len(content)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+
+def start_gateway(upstream: str, port: int) -> subprocess.Popen:
+    """Start the stand-in as a subprocess on port and wait until it proxies /health/live."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.gateway_stub", "--upstream", upstream, "--port", str(port)],
+        cwd=common.SERVICE_ROOT, env=dict(os.environ),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Gateway stand-in did not start")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API gateway stand-in for load tests")
+    parser.add_argument("--upstream", required=True, help="Crypto service URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    uvicorn.run(GatewayStub(args.upstream), host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# loadtest.py
+"""
+Self-contained load-test harness for the crypto service.
+
+Drives a real server over HTTP at a fixed request rate. Tokens are
+minted locally by benchmarks.common.mint_token (also behind the
+benchmarks.mint_token command) instead of the auth service, signed with
+the JWT_SECRET from the environment or .env. By default a server is
+started with app.server on a local port, with the same secrets. --url
+targets one that is already running; JWT_SECRET must then be that
+server's. With
+--via-gateway, requests go through the gateway stand-in
+(benchmarks.gateway_stub) to include the proxy hop.
+
+Each scenario runs in one or both modes:
+
+    open     requests start on a fixed schedule (--rps), whether or not
+             earlier ones have finished, like independent users
+    closed   --concurrency clients each wait for a response before their
+             next request, paced to a combined --rps (0: as fast as possible)
+
+A slow response in closed mode delays the requests queued behind it, so
+the delay never shows up in their measured time (coordinated omission).
+The harness therefore records two latencies per request:
+
+    latency        from the request's scheduled start to its response
+    service_time   from when it was actually sent to its response
+
+In open mode the two differ only by the harness's own send lag. In
+closed mode, latency is the corrected figure and service_time is what a
+naive closed-loop tool reports. send_lag is how late requests went out;
+if it is high in open mode, the harness itself is saturated and the
+numbers are not trustworthy.
+
+Usage:
+    python -m benchmarks.loadtest [--scenarios encrypt,decrypt,encrypt_batch] [--modes open,closed]
+                                  [--rps 200] [--duration 10] [--concurrency 16] [--size 1024]
+                                  [--batch 100] [--workers 1] [--url URL] [--via-gateway] [--output FILE]
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+import httpx
+from . import common
+from .gateway_stub import GatewayStub, start_gateway
+
+
+@dataclass
+class Scenario:
+    """One request, sent repeatedly."""
+
+    name: str
+    method: str
+    path: str
+    body: Optional[bytes] = None
+
+
+SCENARIOS = ("health", "encrypt", "decrypt", "encrypt_batch")
+
+
+async def _encrypt(client: httpx.AsyncClient, plaintext: str) -> str:
+    response = await client.post("/encrypt", json={"plaintext": plaintext})
+    response.raise_for_status()
+    return response.json()["ciphertext"]
+
+
+async def _build_scenarios(client: httpx.AsyncClient, size: int, batch: int) -> Dict[str, Scenario]:
+    plaintext = "x" * size
+    ciphertext = await _encrypt(client, plaintext)
+    return {
+        "health": Scenario("health", "GET", "/health/live"),
+        "encrypt": Scenario("encrypt", "POST", "/encrypt", json.dumps({"plaintext": plaintext}).encode()),
+        "decrypt": Scenario("decrypt", "POST", "/decrypt", json.dumps({"ciphertext": ciphertext}).encode()),
+        "encrypt_batch": Scenario("encrypt_batch", "POST", "/encrypt/batch", json.dumps(
+            {"items": [{"id": str(i), "plaintext": plaintext} for i in range(batch)]}
+        ).encode()),
+    }
+
+
+class Recorder:
+    """Collects the timings and outcomes of one run."""
+
+    def __init__(self):
+        self.latency: List[float] = []
+        self.service_time: List[float] = []
+        self.send_lag: List[float] = []
+        self.statuses: Counter = Counter()
+        self.dropped = 0
+
+    async def send(self, client: httpx.AsyncClient, scenario: Scenario, intended: float):
+        sent = time.perf_counter()
+        try:
+            response = await client.request(scenario.method, scenario.path, content=scenario.body)
+            outcome = str(response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        done = time.perf_counter()
+        self.latency.append(done - intended)
+        self.service_time.append(done - sent)
+        self.send_lag.append(sent - intended)
+        self.statuses[outcome] += 1
+
+    def report(self, mode: str, target_rps: float, elapsed: float, **extra) -> dict:
+        requests = len(self.latency)
+        return {
+            "mode": mode,
+            "target_rps": target_rps,
+            "achieved_rps": round(requests / elapsed, 2),
+            "requests": requests,
+            "errors": sum(count for status, count in self.statuses.items() if not status.startswith("2")),
+            "dropped": self.dropped,
+            "statuses": dict(self.statuses),
+            **extra,
+            "latency": common.percentiles(self.latency),
+            "service_time": common.percentiles(self.service_time),
+            "send_lag": common.percentiles(self.send_lag),
+        }
+
+
+async def open_loop(client: httpx.AsyncClient, scenario: Scenario, rps: float, duration: float, max_in_flight: int) -> dict:
+    """
+    Start requests at a fixed rate regardless of outstanding responses.
+
+    Requests that would exceed max_in_flight outstanding requests are not
+    sent and are counted as dropped, so an overloaded server cannot make
+    the harness grow without bound.
+    """
+    recorder = Recorder()
+    tasks = set()
+    total = int(rps * duration)
+    start = time.perf_counter()
+    for i in range(total):
+        intended = start + i / rps
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_in_flight:
+            recorder.dropped += 1
+            continue
+        task = asyncio.ensure_future(recorder.send(client, scenario, intended))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return recorder.report("open", rps, time.perf_counter() - start, max_in_flight=max_in_flight)
+
+
+async def closed_loop(client: httpx.AsyncClient, scenario: Scenario, rps: float, duration: float, concurrency: int) -> dict:
+    """
+    Run concurrency clients that each wait for a response before sending again.
+
+    With rps > 0, the clients share a fixed schedule of rps requests per
+    second: client k owns slots k, k + concurrency, ... A client that falls
+    behind sends at once, and the time since its slot counts as latency.
+    """
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def client_loop(k: int):
+        slot = k
+        while True:
+            intended = start + slot / rps if rps > 0 else time.perf_counter()
+            if intended >= deadline:
+                return
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await recorder.send(client, scenario, intended)
+            slot += concurrency
+
+    await asyncio.gather(*(client_loop(k) for k in range(concurrency)))
+    return recorder.report("closed", rps, time.perf_counter() - start, concurrency=concurrency)
+
+
+async def run_async(
+    url: str,
+    scenarios: List[str],
+    modes: List[str],
+    rps: float,
+    duration: float,
+    concurrency: int,
+    size: int,
+    batch: int,
+    max_in_flight: int,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> dict:
+    headers = {**common.auth_headers(), "Content-Type": "application/json"}
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    results = {}
+    async with httpx.AsyncClient(
+        base_url=url, headers=headers, limits=limits, timeout=30, transport=transport
+    ) as client:
+        runners: Dict[str, Callable] = {
+            "open": lambda scenario: open_loop(client, scenario, rps, duration, max_in_flight),
+            "closed": lambda scenario: closed_loop(client, scenario, rps, duration, concurrency),
+        }
+        available = await _build_scenarios(client, size, batch)
+        for name in scenarios:
+            scenario = available[name]
+            for _ in range(20):  # warm up
+                await client.request(scenario.method, scenario.path, content=scenario.body)
+            results[name] = {mode: await runners[mode](scenario) for mode in modes}
+    return results
+
+
+def format_report(results: dict) -> str:
+    """Render the results as a table of latency percentiles per scenario and mode."""
+    columns = ("p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms")
+    lines = [f"{'scenario':<14} {'mode':<7} {'target':>7} {'rps':>8} {'errors':>6} "
+             + " ".join(f"{c[:-3]:>9}" for c in columns) + "  (latency; service time below)"]
+    for name, modes in results.items():
+        for mode, result in modes.items():
+            for label, key in ((mode, "latency"), ("", "service_time")):
+                latency = result[key]
+                prefix = (f"{name:<14} {label:<7} {result['target_rps'] or '-':>7} {result['achieved_rps']:>8} "
+                          f"{result['errors'] + result['dropped']:>6} ") if label else " " * 46
+                lines.append(prefix + " ".join(f"{latency.get(c, 0):>9.2f}" for c in columns))
+    return "\n".join(lines)
+
+
+def run(
+    scenarios: List[str] = ("encrypt", "decrypt", "encrypt_batch"),
+    modes: List[str] = ("open", "closed"),
+    rps: float = 200,
+    duration: float = 10.0,
+    concurrency: int = 16,
+    size: int = 1024,
+    batch: int = 100,
+    max_in_flight: int = 1000,
+    workers: int = 1,
+    url: Optional[str] = None,
+    via_gateway: bool = False,
+    app=None
+) -> dict:
+    """
+    Run the load test and return the results with a summary of the setup.
+
+    By default a server with the given number of workers is started.
+    url targets a running server instead; app drives an ASGI app in this
+    process, without sockets (for smoke tests, not for measurements).
+    """
+    processes = []
+    transport = None
+    started = url is None and app is None
+    try:
+        if app is not None:
+            common.use_local_secrets()
+            url = target = "http://crypto-service"
+            if via_gateway:
+                app = GatewayStub(url, transport=httpx.ASGITransport(app=app))
+            transport = httpx.ASGITransport(app=app)
+        else:
+            if started:
+                port = common.free_port()
+                processes.append(common.start_server(workers, port))
+                url = f"http://127.0.0.1:{port}"
+            target = url
+            if via_gateway:
+                port = common.free_port()
+                processes.append(start_gateway(url, port))
+                target = f"http://127.0.0.1:{port}"
+        results = asyncio.run(run_async(
+            target, list(scenarios), list(modes), rps, duration, concurrency, size, batch, max_in_flight, transport
+        ))
+    finally:
+        for process in reversed(processes):
+            common.stop_server(process)
+    return {
+        "target": "gateway stand-in" if via_gateway else "direct",
+        "workers": workers if started else None,
+        "duration_s": duration,
+        "payload_bytes": size,
+        "batch_items": batch,
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-rate open/closed-loop load test")
+    parser.add_argument("--scenarios", default="encrypt,decrypt,encrypt_batch",
+                        help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--modes", default="open,closed", help="Comma-separated: open, closed")
+    parser.add_argument("--rps", type=float, default=200, help="Target requests per second (closed: 0 for unpaced)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients in closed mode")
+    parser.add_argument("--size", type=int, default=1024, help="Plaintext bytes")
+    parser.add_argument("--batch", type=int, default=100, help="Items per encrypt_batch request")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open mode: outstanding request cap")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the started server")
+    parser.add_argument("--url", help="Test a running server instead of starting one")
+    parser.add_argument("--via-gateway", action="store_true", help="Send requests through the gateway stand-in")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/loadtest-<rev>.json)")
+    args = parser.parse_args()
+
+    scenarios, modes = args.scenarios.split(","), args.modes.split(",")
+    unknown = set(scenarios) - set(SCENARIOS) | set(modes) - {"open", "closed"}
+    if unknown:
+        parser.error(f"unknown scenario or mode: {', '.join(sorted(unknown))}")
+    if "open" in modes and args.rps <= 0:
+        parser.error("open mode needs --rps > 0")
+    results = run(
+        scenarios, modes, args.rps, args.duration, args.concurrency,
+        args.size, args.batch, args.max_in_flight, args.workers, args.url, args.via_gateway
+    )
+    print(format_report(results["scenarios"]))
+    print(f"Saved to {common.save_results('loadtest', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
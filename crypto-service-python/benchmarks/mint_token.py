@@ -0,0 +1,33 @@
+# mint_token.py
+"""
+Mints a JWT accepted by the crypto service, without the auth service.
+
+The token is signed with JWT_SECRET and carries the issuer and audience
+from the settings (environment and .env), as tokens from
+auth-service-dotnet do. Use the same JWT_SECRET as the service under
+test; without one the command exits with an error.
+
+Usage:
+    python -m benchmarks.mint_token [--sub loadtest] [--role Admin] [--ttl 3600]
+    curl -H "Authorization: Bearer $(python -m benchmarks.mint_token)" ...
+"""
+import argparse
+import logging
+from datetime import timedelta
+from . import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mint a local JWT for the crypto service")
+    parser.add_argument("--sub", default="loadtest", help="Subject claim")
+    parser.add_argument("--role", default="Admin", help="Role claim")
+    parser.add_argument("--ttl", type=float, default=3600, help="Lifetime in seconds")
+    args = parser.parse_args()
+
+    # The service logs to stdout, where its settings warnings would mix with the token
+    logging.disable(logging.CRITICAL)
+    print(common.mint_token(sub=args.sub, role=args.role, expires_in=timedelta(seconds=args.ttl)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# run_all.py
+"""
+Runs the whole benchmark suite and saves one combined JSON result.
+
+Usage:
+    python -m benchmarks.run_all [--quick] [--output FILE]
+
+Compare two runs with:
+    python -m benchmarks.compare benchmarks/results/suite-<old>.json benchmarks/results/suite-<new>.json
+"""
+import argparse
+import json
+from . import common
+from . import bench_crypto, bench_endpoints, bench_engines, bench_load, bench_metrics, bench_serialization
+
+
+def run(quick: bool = False) -> dict:
+    if quick:
+        return {
+            "crypto": bench_crypto.run(sizes=(64, 1024, 64 * 1024), min_time=0.1),
+            "engines": bench_engines.run(sizes=(64, 64 * 1024), min_time=0.1),
+            "endpoints": bench_endpoints.run(sizes=(64, 1024), requests=100),
+            "load": bench_load.run(concurrency=16, duration=2.0),
+            "metrics": bench_metrics.run(iterations=20_000),
+            "serialization": bench_serialization.run(sizes=(64, 64 * 1024), min_time=0.1),
+        }
+    return {
+        "crypto": bench_crypto.run(),
+        "engines": bench_engines.run(),
+        "endpoints": bench_endpoints.run(),
+        "load": bench_load.run(),
+        "metrics": bench_metrics.run(),
+        "serialization": bench_serialization.run(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="Shorter runs for smoke testing")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/suite-<rev>.json)")
+    args = parser.parse_args()
+    common.use_local_secrets()
+
+    results = run(args.quick)
+    print(json.dumps(results, indent=2))
+    print(f"Saved to {common.save_results('suite', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Async Python client for the crypto service (requires httpx).
+
+Install it on its own with `pip install ./crypto_client`.
+
+    async with CryptoClient("http://crypto-service:8002", token) as client:
+        ciphertext = await client.encrypt("Hello, World!")
+        plaintext = await client.decrypt(ciphertext)
+"""
+from .client import CryptoClient, CryptoServiceError
+
+__all__ = ["CryptoClient", "CryptoServiceError"]
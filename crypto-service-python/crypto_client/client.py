@@ -0,0 +1,281 @@
+# client.py
+"""
+Async client for the crypto service.
+
+One CryptoClient holds a pooled, keep-alive httpx.AsyncClient; create it
+once and share it across the application.
+
+- encrypt() and decrypt() calls made concurrently are coalesced. Calls
+  that arrive within batch_window seconds of each other (or until
+  max_batch_size are waiting) are sent as one /encrypt/batch or
+  /decrypt/batch request, and each caller gets its own result or error.
+  A lone call is sent to /encrypt or /decrypt.
+- Requests answered with 429 or 503, or that fail to connect, are retried
+  up to max_retries times. The delay is exponential backoff with full
+  jitter, and never shorter than the server's Retry-After.
+- encrypt_stream() and decrypt_stream() send data of any size through
+  /encrypt/stream and /decrypt/stream and yield the output as it arrives,
+  so neither side holds the whole payload. Streams that are async
+  iterators cannot be replayed, so they are not retried.
+"""
+import asyncio
+import random
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+import httpx
+
+RETRY_STATUSES = frozenset({429, 503})
+
+TokenProvider = Union[str, Callable[[], str]]
+
+
+class CryptoServiceError(Exception):
+    """An error reported by the crypto service, for a request or a single batch item."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _error_from(response: httpx.Response) -> CryptoServiceError:
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    detail = body.get("detail", response.text) if isinstance(body, dict) else response.text
+    return CryptoServiceError(response.status_code, detail)
+
+
+class _Batcher:
+    """Collects single values for one operation and sends them together."""
+
+    def __init__(self, client: "CryptoClient", single_path: str, batch_path: str, field: str, result_field: str):
+        self.client = client
+        self.single_path = single_path
+        self.batch_path = batch_path
+        self.field = field
+        self.result_field = result_field
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    def submit(self, value: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((value, future))
+        if len(self._pending) >= self.client.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.client.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._send(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, pending: List[Tuple[str, asyncio.Future]]):
+        try:
+            if len(pending) == 1:
+                value, future = pending[0]
+                data = await self.client._post_json(self.single_path, {self.field: value})
+                if not future.done():
+                    future.set_result(data[self.result_field])
+                return
+
+            items = [{"id": str(i), self.field: value} for i, (value, _) in enumerate(pending)]
+            data = await self.client._post_json(self.batch_path, {"items": items})
+            for result in data["results"]:
+                future = pending[int(result["id"])][1]
+                if future.done():
+                    continue
+                if result.get("error") is not None:
+                    future.set_exception(CryptoServiceError(result["error"]["status_code"], result["error"]["detail"]))
+                else:
+                    future.set_result(result[self.result_field])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def drain(self):
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class CryptoClient:
+    """
+    Async client for the crypto service.
+
+    Args:
+        base_url: Service URL, e.g. "http://crypto-service:8002"
+        token: A JWT, or a callable returning the current one (called per request)
+        batch_window: Seconds to wait for more calls before sending a batch
+        max_batch_size: Values per batch request
+        max_retries: Retries after a 429, 503 or connection failure
+        backoff_base: First retry delay cap, in seconds; doubles per attempt
+        backoff_max: Largest retry delay, in seconds
+        max_connections: Size of the connection pool
+        timeout: Request timeout, in seconds
+        transport: httpx transport, e.g. httpx.ASGITransport(app) for in-process use
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: TokenProvider,
+        *,
+        batch_window: float = 0.002,
+        max_batch_size: int = 256,
+        max_retries: int = 3,
+        backoff_base: float = 0.05,
+        backoff_max: float = 2.0,
+        max_connections: int = 100,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.token = token
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+        self._encrypts = _Batcher(self, "/encrypt", "/encrypt/batch", "plaintext", "ciphertext")
+        self._decrypts = _Batcher(self, "/decrypt", "/decrypt/batch", "ciphertext", "plaintext")
+
+    async def __aenter__(self) -> "CryptoClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Send any waiting calls, then close the connection pool."""
+        await self._encrypts.drain()
+        await self._decrypts.drain()
+        await self._http.aclose()
+
+    def _headers(self) -> Dict[str, str]:
+        token = self.token() if callable(self.token) else self.token
+        return {"Authorization": f"Bearer {token}"}
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        return delay
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying 429/503 responses and connection failures."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self._http.request(method, path, headers=self._headers(), **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def _post_json(self, path: str, payload: dict) -> dict:
+        response = await self._request("POST", path, json=payload)
+        if response.status_code != 200:
+            raise _error_from(response)
+        return response.json()
+
+    async def encrypt(self, plaintext: str) -> str:
+        """
+        Encrypt one value, batched with concurrent calls.
+
+        Raises:
+            CryptoServiceError: If the service rejects the value or the request
+        """
+        return await self._encrypts.submit(plaintext)
+
+    async def decrypt(self, ciphertext: str) -> str:
+        """
+        Decrypt one value, batched with concurrent calls.
+
+        Raises:
+            CryptoServiceError: If the service rejects the value or the request
+        """
+        return await self._decrypts.submit(ciphertext)
+
+    async def encrypt_many(self, plaintexts: List[str]) -> List[str]:
+        """
+        Encrypt values in batches of max_batch_size.
+
+        Raises:
+            CryptoServiceError: For the first value the service rejects
+        """
+        return await self._many(self._encrypts, plaintexts)
+
+    async def decrypt_many(self, ciphertexts: List[str]) -> List[str]:
+        """
+        Decrypt values in batches of max_batch_size.
+
+        Raises:
+            CryptoServiceError: For the first value the service rejects
+        """
+        return await self._many(self._decrypts, ciphertexts)
+
+    async def _many(self, batcher: _Batcher, values: List[str]) -> List[str]:
+        futures = [batcher.submit(value) for value in values]
+        batcher._flush()
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+
+    def encrypt_stream(self, data: Union[bytes, AsyncIterable[bytes]]) -> AsyncIterator[bytes]:
+        """
+        Encrypt data of any size through /encrypt/stream, yielding the framed ciphertext.
+
+        Raises:
+            CryptoServiceError: If the service rejects the stream
+        """
+        return self._stream("/encrypt/stream", data)
+
+    def decrypt_stream(self, data: Union[bytes, AsyncIterable[bytes]]) -> AsyncIterator[bytes]:
+        """
+        Decrypt a framed ciphertext from encrypt_stream, yielding the plaintext.
+
+        Raises:
+            CryptoServiceError: If the service rejects the stream
+        """
+        return self._stream("/decrypt/stream", data)
+
+    async def _stream(self, path: str, data: Union[bytes, AsyncIterable[bytes]]) -> AsyncIterator[bytes]:
+        headers = {**self._headers(), "Content-Type": "application/octet-stream"}
+        retries = self.max_retries if isinstance(data, bytes) else 0
+        attempt = 0
+        while True:
+            async with self._http.stream("POST", path, content=data, headers=headers) as response:
+                if response.status_code == 200:
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+                    return
+                await response.aread()
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    raise _error_from(response)
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
@@ -13,4 +13,45 @@ load_dotenv()
 # If FERNET_KEY is not set, use a valid one for testing
 if not os.getenv("FERNET_KEY"):
     # This is a valid Fernet key: 32 'A's encoded in base64
-    os.environ["FERNET_KEY"] = "AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA="
\ No newline at end of file
+    os.environ["FERNET_KEY"] = "AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA="
+# If JWT_SECRET is not set, use a local one so tokens can be minted in-process
+if not os.getenv("JWT_SECRET"):
+    os.environ["JWT_SECRET"] = "test_jwt_secret_for_local_token_minting_only"
+if not os.getenv("BLIND_INDEX_KEY"):
+    os.environ["BLIND_INDEX_KEY"] = "test_blind_index_key_for_local_use_only"
+# Keep the envelope key store out of the working tree
+os.environ.setdefault("ENVELOPE_KEY_STORE", ":memory:")
+
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+
+
+def mint_token(sub="test-user", role="Admin", expires_in=timedelta(minutes=5), **claims):
+    """Mint a JWT signed with the local JWT_SECRET, accepted by app.security."""
+    from app.config import JWT_ISSUER, JWT_AUDIENCE
+
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": sub,
+        "role": role,
+        "iss": JWT_ISSUER,
+        "aud": JWT_AUDIENCE,
+        "iat": int(now.timestamp()),
+        "exp": int((now + expires_in).timestamp()),
+    }
+    payload.update(claims)
+    return jwt.encode(payload, os.environ["JWT_SECRET"], algorithm="HS256")
+
+
+@pytest.fixture
+def auth_header():
+    """Authorization header carrying a locally minted token."""
+    return {"Authorization": f"Bearer {mint_token()}"}
+
+
+@pytest.fixture
+def token_factory():
+    """Return mint_token so tests can mint tokens with custom claims."""
+    return mint_token
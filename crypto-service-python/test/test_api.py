@@ -1,6 +1,4 @@
 #test_api.py
-import os
-import requests
 import pytest
 import sys
 from pathlib import Path
@@ -20,26 +18,6 @@ TEST_CIPHER = Fernet(TEST_KEY)
 
 client = TestClient(app)
 
-# Get auth token from environment or make request
-def get_auth_token():
-    token = os.getenv("AUTH_TOKEN")
-    if not token:
-        # Try to get token from auth service
-        try:
-            response = requests.post(
-                "http://localhost:5000/api/auth/login",
-                json={"email": "admin@example.com", "password": "admin123"}
-            )
-            if response.status_code == 200:
-                token = response.json()["token"]
-        except:
-            token = "mock_token_for_testing"
-    return token
-
-# Add auth header to your test requests
-def auth_headers():
-    return {"Authorization": f"Bearer {get_auth_token()}"}
-
 class TestHealthEndpoint:
     def test_health_check(self):
         """Test health check endpoint."""
@@ -52,13 +30,13 @@ class TestHealthEndpoint:
         assert "timestamp" in data
 
 class TestEncryptEndpoint:
-    def test_encrypt_valid_data(self):
+    def test_encrypt_valid_data(self, auth_header):
         """Test encrypt endpoint with valid data."""
         test_data = {"plaintext": "Hello, World!"}
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
-            response = client.post("/encrypt", json=test_data)
+            response = client.post("/encrypt", json=test_data, headers=auth_header)
             
             assert response.status_code == 200
             data = response.json()
@@ -68,27 +46,27 @@ class TestEncryptEndpoint:
             decrypted = TEST_CIPHER.decrypt(data["ciphertext"].encode())
             assert decrypted.decode() == test_data["plaintext"]
     
-    def test_encrypt_empty_data(self):
+    def test_encrypt_empty_data(self, auth_header):
         """Test encrypt endpoint with empty data."""
         test_data = {"plaintext": ""}
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
-            response = client.post("/encrypt", json=test_data)
+            response = client.post("/encrypt", json=test_data, headers=auth_header)
             
             assert response.status_code == 400
             data = response.json()
             assert "detail" in data
     
-    def test_encrypt_missing_field(self):
+    def test_encrypt_missing_field(self, auth_header):
         """Test encrypt endpoint with missing required field."""
         test_data = {}
         
-        response = client.post("/encrypt", json=test_data)
+        response = client.post("/encrypt", json=test_data, headers=auth_header)
         assert response.status_code == 422  # Validation error
 
 class TestDecryptEndpoint:
-    def test_decrypt_valid_ciphertext(self):
+    def test_decrypt_valid_ciphertext(self, auth_header):
         """Test decrypt endpoint with valid ciphertext."""
         plaintext = "Hello, World!"
         ciphertext = TEST_CIPHER.encrypt(plaintext.encode()).decode()
@@ -96,57 +74,57 @@ class TestDecryptEndpoint:
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
-            response = client.post("/decrypt", json=test_data)
+            response = client.post("/decrypt", json=test_data, headers=auth_header)
             
             assert response.status_code == 200
             data = response.json()
             assert data["plaintext"] == plaintext
     
-    def test_decrypt_invalid_ciphertext(self):
+    def test_decrypt_invalid_ciphertext(self, auth_header):
         """Test decrypt endpoint with invalid ciphertext."""
         test_data = {"ciphertext": "invalid_ciphertext"}
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
-            response = client.post("/decrypt", json=test_data)
+            response = client.post("/decrypt", json=test_data, headers=auth_header)
             
             assert response.status_code == 400
             data = response.json()
             assert "detail" in data
     
-    def test_decrypt_empty_ciphertext(self):
+    def test_decrypt_empty_ciphertext(self, auth_header):
         """Test decrypt endpoint with empty ciphertext."""
         test_data = {"ciphertext": ""}
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
-            response = client.post("/decrypt", json=test_data)
+            response = client.post("/decrypt", json=test_data, headers=auth_header)
             
             assert response.status_code == 400
             data = response.json()
             assert "detail" in data
     
-    def test_decrypt_missing_field(self):
+    def test_decrypt_missing_field(self, auth_header):
         """Test decrypt endpoint with missing required field."""
         test_data = {}
         
-        response = client.post("/decrypt", json=test_data)
+        response = client.post("/decrypt", json=test_data, headers=auth_header)
         assert response.status_code == 422  # Validation error
 
 class TestIntegration:
-    def test_encrypt_decrypt_roundtrip(self):
+    def test_encrypt_decrypt_roundtrip(self, auth_header):
         """Test complete encrypt-decrypt cycle."""
         original_text = "This is a secret message!"
         
         # FIXED: Use 'app.crypto.cipher' not 'crypto.cipher'
         with patch('app.crypto.cipher', TEST_CIPHER):
             # Encrypt
-            encrypt_response = client.post("/encrypt", json={"plaintext": original_text})
+            encrypt_response = client.post("/encrypt", json={"plaintext": original_text}, headers=auth_header)
             assert encrypt_response.status_code == 200
             ciphertext = encrypt_response.json()["ciphertext"]
             
             # Decrypt
-            decrypt_response = client.post("/decrypt", json={"ciphertext": ciphertext})
+            decrypt_response = client.post("/decrypt", json={"ciphertext": ciphertext}, headers=auth_header)
             assert decrypt_response.status_code == 200
             decrypted_text = decrypt_response.json()["plaintext"]
             
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+
+TEST_KEY = Fernet.generate_key()
+TEST_CIPHER = Fernet(TEST_KEY)
+
+client = TestClient(app)
+
+class TestEncryptBatchEndpoint:
+    def test_encrypt_batch_reports_each_item(self, auth_header):
+        """Valid items are encrypted and bad ones fail individually."""
+        items = [
+            {"id": "a", "plaintext": "first"},
+            {"id": "b", "plaintext": ""},
+            {"id": "c", "plaintext": "third"},
+        ]
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            response = client.post("/encrypt/batch", json={"items": items}, headers=auth_header)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [r["id"] for r in data["results"]] == ["a", "b", "c"]
+        assert data["results"][1]["error"]["status_code"] == 400
+        assert TEST_CIPHER.decrypt(data["results"][2]["ciphertext"].encode()) == b"third"
+
+    def test_encrypt_batch_requires_auth(self):
+        """Batch endpoints are protected like the single-item ones."""
+        response = client.post("/encrypt/batch", json={"items": [{"id": "a", "plaintext": "x"}]})
+        assert response.status_code in (401, 403)
+
+    def test_encrypt_batch_empty_list(self, auth_header):
+        """An empty batch is rejected by validation."""
+        response = client.post("/encrypt/batch", json={"items": []}, headers=auth_header)
+        assert response.status_code == 422
+
+class TestDecryptBatchEndpoint:
+    def test_decrypt_batch_roundtrip(self, auth_header):
+        """Ciphertexts from /encrypt/batch decrypt back; tampered ones fail alone."""
+        items = [{"id": str(i), "plaintext": f"secret-{i}"} for i in range(50)]
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            encrypted = client.post("/encrypt/batch", json={"items": items}, headers=auth_header).json()
+            to_decrypt = [
+                {"id": r["id"], "ciphertext": r["ciphertext"]} for r in encrypted["results"]
+            ]
+            to_decrypt.append({"id": "bad", "ciphertext": "invalid_ciphertext"})
+            response = client.post("/decrypt/batch", json={"items": to_decrypt}, headers=auth_header)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 50
+        assert data["failed"] == 1
+        assert data["results"][7]["plaintext"] == "secret-7"
+        assert data["results"][-1]["error"]["detail"] == "Invalid or tampered ciphertext"
+
+    def test_decrypt_batch_binary_plaintext(self, auth_header):
+        """A non-UTF-8 plaintext is a 400 for its own item, not a failed batch."""
+        binary = TEST_CIPHER.encrypt(b"\xff\xfe\x00").decode()
+        text = TEST_CIPHER.encrypt(b"hello").decode()
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            response = client.post("/decrypt/batch", json={"items": [
+                {"id": "binary", "ciphertext": binary}, {"id": "text", "ciphertext": text}
+            ]}, headers=auth_header)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 1
+        assert data["results"][0]["error"]["status_code"] == 400
+        assert "UTF-8" in data["results"][0]["error"]["detail"]
+        assert data["results"][1]["plaintext"] == "hello"
@@ -0,0 +1,108 @@
+import dataclasses
+import sys
+from pathlib import Path
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config
+from app.blind_index import blind_index, blind_index_batch, normalize
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+    return use
+
+
+class TestBlindIndex:
+    def test_deterministic(self):
+        assert blind_index("jane@example.com") == blind_index("jane@example.com")
+        assert blind_index("jane@example.com") != blind_index("john@example.com")
+        assert len(blind_index("jane@example.com")) == 43
+
+    def test_context_separates_columns(self):
+        assert blind_index("jane", "users.email") != blind_index("jane", "orders.email")
+        # The separator keeps context and value from running into each other
+        assert blind_index("b", "a") != blind_index("", "ab")
+
+    def test_context_rejects_nul(self):
+        """("a\\0b", "c") would hash like ("a", "b\\0c") if NUL were allowed in the context."""
+        assert blind_index("b\x00c", "a")
+        with pytest.raises(HTTPException) as exc_info:
+            blind_index("c", "a\x00b")
+        assert exc_info.value.status_code == 400
+
+    def test_normalization(self):
+        assert normalize("  Jane  Doe ", ["trim", "lower", "collapse_whitespace"]) == "jane doe"
+        assert normalize("+1 (555) 010-99", ["digits"]) == "155501099"
+        assert blind_index(" Jane@Example.com", normalization=["trim", "lower"]) == blind_index("jane@example.com")
+        with pytest.raises(HTTPException) as exc_info:
+            normalize("x", ["soundex"])
+        assert exc_info.value.status_code == 400
+
+    def test_truncation(self):
+        full = blind_index("jane@example.com")
+        short = blind_index("jane@example.com", length=8)
+        assert len(short) == 11
+        assert full.startswith(short[:10])
+        for length in (3, 33):
+            with pytest.raises(HTTPException):
+                blind_index("x", length=length)
+
+    def test_batch_matches_single(self):
+        values = ["a", "b", "a"]
+        assert blind_index_batch(values, "ctx") == [blind_index(value, "ctx") for value in values]
+
+    def test_key_change_changes_index(self, use_settings):
+        before = blind_index("jane@example.com")
+        use_settings(blind_index_key="another_blind_index_key")
+        assert blind_index("jane@example.com") != before
+
+    def test_missing_key(self, use_settings):
+        use_settings(blind_index_key=None)
+        with pytest.raises(HTTPException) as exc_info:
+            blind_index("x")
+        assert exc_info.value.status_code == 503
+
+
+class TestBlindIndexEndpoints:
+    def test_single(self, auth_header):
+        response = client.post(
+            "/blind-index",
+            json={"value": " Jane@Example.com", "context": "users.email", "normalize": ["trim", "lower"], "length": 16},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        assert response.json() == {"index": blind_index("jane@example.com", "users.email", length=16)}
+
+    def test_batch(self, auth_header):
+        response = client.post(
+            "/blind-index/batch",
+            json={"items": [{"id": "1", "value": "a"}, {"id": "2", "value": "b"}], "context": "c"},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        assert response.json() == {"results": [
+            {"id": "1", "index": blind_index("a", "c")},
+            {"id": "2", "index": blind_index("b", "c")}
+        ]}
+
+    def test_invalid_options(self, auth_header):
+        response = client.post("/blind-index", json={"value": "a", "length": 64}, headers=auth_header)
+        assert response.status_code == 422
+        response = client.post("/blind-index", json={"value": "a", "normalize": ["nope"]}, headers=auth_header)
+        assert response.status_code == 400
+        response = client.post("/blind-index", json={"value": "a", "context": "a\u0000b"}, headers=auth_header)
+        assert response.status_code == 422
+
+    def test_requires_auth(self):
+        assert client.post("/blind-index", json={"value": "a"}).status_code in (401, 403)
@@ -0,0 +1,100 @@
+import dataclasses
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config, executor, limits
+from app.executor import CryptoExecutor
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+        monkeypatch.setattr(limits, "_rate_limiter", None)
+    return use
+
+
+class TestChannelAuth:
+    def test_missing_or_invalid_token_refused(self):
+        for url in ("/ws", "/ws?token=not-a-jwt"):
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                with client.websocket_connect(url):
+                    pass
+            assert exc_info.value.code == 1008
+
+    def test_token_in_header_or_query(self, auth_header, token_factory):
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            ws.send_json({"id": 1, "op": "encrypt", "data": "x"})
+            assert "result" in ws.receive_json()
+        with client.websocket_connect(f"/ws?token={token_factory()}") as ws:
+            ws.send_json({"id": 1, "op": "encrypt", "data": "x"})
+            assert "result" in ws.receive_json()
+
+    def test_closed_when_token_expires(self, token_factory):
+        token = token_factory(expires_in=timedelta(seconds=1))
+        with client.websocket_connect(f"/ws?token={token}") as ws:
+            start = time.monotonic()
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                ws.receive_json()
+            assert exc_info.value.code == 1008
+            assert exc_info.value.reason == "Token expired"
+            assert time.monotonic() - start < 3
+
+
+class TestChannelOperations:
+    def test_pipelined_round_trip(self, auth_header):
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            for i in range(20):
+                ws.send_json({"id": i, "op": "encrypt", "data": f"secret-{i}"})
+            replies = {reply["id"]: reply["result"] for reply in (ws.receive_json() for _ in range(20))}
+
+            for i, ciphertext in replies.items():
+                ws.send_json({"id": f"d{i}", "op": "decrypt", "data": ciphertext})
+            decrypted = {reply["id"]: reply["result"] for reply in (ws.receive_json() for _ in range(20))}
+        assert decrypted == {f"d{i}": f"secret-{i}" for i in range(20)}
+
+    def test_offloaded_operations_reply_by_id(self, auth_header, monkeypatch):
+        monkeypatch.setattr(executor, "_crypto_executor", CryptoExecutor(mode="thread", max_workers=2, threshold=1024))
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            ws.send_json({"id": "big", "op": "encrypt", "data": "x" * 100_000})
+            ws.send_json({"id": "small", "op": "encrypt", "data": "x"})
+            replies = {reply["id"]: reply for reply in (ws.receive_json(), ws.receive_json())}
+        assert set(replies) == {"big", "small"}
+        assert all("result" in reply for reply in replies.values())
+
+    def test_errors_are_per_message(self, auth_header):
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            ws.send_text("not json")
+            assert ws.receive_json() == {"id": None, "error": {"status_code": 400, "detail": "Message must be a JSON object"}}
+            ws.send_json({"id": 1, "op": "sign", "data": "x"})
+            assert ws.receive_json()["error"]["status_code"] == 400
+            ws.send_json({"id": 2, "op": "decrypt", "data": "gAAAAAtampered"})
+            assert ws.receive_json()["error"]["status_code"] == 400
+            ws.send_json({"id": 3, "op": "encrypt", "data": "still open"})
+            assert "result" in ws.receive_json()
+
+    def test_message_size_limit(self, auth_header, use_settings):
+        use_settings(ws_max_message_size=100)
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            ws.send_json({"id": 1, "op": "encrypt", "data": "x" * 200})
+            assert ws.receive_json()["error"]["status_code"] == 413
+
+    def test_rate_limit_per_operation(self, auth_header, use_settings):
+        use_settings(rate_limit=0.5, rate_limit_burst=3)
+        with client.websocket_connect("/ws", headers=auth_header) as ws:
+            for i in range(4):
+                ws.send_json({"id": i, "op": "encrypt", "data": "x"})
+            statuses = [ws.receive_json().get("error", {}).get("status_code", 200) for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
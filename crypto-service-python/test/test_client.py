@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from crypto_client import CryptoClient, CryptoServiceError
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """ASGI transport that records request paths and can fail the first few."""
+
+    def __init__(self, failures=(), retry_after=None):
+        self.inner = httpx.ASGITransport(app=app)
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.paths = []
+
+    async def handle_async_request(self, request):
+        self.paths.append(request.url.path)
+        if self.failures:
+            headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+            return httpx.Response(self.failures.pop(0), json={"detail": "busy"}, headers=headers)
+        return await self.inner.handle_async_request(request)
+
+
+def run(auth_header, scenario, transport=None, **options):
+    """Run scenario(client) against the in-process app."""
+    async def main():
+        token = auth_header["Authorization"].split()[1]
+        options.setdefault("backoff_base", 0.001)
+        async with CryptoClient("http://testserver", token, transport=transport or RecordingTransport(), **options) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+class TestCoalescing:
+    def test_concurrent_calls_share_a_batch(self, auth_header):
+        transport = RecordingTransport()
+
+        async def scenario(client):
+            values = [f"secret-{i}" for i in range(50)]
+            ciphertexts = await asyncio.gather(*(client.encrypt(v) for v in values))
+            return values, await asyncio.gather(*(client.decrypt(c) for c in ciphertexts))
+
+        values, plaintexts = run(auth_header, scenario, transport)
+        assert list(plaintexts) == values
+        assert transport.paths == ["/encrypt/batch", "/decrypt/batch"]
+
+    def test_max_batch_size_splits(self, auth_header):
+        transport = RecordingTransport()
+
+        async def scenario(client):
+            return await client.encrypt_many([str(i) for i in range(25)])
+
+        assert len(run(auth_header, scenario, transport, max_batch_size=10)) == 25
+        assert transport.paths == ["/encrypt/batch"] * 3
+
+    def test_lone_call_uses_single_endpoint(self, auth_header):
+        transport = RecordingTransport()
+
+        async def scenario(client):
+            return await client.decrypt(await client.encrypt("Hello, World!"))
+
+        assert run(auth_header, scenario, transport) == "Hello, World!"
+        assert transport.paths == ["/encrypt", "/decrypt"]
+
+    def test_item_errors_are_per_call(self, auth_header):
+        async def scenario(client):
+            good = await client.encrypt("ok")
+            return await asyncio.gather(client.decrypt(good), client.decrypt("gAAAAAtampered"), return_exceptions=True)
+
+        plaintext, error = run(auth_header, scenario)
+        assert plaintext == "ok"
+        assert isinstance(error, CryptoServiceError)
+        assert error.status_code == 400
+
+    def test_request_errors_reach_every_caller(self):
+        async def scenario(client):
+            return await asyncio.gather(client.encrypt("a"), client.encrypt("b"), return_exceptions=True)
+
+        results = run({"Authorization": "Bearer not-a-jwt"}, scenario)
+        assert [e.status_code for e in results] == [401, 401]
+
+    def test_non_object_error_bodies(self):
+        """Error bodies that are JSON but not an object fall back to the raw text."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(502, json=["bad gateway"]))
+
+        async def scenario(client):
+            return await client.encrypt("a")
+
+        with pytest.raises(CryptoServiceError) as exc_info:
+            run({"Authorization": "Bearer token"}, scenario, transport)
+        assert exc_info.value.status_code == 502
+        assert exc_info.value.detail == '["bad gateway"]'
+
+
+class TestRetries:
+    def test_retries_429_and_503(self, auth_header):
+        transport = RecordingTransport(failures=[503, 429])
+
+        async def scenario(client):
+            return await client.encrypt("retry me")
+
+        assert run(auth_header, scenario, transport)
+        assert transport.paths == ["/encrypt"] * 3
+
+    def test_gives_up_after_max_retries(self, auth_header):
+        transport = RecordingTransport(failures=[503] * 5)
+
+        async def scenario(client):
+            return await client.encrypt("retry me")
+
+        with pytest.raises(CryptoServiceError) as exc_info:
+            run(auth_header, scenario, transport, max_retries=2)
+        assert exc_info.value.status_code == 503
+        assert len(transport.paths) == 3
+
+    def test_honours_retry_after(self, auth_header):
+        transport = RecordingTransport(failures=[429], retry_after="0.2")
+
+        async def scenario(client):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await client.encrypt("wait")
+            return loop.time() - start
+
+        assert run(auth_header, scenario, transport) >= 0.2
+
+
+class TestStreaming:
+    def test_round_trip(self, auth_header):
+        data = os.urandom(300_000)
+
+        async def chunks():
+            for i in range(0, len(data), 65536):
+                yield data[i:i + 65536]
+
+        async def scenario(client):
+            ciphertext = b"".join([chunk async for chunk in client.encrypt_stream(chunks())])
+            return ciphertext, b"".join([chunk async for chunk in client.decrypt_stream(ciphertext)])
+
+        ciphertext, plaintext = run(auth_header, scenario)
+        assert plaintext == data
+        assert len(ciphertext) > len(data)
+
+    def test_rejected_stream_raises(self, auth_header):
+        async def scenario(client):
+            return [chunk async for chunk in client.decrypt_stream(b"not a framed stream")]
+
+        with pytest.raises(CryptoServiceError) as exc_info:
+            run(auth_header, scenario)
+        assert exc_info.value.status_code == 400
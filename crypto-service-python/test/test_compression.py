@@ -0,0 +1,114 @@
+import dataclasses
+import json
+import sys
+import zlib
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config
+from app.compression import FLAG_ZLIB, FLAG_ZSTD, compress, decompress
+from app.crypto import decrypt_bytes, decrypt_data, encrypt_bytes, encrypt_data
+from app.engines import read_header
+
+DOCUMENT = json.dumps([{"id": i, "status": "ok", "message": "request handled"} for i in range(200)])
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+    return use
+
+
+class TestCompressionStage:
+    def test_small_or_disabled_input_is_untouched(self):
+        assert compress(b"x" * 100, "zlib", min_size=1024) == (b"x" * 100, 0)
+        assert compress(b"x" * 4096, "off", min_size=0) == (b"x" * 4096, 0)
+
+    def test_incompressible_input_is_untouched(self):
+        data = bytes(range(256)) * 4
+        data = zlib.compress(data)  # already compressed
+        assert compress(data, "zlib", min_size=0) == (data, 0)
+
+    def test_round_trip(self):
+        data, flags = compress(DOCUMENT.encode(), "zlib", min_size=0)
+        assert flags == FLAG_ZLIB
+        assert len(data) < len(DOCUMENT) / 5
+        assert decompress(data, flags, max_size=len(DOCUMENT)) == DOCUMENT.encode()
+
+    def test_zstd_falls_back_without_package(self, monkeypatch):
+        monkeypatch.setattr("app.compression.zstandard", None)
+        assert compress(DOCUMENT.encode(), "zstd", min_size=0)[1] == FLAG_ZLIB
+
+    def test_zstd_short_reads(self, monkeypatch):
+        """zstd output is read until EOF, however little each read() returns."""
+        class Reader:
+            def __init__(self, source):
+                self.source = source
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def read(self, size):
+                return self.source.read(min(size, 3))
+
+        class Decompressor:
+            def stream_reader(self, source):
+                return Reader(source)
+
+        monkeypatch.setattr("app.compression.zstandard", SimpleNamespace(
+            ZstdDecompressor=Decompressor, ZstdError=Exception
+        ))
+        assert decompress(DOCUMENT.encode(), FLAG_ZSTD, max_size=len(DOCUMENT)) == DOCUMENT.encode()
+        with pytest.raises(HTTPException) as exc_info:
+            decompress(DOCUMENT.encode(), FLAG_ZSTD, max_size=10)
+        assert exc_info.value.status_code == 413
+
+    def test_decompression_bomb_is_capped(self):
+        """Output beyond max_size is refused without inflating the whole payload."""
+        bomb = zlib.compress(b"\0" * (10 * 1024 * 1024))
+        with pytest.raises(HTTPException) as exc_info:
+            decompress(bomb, FLAG_ZLIB, max_size=1024 * 1024)
+        assert exc_info.value.status_code == 413
+
+    def test_corrupt_or_truncated_data(self):
+        data = zlib.compress(DOCUMENT.encode())
+        for bad in (b"not zlib", data[:len(data) // 2]):
+            with pytest.raises(HTTPException) as exc_info:
+                decompress(bad, FLAG_ZLIB, max_size=1024 * 1024)
+            assert exc_info.value.status_code == 400
+
+
+class TestCompressedCiphertexts:
+    @pytest.mark.parametrize("engine", ["fernet", "aes-gcm"])
+    def test_compressed_round_trip(self, use_settings, engine):
+        """Compressed ciphertexts are flagged in the header and much smaller."""
+        plain = encrypt_data(DOCUMENT)
+        use_settings(crypto_engine=engine, compression="zlib", compression_min_size=512)
+        compressed = encrypt_data(DOCUMENT)
+        assert len(compressed) < len(plain) / 3
+        assert decrypt_data(compressed) == DOCUMENT
+
+        sealed = encrypt_bytes(DOCUMENT.encode())
+        assert read_header(sealed) == (engine, FLAG_ZLIB)
+
+    def test_below_threshold_keeps_plain_fernet_token(self, use_settings):
+        use_settings(compression="zlib", compression_min_size=512)
+        assert encrypt_data("short").startswith("gAAAAA")
+
+    def test_decrypt_enforces_size_cap(self, use_settings):
+        use_settings(compression="zlib", compression_min_size=0)
+        sealed = encrypt_bytes(b"\0" * (2 * 1024 * 1024))
+        use_settings(max_decompressed_size=1024 * 1024)
+        with pytest.raises(HTTPException) as exc_info:
+            decrypt_bytes(sealed)
+        assert exc_info.value.status_code == 413
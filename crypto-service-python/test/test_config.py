@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config, crypto
+from app.config import Settings, get_cipher, get_settings, get_usable_cpus, load_settings
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+class TestSettings:
+    def test_import_has_no_side_effects(self):
+        """Importing the app prints nothing and does not load settings."""
+        code = (
+            "import app.main, app.config as c, app.logger as l;"
+            "assert c._settings is None and c._cipher is None;"
+            "assert l._listener is None"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=60
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == ""
+
+    def test_summary_hides_secrets(self):
+        """The loggable summary reports secrets only as present/absent."""
+        settings = Settings(fernet_keys=("k" * 44,), jwt_secret="super-secret")
+        summary = str(settings.summary())
+        assert "super-secret" not in summary
+        assert "kkkk" not in summary
+        assert settings.missing_secrets() == []
+        assert Settings(fernet_keys=(), jwt_secret=None).missing_secrets() == ["FERNET_KEY", "JWT_SECRET"]
+
+    def test_cpu_based_defaults_match_environment_defaults(self):
+        """Fields sized by the core count default the same with and without from_env."""
+        base = Settings(fernet_keys=(), jwt_secret=None)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv("CRYPTO_EXECUTOR_WORKERS", "")
+            mp.setenv("WEB_CONCURRENCY", "")
+            from_env = Settings.from_env()
+        assert base.crypto_executor_workers == from_env.crypto_executor_workers == get_usable_cpus()
+        assert base.web_concurrency == from_env.web_concurrency == get_usable_cpus()
+
+    def test_relative_key_store_is_flagged(self):
+        """A relative envelope key store path would live in the container's writable layer."""
+        base = Settings(fernet_keys=(), jwt_secret=None)
+        assert base.ephemeral_key_store()
+        assert not Settings(fernet_keys=(), jwt_secret=None, envelope_key_store="/data/envelope_keys.db").ephemeral_key_store()
+        assert not Settings(fernet_keys=(), jwt_secret=None, envelope_key_store=":memory:").ephemeral_key_store()
+
+    def test_load_settings_reads_environment_and_resets_cipher(self):
+        """load_settings picks up environment changes and rebuilds the cipher."""
+        before = get_cipher()
+        try:
+            with pytest.MonkeyPatch.context() as mp:
+                mp.setenv("BATCH_MAX_ITEMS", "7")
+                mp.setenv("STREAM_CHUNK_SIZE", "1024")
+                mp.setenv("LOG_SAMPLE_RATE", "0.25")
+                load_settings()
+                assert get_settings().batch_max_items == 7
+                assert get_settings().stream_chunk_size == 1024
+                assert get_settings().log_sample_rate == 0.25
+                assert get_cipher() is not before
+        finally:
+            load_settings()
+        assert get_settings().batch_max_items == int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+    def test_missing_key_disables_cipher(self):
+        """Without a key, get_cipher raises and crypto reports the service as unconfigured."""
+        try:
+            with pytest.MonkeyPatch.context() as mp:
+                mp.delenv("FERNET_KEY", raising=False)
+                mp.delenv("FERNET_KEYS", raising=False)
+                mp.setattr(config, "_settings", Settings(fernet_keys=(), jwt_secret="x"))
+                mp.setattr(config, "_cipher", None)
+                with pytest.raises(RuntimeError):
+                    get_cipher()
+                assert crypto._get_cipher() is None
+        finally:
+            load_settings()
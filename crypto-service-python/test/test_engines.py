@@ -0,0 +1,127 @@
+import dataclasses
+import sys
+from pathlib import Path
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config
+from app.main import app
+from app.engines import (
+    ENGINES,
+    HEADER_SIZE,
+    TEXT_PREFIX,
+    AESGCMEngine,
+    FernetEngine,
+    read_header,
+    seal,
+    unseal
+)
+from app.crypto import decrypt_bytes, decrypt_data, encrypt_bytes, encrypt_data, rotate_batch
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+AEAD_ENGINES = [name for name in ENGINES if name != "fernet"]
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def use_engine(monkeypatch):
+    """Switch CRYPTO_ENGINE for the duration of a test."""
+    def use(name: str):
+        settings = dataclasses.replace(config.get_settings(), crypto_engine=name)
+        monkeypatch.setattr(config, "_settings", settings)
+    return use
+
+
+class TestEngines:
+    @pytest.mark.parametrize("name", list(ENGINES))
+    def test_round_trip(self, name):
+        engine = FernetEngine(Fernet(OLD_KEY)) if name == "fernet" else ENGINES[name]([OLD_KEY])
+        sealed = seal(engine, b"secret")
+        assert read_header(sealed) == (name, 0)
+        assert unseal(engine, sealed) == b"secret"
+
+    @pytest.mark.parametrize("name", AEAD_ENGINES)
+    def test_header_is_authenticated(self, name):
+        """Changing the flags byte makes AEAD decryption fail."""
+        engine = ENGINES[name]([OLD_KEY])
+        sealed = bytearray(seal(engine, b"secret"))
+        sealed[HEADER_SIZE - 1] ^= 1
+        with pytest.raises(InvalidToken):
+            unseal(engine, bytes(sealed))
+
+    def test_key_ring_decrypts_old_values(self):
+        """Values sealed under an older key open with a ring that has it."""
+        sealed = seal(AESGCMEngine([OLD_KEY]), b"secret")
+        assert unseal(AESGCMEngine([NEW_KEY, OLD_KEY]), sealed) == b"secret"
+        with pytest.raises(InvalidToken):
+            unseal(AESGCMEngine([NEW_KEY]), sealed)
+
+    def test_unknown_engine_and_version(self):
+        for header in (b"SCX\x01\x09\x00", b"SCX\x02\x01\x00", b"SCX"):
+            with pytest.raises(ValueError):
+                read_header(header)
+
+
+class TestCryptoWithEngines:
+    @pytest.mark.parametrize("name", AEAD_ENGINES)
+    def test_text_round_trip(self, use_engine, name):
+        use_engine(name)
+        ciphertext = encrypt_data("Hello, World!")
+        assert ciphertext.startswith(TEXT_PREFIX)
+        assert decrypt_data(ciphertext) == "Hello, World!"
+
+    @pytest.mark.parametrize("name", AEAD_ENGINES)
+    def test_raw_output_is_smaller_than_fernet(self, use_engine, name):
+        """AEAD output has no base64 or CBC padding overhead."""
+        data = b"x" * 4096
+        fernet_size = len(encrypt_bytes(data))
+        use_engine(name)
+        sealed = encrypt_bytes(data)
+        assert len(sealed) == HEADER_SIZE + 12 + len(data) + 16
+        assert len(sealed) < fernet_size
+
+    def test_engine_is_picked_from_header(self, use_engine):
+        """Ciphertexts from every engine decrypt whatever engine is configured."""
+        fernet_token = encrypt_data("legacy")
+        use_engine("aes-gcm")
+        gcm = encrypt_data("gcm")
+        use_engine("chacha20-poly1305")
+        assert decrypt_data(fernet_token) == "legacy"
+        assert decrypt_data(gcm) == "gcm"
+
+    def test_unknown_engine_configured(self, use_engine):
+        use_engine("rot13")
+        with pytest.raises(HTTPException) as exc_info:
+            encrypt_bytes(b"data")
+        assert exc_info.value.status_code == 503
+
+    def test_tampered_header_rejected(self, use_engine):
+        use_engine("aes-gcm")
+        sealed = bytearray(encrypt_bytes(b"data"))
+        sealed[4] = 2
+        with pytest.raises(HTTPException) as exc_info:
+            decrypt_bytes(bytes(sealed))
+        assert exc_info.value.status_code == 400
+
+    def test_rotate_migrates_to_configured_engine(self, use_engine):
+        """Rotation re-encrypts Fernet tokens with the configured engine."""
+        token = encrypt_data("secret")
+        use_engine("chacha20-poly1305")
+        [(rotated, error)] = rotate_batch([token])
+        assert error is None
+        assert rotated.startswith(TEXT_PREFIX)
+        assert decrypt_data(rotated) == "secret"
+
+    def test_raw_endpoints(self, use_engine, auth_header):
+        use_engine("aes-gcm")
+        headers = {**auth_header, "Content-Type": "application/octet-stream"}
+        sealed = client.post("/encrypt/raw", content=b"\x00\xff" * 100, headers=headers).content
+        assert read_header(sealed) == ("aes-gcm", 0)
+        response = client.post("/decrypt/raw", content=sealed, headers=headers)
+        assert response.content == b"\x00\xff" * 100
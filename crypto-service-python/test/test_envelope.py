@@ -0,0 +1,224 @@
+import asyncio
+import base64
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from cryptography.fernet import Fernet, MultiFernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.envelope import DataKeyCache, EnvelopeService, KeyStore, LEGACY_MAGIC, MAGIC, read_key_id
+
+OLD_MASTER = Fernet(Fernet.generate_key())
+NEW_MASTER = Fernet(Fernet.generate_key())
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = EnvelopeService(KeyStore(str(tmp_path / "keys.db")), MultiFernet([OLD_MASTER]))
+    yield service
+    service.store.close()
+
+
+class TestDataKeyCache:
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted once the cache is full."""
+        cache = DataKeyCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["size"] == 2
+
+    def test_ttl_expiry(self):
+        """Entries expire after the TTL."""
+        cache = DataKeyCache(ttl=10)
+        with patch("app.envelope.time.monotonic", return_value=0):
+            cache.put("a", 1)
+        with patch("app.envelope.time.monotonic", return_value=11):
+            assert cache.get("a") is None
+
+
+class TestEnvelopeService:
+    def test_round_trip_and_header(self, service):
+        """The header names the tenant's data key and decryption uses it."""
+        envelope = service.encrypt("acme", b"secret")
+        key_id, _ = read_key_id(envelope)
+        assert envelope.startswith(MAGIC)
+        assert key_id == service.active_key("acme")[0]
+        assert service.decrypt("acme", envelope) == (key_id, b"secret")
+
+    def test_other_tenants_cannot_decrypt(self, service):
+        """The data key named in the header must belong to the caller's tenant."""
+        envelope = service.encrypt("acme", b"secret")
+        with pytest.raises(HTTPException) as exc_info:
+            service.decrypt("globex", envelope)
+        assert exc_info.value.status_code == 403
+
+    def test_header_is_authenticated(self, service):
+        """A token whose sealed header differs from the envelope header is rejected."""
+        key_id, fernet = service.active_key("acme")
+        header = MAGIC + bytes((len(key_id),)) + key_id.encode()
+        forged = MAGIC + b"\x06dk_old" + b"secret"
+        envelope = header + base64.urlsafe_b64decode(fernet.encrypt(forged))
+        with pytest.raises(HTTPException) as exc_info:
+            service.decrypt("acme", envelope)
+        assert exc_info.value.status_code == 400
+
+    def test_legacy_envelopes_still_decrypt(self, service):
+        """Envelopes written before the header was sealed keep decrypting."""
+        key_id, fernet = service.active_key("acme")
+        header = LEGACY_MAGIC + bytes((len(key_id),)) + key_id.encode()
+        envelope = header + base64.urlsafe_b64decode(fernet.encrypt(b"old"))
+        assert service.decrypt("acme", envelope) == (key_id, b"old")
+
+    def test_tenants_get_separate_keys(self, service):
+        """Each tenant encrypts under its own data key."""
+        a, _ = read_key_id(service.encrypt("a", b"x"))
+        b, _ = read_key_id(service.encrypt("b", b"x"))
+        assert a != b
+
+    def test_hot_tenant_does_not_touch_master_key(self, service):
+        """Once a data key is cached, encryption never unwraps with the master key."""
+        service.encrypt("acme", b"warm-up")
+        with patch.object(service, "master", wraps=service.master) as master, \
+                patch.object(service.store, "active", wraps=service.store.active) as active:
+            for _ in range(100):
+                service.encrypt("acme", b"payload")
+            assert master.decrypt.call_count == 0
+            assert active.call_count == 0
+
+    def test_keys_persist_across_restarts(self, tmp_path):
+        """A new service over the same store unwraps the existing data key."""
+        path = str(tmp_path / "keys.db")
+        first = EnvelopeService(KeyStore(path), MultiFernet([OLD_MASTER]))
+        envelope = first.encrypt("acme", b"secret")
+        first.store.close()
+
+        second = EnvelopeService(KeyStore(path), MultiFernet([OLD_MASTER]))
+        assert second.decrypt("acme", envelope)[1] == b"secret"
+        assert second.master_unwraps == 1
+        assert read_key_id(second.encrypt("acme", b"again"))[0] == read_key_id(envelope)[0]
+        second.store.close()
+
+    def test_rotate_keeps_old_key_for_decryption(self, service):
+        """A rotated tenant encrypts under the new key; old envelopes still decrypt."""
+        old = service.encrypt("acme", b"old")
+        new_key_id = service.rotate_key("acme")
+        assert read_key_id(service.encrypt("acme", b"new"))[0] == new_key_id
+        assert service.decrypt("acme", old)[1] == b"old"
+
+    def test_revoke_evicts_and_blocks_decryption(self, service):
+        """A revoked key is evicted, refuses to decrypt and is replaced for new data."""
+        envelope = service.encrypt("acme", b"secret")
+        key_id, _ = read_key_id(envelope)
+        assert service.revoke_key(key_id) == "acme"
+        with pytest.raises(HTTPException) as exc_info:
+            service.decrypt("acme", envelope)
+        assert exc_info.value.status_code == 403
+        assert read_key_id(service.encrypt("acme", b"x"))[0] != key_id
+
+    def test_revoke_unknown_key(self, service):
+        with pytest.raises(HTTPException) as exc_info:
+            service.revoke_key("dk_missing")
+        assert exc_info.value.status_code == 404
+
+    def test_rewrap_under_new_master_key(self, tmp_path):
+        """Re-wrapping lets the old master key be dropped without touching payloads."""
+        path = str(tmp_path / "keys.db")
+        service = EnvelopeService(KeyStore(path), MultiFernet([NEW_MASTER, OLD_MASTER]))
+        envelope = service.encrypt("acme", b"secret")
+        assert service.rewrap_keys() == 1
+        service.store.close()
+
+        rewrapped = EnvelopeService(KeyStore(path), MultiFernet([NEW_MASTER]))
+        assert rewrapped.decrypt("acme", envelope)[1] == b"secret"
+        rewrapped.store.close()
+
+    def test_tampered_and_malformed_envelopes(self, service):
+        envelope = service.encrypt("acme", b"secret")
+        tampered = envelope[:-1] + bytes([envelope[-1] ^ 1])
+        for bad in (tampered, b"XXXX", MAGIC + b"\x09dk_", MAGIC + b"\x03dk_unknown"):
+            with pytest.raises(HTTPException) as exc_info:
+                service.decrypt("acme", bad)
+            assert exc_info.value.status_code == 400
+
+
+class TestEnvelopeEndpoints:
+    @pytest.fixture(autouse=True)
+    def use_service(self, service):
+        with patch("app.envelope._service", service):
+            yield
+
+    def test_encrypt_decrypt(self, auth_header):
+        response = client.post("/envelope/encrypt", json={"tenant": "acme", "plaintext": "Hello"}, headers=auth_header)
+        assert response.status_code == 200
+        body = response.json()
+
+        response = client.post(
+            "/envelope/decrypt", json={"tenant": "acme", "ciphertext": body["ciphertext"]}, headers=auth_header
+        )
+        assert response.status_code == 200
+        assert response.json() == {"plaintext": "Hello", "key_id": body["key_id"]}
+
+        response = client.post(
+            "/envelope/decrypt", json={"tenant": "globex", "ciphertext": body["ciphertext"]}, headers=auth_header
+        )
+        assert response.status_code == 403
+
+    def test_invalid_tenant_rejected(self, auth_header):
+        response = client.post("/envelope/encrypt", json={"tenant": "a/b", "plaintext": "x"}, headers=auth_header)
+        assert response.status_code == 422
+
+    def test_revoke_requires_admin(self, token_factory):
+        key_id = client.post(
+            "/envelope/encrypt", json={"tenant": "acme", "plaintext": "x"},
+            headers={"Authorization": f"Bearer {token_factory()}"}
+        ).json()["key_id"]
+
+        user = {"Authorization": f"Bearer {token_factory(sub='user', role='User')}"}
+        assert client.post(f"/envelope/keys/{key_id}/revoke", headers=user).status_code == 403
+
+        admin = {"Authorization": f"Bearer {token_factory()}"}
+        response = client.post(f"/envelope/keys/{key_id}/revoke", headers=admin)
+        assert response.status_code == 200
+        assert response.json() == {"tenant": "acme", "key_id": key_id, "revoked": True}
+
+    def test_rotate_and_rewrap(self, auth_header):
+        response = client.post("/envelope/keys/acme/rotate", headers=auth_header)
+        assert response.status_code == 200
+        assert response.json()["tenant"] == "acme"
+
+        response = client.post("/envelope/keys/rewrap", headers=auth_header)
+        assert response.status_code == 200
+        assert response.json() == {"rewrapped": 1}
+
+    def test_key_admin_runs_off_the_event_loop(self, auth_header, service):
+        """Rotate, revoke and re-wrap do their SQLite work in a worker thread."""
+        on_loop = []
+
+        def recording(method):
+            def call(*args):
+                try:
+                    asyncio.get_running_loop()
+                    on_loop.append(True)
+                except RuntimeError:
+                    on_loop.append(False)
+                return method(*args)
+            return call
+
+        with patch.object(service, "rotate_key", recording(service.rotate_key)), \
+                patch.object(service, "revoke_key", recording(service.revoke_key)), \
+                patch.object(service, "rewrap_keys", recording(service.rewrap_keys)):
+            key_id = client.post("/envelope/keys/acme/rotate", headers=auth_header).json()["key_id"]
+            assert client.post(f"/envelope/keys/{key_id}/revoke", headers=auth_header).status_code == 200
+            assert client.post("/envelope/keys/rewrap", headers=auth_header).status_code == 200
+        assert on_loop == [False, False, False]
@@ -0,0 +1,111 @@
+import asyncio
+import contextvars
+import sys
+import threading
+from pathlib import Path
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.crypto import encrypt_data, decrypt_data
+from app.executor import CryptoExecutor
+
+
+def _thread_name(_):
+    return threading.current_thread().name
+
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+
+
+def _fail(_):
+    raise HTTPException(status_code=400, detail="bad input")
+
+
+class TestCryptoExecutor:
+    def test_small_payload_runs_inline(self):
+        """Payloads below the threshold stay on the event loop thread."""
+        executor = CryptoExecutor(mode="thread", threshold=1024)
+        name = asyncio.run(executor.run(_thread_name, None, size=10))
+        assert name == threading.main_thread().name
+        assert executor._pool is None
+
+    def test_large_payload_is_offloaded(self):
+        """Payloads at or above the threshold run in the thread pool."""
+        executor = CryptoExecutor(mode="thread", threshold=1024)
+        try:
+            name = asyncio.run(executor.run(_thread_name, None, size=1024))
+            assert name.startswith("crypto")
+        finally:
+            executor.shutdown()
+
+    def test_context_is_copied_to_the_pool(self):
+        """Context variables (log fields, the current trace) reach pool threads."""
+        executor = CryptoExecutor(mode="thread", threshold=0)
+
+        async def run():
+            _request_id.set("req-1")
+            return await executor.run(lambda _: _request_id.get(), None, size=1)
+
+        try:
+            assert asyncio.run(run()) == "req-1"
+        finally:
+            executor.shutdown()
+
+    def test_errors_are_reraised(self):
+        """HTTPExceptions raised in the pool reach the caller unchanged."""
+        executor = CryptoExecutor(mode="thread", threshold=0)
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                asyncio.run(executor.run(_fail, None, size=1))
+            assert exc_info.value.status_code == 400
+            assert exc_info.value.detail == "bad input"
+        finally:
+            executor.shutdown()
+
+    def test_full_queue_returns_503(self):
+        """Offloaded calls beyond max_queue are rejected, not queued."""
+        executor = CryptoExecutor(mode="thread", threshold=0, max_queue=1)
+        release = threading.Event()
+
+        async def run():
+            first = asyncio.ensure_future(executor.run(lambda _: release.wait(5), None, size=1))
+            await asyncio.sleep(0.05)
+            try:
+                await executor.run(_thread_name, None, size=1)
+            finally:
+                release.set()
+                await first
+
+        try:
+            with pytest.raises(HTTPException) as exc_info:
+                asyncio.run(run())
+        finally:
+            executor.shutdown()
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "1"
+
+    def test_zero_max_queue_is_unbounded(self):
+        """max_queue=0 disables the limit, as saturation already assumed."""
+        executor = CryptoExecutor(mode="thread", threshold=0, max_queue=0)
+        try:
+            assert asyncio.run(executor.run(_thread_name, None, size=1)).startswith("crypto")
+        finally:
+            executor.shutdown()
+        assert executor.saturation == 0.0
+
+    def test_process_pool_roundtrip(self):
+        """The process pool encrypts and decrypts with the configured key."""
+        executor = CryptoExecutor(mode="process", max_workers=1, threshold=0)
+        try:
+            ciphertext = asyncio.run(executor.run(encrypt_data, "Hello, World!", size=13))
+            plaintext = asyncio.run(executor.run(decrypt_data, ciphertext, size=len(ciphertext)))
+            assert plaintext == "Hello, World!"
+        finally:
+            executor.shutdown()
+
+    def test_unknown_mode(self):
+        """Invalid modes are rejected at construction time."""
+        with pytest.raises(ValueError):
+            CryptoExecutor(mode="gpu")
@@ -0,0 +1,143 @@
+import copy
+import pickle
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.fields import (
+    WILDCARD,
+    FieldPaths,
+    decrypt_documents,
+    encrypt_documents,
+    get_field_paths,
+    parse_path
+)
+
+client = TestClient(app)
+
+DOCUMENT = {
+    "id": 42,
+    "email": "jane@example.com",
+    "address": {"street": "1 Main St", "city": "Springfield", "zip": 12345},
+    "cards": [{"number": "4111", "expiry": "12/30"}, {"number": "5500", "expiry": "01/31"}],
+    "contacts": {"home": {"phone": "555-1"}, "work": {"phone": "555-2"}},
+    "flags": {"vip": True}
+}
+PATHS = ["email", "address.street", "address.zip", "cards[*].number", "contacts.*.phone", "flags", "missing.path"]
+
+
+class TestFieldPaths:
+    def test_parse_path(self):
+        assert parse_path("a.b[0][*].c") == ("a", "b", 0, WILDCARD, "c")
+        assert parse_path("*.x") == (WILDCARD, "x")
+        for bad in ("", "a..b", "a[x]", "a]"):
+            with pytest.raises(ValueError):
+                parse_path(bad)
+
+    def test_overlapping_paths_rejected(self):
+        for paths in (["a", "a.b"], ["a.b", "a"]):
+            with pytest.raises(ValueError):
+                FieldPaths(paths)
+        assert FieldPaths(["a", "a"]).paths == ("a",)
+
+    def test_targets(self):
+        fields = FieldPaths(PATHS)
+        selected = [container[key] for container, key in fields.targets(DOCUMENT)]
+        assert sorted(map(str, selected)) == sorted(map(str, [
+            "jane@example.com", "1 Main St", 12345, "4111", "5500", "555-1", "555-2", {"vip": True}
+        ]))
+
+    def test_pickles_for_process_executor(self):
+        fields = pickle.loads(pickle.dumps(FieldPaths(PATHS)))
+        assert len(fields.targets(DOCUMENT)) == 8
+
+
+class TestSchemaCache:
+    def test_schema_id_reuses_compiled_paths(self):
+        first = get_field_paths(PATHS, "test-schema-reuse")
+        assert get_field_paths(None, "test-schema-reuse") is first
+        assert get_field_paths(PATHS, "test-schema-reuse") is first
+
+    def test_compiled_once(self):
+        with patch("app.fields.parse_path", wraps=parse_path) as parse:
+            get_field_paths(["only.once"], "test-schema-once")
+            for _ in range(10):
+                get_field_paths(["only.once"], "test-schema-once")
+        assert parse.call_count == 1
+
+    def test_new_paths_replace_schema(self):
+        get_field_paths(["a"], "test-schema-replace")
+        assert get_field_paths(["b"], "test-schema-replace").paths == ("b",)
+        assert get_field_paths(None, "test-schema-replace").paths == ("b",)
+
+    def test_missing_paths(self):
+        for paths, schema_id in ((None, None), (None, "test-schema-unknown"), (["a[x]"], None)):
+            with pytest.raises(HTTPException) as exc_info:
+                get_field_paths(paths, schema_id)
+            assert exc_info.value.status_code == 400
+
+
+class TestDocuments:
+    def test_round_trip_preserves_types(self):
+        fields = FieldPaths(PATHS)
+        documents = encrypt_documents(fields, [copy.deepcopy(DOCUMENT)])
+        encrypted = documents[0]
+        assert encrypted["id"] == 42
+        assert encrypted["address"]["city"] == "Springfield"
+        assert all(isinstance(encrypted[key], str) for key in ("email", "flags"))
+        assert isinstance(encrypted["address"]["zip"], str)
+        assert decrypt_documents(fields, documents) == [DOCUMENT]
+
+    def test_failed_decrypt_leaves_document_untouched(self):
+        fields = FieldPaths(["email", "address.street"])
+        document = encrypt_documents(fields, [copy.deepcopy(DOCUMENT)])[0]
+        document["address"]["street"] = "gAAAAAtampered"
+        before = copy.deepcopy(document)
+        with pytest.raises(HTTPException) as exc_info:
+            decrypt_documents(fields, [document])
+        assert exc_info.value.status_code == 400
+        assert document == before
+
+
+class TestFieldsEndpoints:
+    def test_single_document(self, auth_header):
+        response = client.post(
+            "/encrypt/fields",
+            json={"fields": PATHS, "schema_id": "test-endpoint", "document": DOCUMENT},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert set(body) == {"document"}
+        assert body["document"]["email"].startswith("gAAAA")
+
+        response = client.post(
+            "/decrypt/fields",
+            json={"schema_id": "test-endpoint", "document": body["document"]},
+            headers=auth_header
+        )
+        assert response.json() == {"document": DOCUMENT}
+
+    def test_batch(self, auth_header):
+        documents = [dict(DOCUMENT, id=i) for i in range(5)]
+        response = client.post(
+            "/encrypt/fields", json={"fields": ["email"], "documents": documents}, headers=auth_header
+        )
+        encrypted = response.json()["documents"]
+        assert [doc["id"] for doc in encrypted] == list(range(5))
+
+        response = client.post(
+            "/decrypt/fields", json={"fields": ["email"], "documents": encrypted}, headers=auth_header
+        )
+        assert response.json() == {"documents": documents}
+
+    def test_exactly_one_payload(self, auth_header):
+        for payload in ({"fields": ["a"]}, {"fields": ["a"], "document": {}, "documents": [{}]}):
+            response = client.post("/encrypt/fields", json=payload, headers=auth_header)
+            assert response.status_code == 422
@@ -0,0 +1,67 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.executor import get_crypto_executor
+from app.health import HealthMonitor, health_monitor
+
+client = TestClient(app)
+
+class TestHealthMonitor:
+    def test_snapshot_is_cached(self):
+        """Repeated snapshots reuse the last self-test result."""
+        monitor = HealthMonitor(interval=60)
+        with patch.object(monitor, "run_self_test", wraps=monitor.run_self_test) as run:
+            first = monitor.snapshot()
+            second = monitor.snapshot()
+        assert run.call_count == 1
+        assert first["healthy"] is True
+        assert second["checked_at"] == first["checked_at"]
+        assert second["age_seconds"] >= 0
+
+    def test_failed_self_test(self):
+        """A missing cipher makes the snapshot unhealthy with an error."""
+        monitor = HealthMonitor(interval=60)
+        with patch('app.crypto.cipher', None):
+            snapshot = monitor.snapshot()
+        assert snapshot["healthy"] is False
+        assert "not properly configured" in snapshot["error"]
+
+class TestHealthEndpoints:
+    def test_liveness(self):
+        """Liveness never touches crypto."""
+        response = client.get("/health/live")
+        assert response.status_code == 200
+        assert response.json() == {"status": "alive"}
+
+    def test_readiness_reports_executor(self):
+        """Readiness includes executor queue depth and saturation."""
+        health_monitor.run_self_test()
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["executor"]["queue_depth"] == 0
+        assert data["executor"]["saturation"] == 0.0
+
+    def test_readiness_fails_when_saturated(self):
+        """A full executor queue makes the service not ready."""
+        health_monitor.run_self_test()
+        with patch.object(get_crypto_executor(), '_pending', 10_000):
+            response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not_ready"
+
+    def test_health_serves_cached_snapshot(self):
+        """/health reports the snapshot age instead of re-running the test."""
+        health_monitor.run_self_test()
+        with patch.object(health_monitor, "run_self_test") as run:
+            response = client.get("/health")
+        run.assert_not_called()
+        data = response.json()
+        assert data["status"] == "healthy"
+        assert data["age_seconds"] is not None
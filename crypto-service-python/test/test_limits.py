@@ -0,0 +1,132 @@
+import dataclasses
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config, limits
+from app.config import parse_route_limits
+from app.limits import ConcurrencyLimiter, TokenBucketLimiter
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test, with fresh limiters."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+        monkeypatch.setattr(limits, "_rate_limiter", None)
+        monkeypatch.setattr(limits, "_concurrency_limiter", None)
+    return use
+
+
+class TestLimiters:
+    def test_parse_route_limits(self):
+        assert parse_route_limits(" /a=1, /b=20 ,") == (("/a", 1), ("/b", 20))
+        for bad in ("/a", "=3", "/a=x"):
+            with pytest.raises(ValueError):
+                parse_route_limits(bad)
+
+    def test_concurrency_limiter(self):
+        limiter = ConcurrencyLimiter(default_limit=0, route_limits={"/a": 2})
+        assert limiter.try_acquire("/a") and limiter.try_acquire("/a")
+        assert not limiter.try_acquire("/a")
+        assert all(limiter.try_acquire("/b") for _ in range(100))
+        limiter.release("/a")
+        assert limiter.active("/a") == 1
+        assert limiter.try_acquire("/a")
+
+    def test_token_bucket(self):
+        limiter = TokenBucketLimiter(rate=2, burst=3)
+        with patch("app.limits.time.monotonic", return_value=100.0):
+            assert [limiter.acquire("alice") for _ in range(3)] == [0, 0, 0]
+            assert limiter.acquire("alice") == pytest.approx(0.5)
+            assert limiter.acquire("bob") == 0
+        with patch("app.limits.time.monotonic", return_value=100.5):
+            assert limiter.acquire("alice") == 0
+
+    def test_token_bucket_is_bounded(self):
+        limiter = TokenBucketLimiter(rate=1, max_clients=10)
+        for i in range(100):
+            limiter.acquire(f"client-{i}")
+        assert len(limiter._buckets) == 10
+
+
+class TestBodySize:
+    def test_content_length_over_limit(self, use_settings, auth_header):
+        use_settings(max_body_size=100)
+        with patch("app.main.encrypt_data") as encrypt:
+            response = client.post("/encrypt", json={"plaintext": "x" * 200}, headers=auth_header)
+        assert response.status_code == 413
+        assert response.json() == {"detail": "Request body exceeds 100 bytes"}
+        encrypt.assert_not_called()
+
+    def test_body_without_content_length_over_limit(self, use_settings, auth_header):
+        use_settings(max_body_size=100)
+        chunks = iter([b'{"plaintext": "', b"x" * 200, b'"}'])
+        response = client.post(
+            "/encrypt", content=chunks, headers={**auth_header, "Content-Type": "application/json"}
+        )
+        assert response.status_code == 413
+
+    def test_rejection_carries_cors_headers(self, use_settings, auth_header):
+        """Browsers can read admission rejections: CORS wraps the admission middleware."""
+        use_settings(max_body_size=100)
+        response = client.post(
+            "/encrypt", json={"plaintext": "x" * 200},
+            headers={**auth_header, "Origin": "https://app.example.com"}
+        )
+        assert response.status_code == 413
+        assert response.headers["access-control-allow-origin"] == "https://app.example.com"
+
+    def test_within_limit(self, use_settings, auth_header):
+        use_settings(max_body_size=100)
+        response = client.post("/encrypt", json={"plaintext": "x" * 10}, headers=auth_header)
+        assert response.status_code == 200
+
+    def test_stream_routes_have_their_own_limit(self, use_settings, auth_header):
+        use_settings(max_body_size=100, max_stream_body_size=0)
+        response = client.post("/encrypt/stream", content=b"x" * 1000, headers=auth_header)
+        assert response.status_code == 200
+
+        use_settings(max_body_size=100, max_stream_body_size=500)
+        response = client.post("/encrypt/stream", content=b"x" * 1000, headers=auth_header)
+        assert response.status_code == 413
+
+
+class TestAdmission:
+    def test_route_concurrency_limit(self, use_settings, auth_header):
+        use_settings(route_concurrency=(("/encrypt", 1),))
+        limiter = limits.get_concurrency_limiter()
+        assert limiter.try_acquire("/encrypt")  # One request already in progress
+        try:
+            response = client.post("/encrypt", json={"plaintext": "x"}, headers=auth_header)
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "1"
+            assert client.post("/decrypt", json={"ciphertext": "x"}, headers=auth_header).status_code != 429
+        finally:
+            limiter.release("/encrypt")
+        assert client.post("/encrypt", json={"plaintext": "x"}, headers=auth_header).status_code == 200
+        assert limiter.active("/encrypt") == 0
+
+    def test_rate_limit_per_subject(self, use_settings, token_factory):
+        use_settings(rate_limit=0.5, rate_limit_burst=2)
+        alice = {"Authorization": f"Bearer {token_factory(sub='alice')}"}
+        bob = {"Authorization": f"Bearer {token_factory(sub='bob')}"}
+        for _ in range(2):
+            assert client.post("/encrypt", json={"plaintext": "x"}, headers=alice).status_code == 200
+        response = client.post("/encrypt", json={"plaintext": "x"}, headers=alice)
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["Retry-After"]) <= 2
+        assert client.post("/encrypt", json={"plaintext": "x"}, headers=bob).status_code == 200
+
+    def test_rate_limit_off_by_default(self, use_settings, auth_header):
+        use_settings(rate_limit=0)
+        for _ in range(20):
+            assert client.post("/encrypt", json={"plaintext": "x"}, headers=auth_header).status_code == 200
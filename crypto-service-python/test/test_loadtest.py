@@ -0,0 +1,36 @@
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from benchmarks import loadtest
+
+PERCENTILES = {"p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms"}
+
+
+class TestLoadtest:
+    @pytest.mark.parametrize("via_gateway", [False, True])
+    def test_short_run_in_process(self, via_gateway):
+        """A one-second run at a low rate completes without errors and reports every field."""
+        results = loadtest.run(
+            scenarios=["encrypt"], modes=["open", "closed"], rps=20, duration=1.0,
+            concurrency=2, size=64, batch=2, app=app, via_gateway=via_gateway
+        )
+
+        assert results["target"] == ("gateway stand-in" if via_gateway else "direct")
+        assert results["duration_s"] == 1.0
+        assert results["payload_bytes"] == 64
+        open_loop, closed_loop = results["scenarios"]["encrypt"]["open"], results["scenarios"]["encrypt"]["closed"]
+        assert open_loop["requests"] == 20
+        assert closed_loop["concurrency"] == 2
+        for report in (open_loop, closed_loop):
+            assert report["errors"] == 0 and report["dropped"] == 0
+            assert report["statuses"] == {"200": report["requests"]}
+            assert report["achieved_rps"] > 0
+            for key in ("latency", "service_time", "send_lag"):
+                assert PERCENTILES <= report[key].keys()
+            assert report["latency"]["p50_ms"] >= report["service_time"]["p50_ms"]
+
+        assert "encrypt" in loadtest.format_report(results["scenarios"])
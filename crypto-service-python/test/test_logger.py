@@ -0,0 +1,60 @@
+import json
+import logging
+import queue
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.logger import (
+    DroppingQueueHandler,
+    JsonFormatter,
+    get_log_level,
+    setup_logger,
+    should_sample
+)
+
+
+class TestLogger:
+    def test_level_from_environment(self, monkeypatch):
+        """LOG_LEVEL controls the level; unknown names fall back to INFO."""
+        monkeypatch.setenv("LOG_LEVEL", "warning")
+        assert get_log_level() == logging.WARNING
+        assert setup_logger("test.level.warning").level == logging.WARNING
+
+        monkeypatch.setenv("LOG_LEVEL", "chatty")
+        assert get_log_level() == logging.INFO
+
+    def test_logger_uses_queue_handler(self):
+        """Loggers write through the shared queue handler only."""
+        logger = setup_logger("test.queue")
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], DroppingQueueHandler)
+        assert logger.propagate is False
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Structured output carries the message and any extra fields."""
+        record = logging.LogRecord("app.main", logging.INFO, __file__, 1, "GET %s", ("/health",), None)
+        record.status = 200
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry["message"] == "GET /health"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "app.main"
+        assert entry["status"] == 200
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """A full queue drops records rather than blocking the caller."""
+        handler = DroppingQueueHandler(queue.Queue(1))
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", (), None)
+
+        handler.emit(record)
+        handler.emit(record)
+
+        assert handler.dropped == 1
+
+    def test_sampling(self):
+        """Rates of 1 and 0 keep all and none of the lines."""
+        assert all(should_sample(1.0) for _ in range(100))
+        assert not any(should_sample(0.0) for _ in range(100))
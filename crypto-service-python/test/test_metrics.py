@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import _route_label, app
+
+TEST_CIPHER = Fernet(Fernet.generate_key())
+
+client = TestClient(app)
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetricsEndpoint:
+    def test_metrics_in_prometheus_format(self, auth_header):
+        """Requests, stages and bytes show up in the text exposition."""
+        before = client.get("/metrics").text
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            response = client.post("/encrypt", json={"plaintext": "Hello, World!"}, headers=auth_header)
+        assert response.status_code == 200
+
+        metrics = client.get("/metrics")
+        assert metrics.status_code == 200
+        assert metrics.headers["content-type"].startswith("text/plain")
+        text = metrics.text
+
+        requests_key = 'crypto_http_requests_total{method="POST",route="/encrypt",status="200"}'
+        assert _sample(text, requests_key) == _sample(before, requests_key) + 1
+
+        bytes_key = 'crypto_bytes_processed_total{operation="encrypt_data"}'
+        assert _sample(text, bytes_key) == _sample(before, bytes_key) + len("Hello, World!")
+
+        for stage in ("jwt_verify", "crypto", "serialization"):
+            stage_key = f'crypto_stage_duration_seconds_count{{stage="{stage}"}}'
+            assert _sample(text, stage_key) == _sample(before, stage_key) + 1
+        assert 'crypto_http_requests_in_flight{route="/metrics"}' in text
+        assert "crypto_service_start_time_seconds" in text
+
+    def test_unknown_paths_share_one_label(self):
+        """Arbitrary paths do not create new label values."""
+        client.get("/no/such/path/12345")
+        text = client.get("/metrics").text
+        assert 'route="unmatched"' in text
+        assert "/no/such/path/12345" not in text
+
+    def test_parameterized_paths_use_route_template(self):
+        """Paths with parameters are labelled by their route, not 'unmatched' or the raw path."""
+        client.post("/envelope/keys/tenant-12345/rotate")
+        text = client.get("/metrics").text
+        assert 'route="/envelope/keys/{tenant}/rotate"' in text
+        assert "tenant-12345" not in text
+
+    def test_wrong_method_uses_route_template(self):
+        client.get("/encrypt")
+        text = client.get("/metrics").text
+        assert 'method="GET",route="/encrypt",status="405"' in text
+
+    def test_unknown_methods_are_collapsed(self):
+        """Arbitrary request methods do not create new label values."""
+        client.request("BREW", "/encrypt")
+        text = client.get("/metrics").text
+        assert 'method="other",route="/encrypt",status="405"' in text
+        assert "BREW" not in text
+
+    def test_route_label_is_cached_in_scope_state(self):
+        """Tracing, admission and logging share one route lookup per request."""
+        scope = {"type": "http", "method": "POST", "path": "/encrypt", "root_path": "",
+                 "query_string": b"", "headers": []}
+        assert _route_label(scope) == "/encrypt"
+        assert scope["state"]["route_label"] == "/encrypt"
+        scope["path"] = "/decrypt"
+        assert _route_label(scope) == "/encrypt"
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.ndjson import decrypt_records, encrypt_records, iter_records, parse_fields, transform_stream
+
+client = TestClient(app)
+
+RECORDS = [{"id": i, "email": f"user{i}@example.com", "score": i * 1.5, "tags": ["a", i]} for i in range(50)]
+BODY = b"".join(json.dumps(record).encode() + b"\n" for record in RECORDS)
+
+
+async def _iterate(data: bytes, piece: int = 13):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+async def _collect(agen):
+    return [part async for part in agen]
+
+
+def _lines(data: bytes) -> list:
+    return [json.loads(line) for line in data.splitlines()]
+
+
+class TestRecordSplitting:
+    def test_lines_split_across_chunks(self):
+        data = b'{"a":1}\n\n  {"b":2}\r\n{"c":3}'
+        records = asyncio.run(_collect(iter_records(_iterate(data, piece=3), max_line_size=100)))
+        assert records == [(1, b'{"a":1}'), (3, b'{"b":2}'), (4, b'{"c":3}')]
+
+    def test_parse_fields(self):
+        assert parse_fields(None) is None
+        assert parse_fields(" , ") is None
+        assert parse_fields("email, address.street").paths == ("email", "address.street")
+
+
+class TestTransformStream:
+    def _run(self, process, data, fields=None, **limits):
+        return b"".join(asyncio.run(_collect(transform_stream(_iterate(data), process, fields, **limits))))
+
+    def test_whole_record_round_trip(self):
+        encrypted = self._run(encrypt_records, BODY, batch_size=7, max_in_flight=2)
+        assert all(set(line) == {"ciphertext"} for line in _lines(encrypted))
+        assert _lines(self._run(decrypt_records, encrypted, batch_size=7)) == RECORDS
+
+    def test_field_round_trip_keeps_types(self):
+        """Only named fields are encrypted; their JSON types survive decryption."""
+        fields = parse_fields("email,tags,missing")
+        encrypted = _lines(self._run(encrypt_records, BODY, fields))
+        assert all(line["id"] == record["id"] and line["email"] != record["email"]
+                   for line, record in zip(encrypted, RECORDS))
+        data = b"\n".join(json.dumps(line).encode() for line in encrypted)
+        assert _lines(self._run(decrypt_records, data, fields)) == RECORDS
+
+    def test_bad_records_do_not_fail_the_stream(self):
+        data = b'{"id":1}\nnot json\n[1,2]\n{"id":4}\n'
+        output = _lines(self._run(encrypt_records, data, parse_fields("id")))
+        assert len(output) == 4
+        assert output[1] == {"line": 2, "error": {"status_code": 400, "detail": "Invalid JSON record"}}
+        assert output[2]["error"]["detail"] == "Record must be a JSON object"
+        assert "error" not in output[3]
+
+    def test_failed_record_does_not_fail_its_group(self):
+        """A record that fails decryption is reported alone; the rest of the group decrypts."""
+        fields = parse_fields("email")
+        encrypted = _lines(self._run(encrypt_records, BODY[:BODY.index(b"\n", 200) + 1], fields))
+        encrypted[1]["email"] = "gAAAAAtampered"
+        data = b"\n".join(json.dumps(line).encode() for line in encrypted)
+        output = _lines(self._run(decrypt_records, data, fields))
+        assert output[1]["line"] == 2
+        assert output[1]["error"]["status_code"] == 400
+        assert output[0] == RECORDS[0]
+        assert output[2:] == RECORDS[2:len(output)]
+
+    def test_overlong_line_ends_stream(self):
+        data = b'{"id":1}\n{"id":"' + b"x" * 200 + b'"}\n{"id":3}\n'
+        output = _lines(self._run(encrypt_records, data, max_line_size=100))
+        assert len(output) == 2
+        assert output[1]["line"] == 2
+        assert output[1]["error"]["status_code"] == 413
+
+
+class TestNdjsonEndpoints:
+    def test_round_trip(self, auth_header):
+        headers = {**auth_header, "Content-Type": "application/x-ndjson"}
+        response = client.post("/encrypt/ndjson?fields=email", content=BODY, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert all(line["email"].startswith("gAAAA") for line in _lines(response.content))
+
+        response = client.post("/decrypt/ndjson?fields=email", content=response.content, headers=headers)
+        assert _lines(response.content) == RECORDS
+
+    def test_requires_auth(self):
+        assert client.post("/encrypt/ndjson", content=BODY).status_code in (401, 403)
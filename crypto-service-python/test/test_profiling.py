@@ -0,0 +1,102 @@
+import dataclasses
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+    return use
+
+
+@pytest.fixture
+def profiling(use_settings):
+    use_settings(profiling_enabled=True)
+
+
+def _busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestProfilingAccess:
+    def test_hidden_when_disabled(self, auth_header, use_settings):
+        use_settings(profiling_enabled=False)
+        assert client.post("/debug/profile?seconds=0.1", headers=auth_header).status_code == 404
+        assert client.post("/debug/memory?seconds=0.1", headers=auth_header).status_code == 404
+        assert client.get("/debug/loop-lag?seconds=0.1", headers=auth_header).status_code == 404
+
+    def test_admin_only(self, profiling, token_factory):
+        headers = {"Authorization": f"Bearer {token_factory(role='User')}"}
+        assert client.post("/debug/profile?seconds=0.1", headers=headers).status_code == 403
+        assert client.get("/debug/loop-lag?seconds=0.1").status_code in (401, 403)
+
+    def test_duration_capped(self, auth_header, use_settings):
+        use_settings(profiling_enabled=True, profiling_max_seconds=1)
+        response = client.post("/debug/profile?seconds=5", headers=auth_header)
+        assert response.status_code == 400
+
+
+class TestProfiles:
+    def test_stack_profile_is_collapsed(self, auth_header, profiling):
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_worker, args=(stop,), name="busy worker")
+        worker.start()
+        try:
+            response = client.post("/debug/profile?seconds=0.3&interval=0.005", headers=auth_header)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert response.status_code == 200
+        assert int(response.headers["X-Profile-Samples"]) > 0
+        lines = response.text.splitlines()
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+        assert any(line.startswith("busy_worker;") and "test_profiling:_busy_worker" in line for line in lines)
+
+    def test_memory_diff_finds_growth(self, auth_header, profiling):
+        leak = []
+        stop = threading.Event()
+
+        def grow():
+            while not stop.is_set():
+                leak.append(bytearray(10_000))
+                time.sleep(0.005)
+
+        worker = threading.Thread(target=grow)
+        worker.start()
+        try:
+            response = client.post("/debug/memory?seconds=0.3&limit=5", headers=auth_header)
+        finally:
+            stop.set()
+            worker.join()
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["top"]) <= 5
+        assert any("test_profiling.py" in stat["traceback"][0] and stat["size_diff"] > 0 for stat in data["top"])
+        assert not tracemalloc.is_tracing()
+
+    def test_loop_lag(self, auth_header, profiling):
+        response = client.get("/debug/loop-lag?seconds=0.2&interval=0.01", headers=auth_header)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["samples"] > 0
+        assert 0 <= data["p50_ms"] <= data["p99_ms"] <= data["max_ms"]
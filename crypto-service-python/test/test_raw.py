@@ -0,0 +1,68 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.crypto import encrypt_bytes, decrypt_bytes, decrypt_data
+
+TEST_KEY = Fernet.generate_key()
+TEST_CIPHER = Fernet(TEST_KEY)
+
+client = TestClient(app)
+
+class TestBytesApi:
+    @pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview])
+    def test_bytes_roundtrip(self, wrap):
+        """bytes, bytearray and memoryview inputs are all accepted."""
+        data = os.urandom(1024)
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            token = encrypt_bytes(wrap(data))
+            assert isinstance(token, bytes)
+            assert decrypt_bytes(memoryview(token)) == data
+
+    def test_encrypt_bytes_empty(self):
+        """Empty input is rejected like encrypt_data."""
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            with pytest.raises(HTTPException) as exc_info:
+                encrypt_bytes(memoryview(b""))
+            assert exc_info.value.status_code == 400
+
+    def test_decrypt_data_rejects_binary_plaintext(self):
+        """Binary plaintext cannot be returned through the str API."""
+        token = TEST_CIPHER.encrypt(b"\xff\xfe\x00").decode()
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            with pytest.raises(HTTPException) as exc_info:
+                decrypt_data(token)
+            assert exc_info.value.status_code == 400
+
+class TestRawEndpoints:
+    def test_raw_roundtrip(self, auth_header):
+        """Binary bodies round-trip through /encrypt/raw and /decrypt/raw."""
+        data = os.urandom(4096)
+        headers = {**auth_header, "Content-Type": "application/octet-stream"}
+
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            encrypted = client.post("/encrypt/raw", content=data, headers=headers)
+            assert encrypted.status_code == 200
+            assert encrypted.headers["content-type"] == "application/octet-stream"
+            assert TEST_CIPHER.decrypt(encrypted.content) == data
+
+            decrypted = client.post("/decrypt/raw", content=encrypted.content, headers=headers)
+            assert decrypted.status_code == 200
+            assert decrypted.content == data
+
+    def test_decrypt_raw_invalid(self, auth_header):
+        """Invalid tokens get the usual 400 JSON error."""
+        with patch('app.crypto.cipher', TEST_CIPHER):
+            response = client.post("/decrypt/raw", content=b"invalid", headers=auth_header)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid or tampered ciphertext"
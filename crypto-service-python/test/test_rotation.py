@@ -0,0 +1,116 @@
+import base64
+import dataclasses
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from cryptography.fernet import Fernet, MultiFernet
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config
+from app.main import app
+from app.compression import FLAG_ZLIB
+from app.config import get_fernet_keys
+from app.crypto import decrypt_data, encrypt_data
+from app.engines import read_header
+from app.rotate_cli import main, rotate_stream
+
+OLD_KEY = Fernet.generate_key()
+NEW_KEY = Fernet.generate_key()
+OLD_CIPHER = Fernet(OLD_KEY)
+NEW_CIPHER = Fernet(NEW_KEY)
+RING = MultiFernet([NEW_CIPHER, OLD_CIPHER])
+DOCUMENT = json.dumps([{"id": i, "status": "ok"} for i in range(200)])
+
+client = TestClient(app)
+
+class TestKeyRing:
+    def test_fernet_keys_take_precedence(self, monkeypatch):
+        """FERNET_KEYS is parsed newest first and overrides FERNET_KEY."""
+        monkeypatch.setenv("FERNET_KEYS", f" {NEW_KEY.decode()} , {OLD_KEY.decode()} ")
+        assert get_fernet_keys() == [NEW_KEY.decode(), OLD_KEY.decode()]
+
+    def test_single_key_fallback(self, monkeypatch):
+        """Without FERNET_KEYS the single FERNET_KEY forms the ring."""
+        monkeypatch.delenv("FERNET_KEYS", raising=False)
+        monkeypatch.setenv("FERNET_KEY", OLD_KEY.decode())
+        assert get_fernet_keys() == [OLD_KEY.decode()]
+
+class TestRotateEndpoint:
+    def test_rotate_rewraps_under_newest_key(self, auth_header):
+        """Old tokens come back encrypted under the newest key."""
+        old_token = OLD_CIPHER.encrypt(b"secret").decode()
+        items = [
+            {"id": "old", "ciphertext": old_token},
+            {"id": "bad", "ciphertext": "invalid_ciphertext"},
+        ]
+
+        with patch('app.crypto.cipher', RING):
+            response = client.post("/rotate", json={"items": items}, headers=auth_header)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["succeeded"] == 1
+        assert data["failed"] == 1
+        assert NEW_CIPHER.decrypt(data["results"][0]["ciphertext"].encode()) == b"secret"
+        assert data["results"][1]["error"]["status_code"] == 400
+
+class TestRotateCli:
+    def test_rotate_stream_with_resume(self, tmp_path):
+        """Rotation output is line-aligned and resumes from a checkpoint."""
+        tokens = [OLD_CIPHER.encrypt(f"value-{i}".encode()).decode() for i in range(5)]
+        lines = [t + "\n" for t in tokens[:2]] + ["garbage\n"] + [t + "\n" for t in tokens[2:]]
+        keys = [NEW_KEY.decode(), OLD_KEY.decode()]
+        output = tmp_path / "rotated.txt"
+        checkpoint = tmp_path / "rotate.ckpt"
+
+        with patch("app.rotate_cli.logger") as logger:
+            state = rotate_stream(lines, str(output), keys, workers=2, chunk_size=2,
+                                  checkpoint_path=str(checkpoint))
+        assert state["lines_done"] == 6
+        assert state["failed"] == 1
+        logger.warning.assert_called_once()
+        assert logger.warning.call_args.args[0].startswith("line 3: ")
+        first_run = output.read_text()
+
+        # Rewind the checkpoint to the first chunk and resume
+        rotated = first_run.splitlines()
+        offset = len("\n".join(rotated[:2]) + "\n")
+        checkpoint.write_text(json.dumps({"lines_done": 2, "output_offset": offset, "failed": 0}))
+        state = rotate_stream(lines, str(output), keys, workers=1, chunk_size=2,
+                              checkpoint_path=str(checkpoint))
+        assert state["lines_done"] == 6
+
+        rotated = output.read_text().splitlines()
+        assert rotated[:2] == first_run.splitlines()[:2]
+        assert rotated[2] == "garbage"
+        decrypted = [NEW_CIPHER.decrypt(t.encode()) for i, t in enumerate(rotated) if i != 2]
+        assert decrypted == [f"value-{i}".encode() for i in range(5)]
+
+    def test_cli_rotates_sealed_values(self, tmp_path, monkeypatch):
+        """Compressed AEAD values are rotated like plain Fernet tokens."""
+        def use_settings(**changes):
+            monkeypatch.setattr(config, "_settings", dataclasses.replace(config.get_settings(), **changes))
+
+        use_settings(crypto_engine="aes-gcm", compression="zlib", compression_min_size=512,
+                     fernet_keys=(OLD_KEY.decode(),))
+        with patch('app.crypto.cipher', MultiFernet([OLD_CIPHER])):
+            sealed = encrypt_data(DOCUMENT)
+        plain = OLD_CIPHER.encrypt(b"secret").decode()
+        source = tmp_path / "tokens.txt"
+        source.write_text(f"{sealed}\n{plain}\n")
+        output = tmp_path / "rotated.txt"
+
+        # The CLI takes the ring from the loaded settings, not os.environ
+        monkeypatch.delenv("FERNET_KEYS", raising=False)
+        use_settings(fernet_keys=(NEW_KEY.decode(), OLD_KEY.decode()))
+        assert main(["-i", str(source), "-o", str(output), "--workers", "1"]) == 0
+
+        rotated = output.read_text().splitlines()
+        assert read_header(base64.urlsafe_b64decode(rotated[0])) == ("aes-gcm", FLAG_ZLIB)
+        use_settings(fernet_keys=(NEW_KEY.decode(),))
+        with patch('app.crypto.cipher', MultiFernet([NEW_CIPHER])):
+            assert decrypt_data(rotated[0]) == DOCUMENT
+            assert decrypt_data(rotated[1]) == "secret"
@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import security
+from app.security import TokenCache, require_admin, verify_token
+
+
+def _credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def _verify(credentials: HTTPAuthorizationCredentials) -> dict:
+    return asyncio.run(verify_token(credentials))
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    security.get_token_cache().clear()
+    yield
+    security.get_token_cache().clear()
+
+
+class TestVerifiedTokenCache:
+    def test_dependencies_run_on_the_event_loop(self):
+        """FastAPI runs sync dependencies in its threadpool; these must not be sync."""
+        assert asyncio.iscoroutinefunction(verify_token)
+        assert asyncio.iscoroutinefunction(require_admin)
+
+    def test_repeat_token_is_served_from_cache(self, token_factory):
+        """Only the first verification of a token decodes it."""
+        token = token_factory(sub="alice")
+
+        first = _verify(_credentials(token))
+        second = _verify(_credentials(token))
+
+        assert first == second
+        assert first["sub"] == "alice"
+        stats = security.get_token_cache().stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_invalid_token_is_not_cached(self):
+        """Failed verifications raise every time and leave no entry."""
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                _verify(_credentials("not-a-jwt"))
+            assert exc_info.value.status_code == 401
+        assert security.get_token_cache().stats()["size"] == 0
+
+    def test_entry_expires_at_token_exp(self):
+        """A cached entry never outlives the token's exp claim."""
+        cache = TokenCache(maxsize=10, ttl=3600)
+        cache.put("token", {"sub": "bob", "exp": time.time() - 1})
+        assert cache.get("token") is None
+
+    def test_expired_token_is_rejected_after_caching(self, token_factory):
+        """Tokens that expire while cached are verified again and rejected."""
+        token = token_factory(expires_in=timedelta(seconds=1))
+        _verify(_credentials(token))
+        time.sleep(2.1)
+        with pytest.raises(HTTPException):
+            _verify(_credentials(token))
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted once maxsize is reached."""
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.put("a", {"sub": "a"})
+        cache.put("b", {"sub": "b"})
+        cache.get("a")
+        cache.put("c", {"sub": "c"})
+
+        assert cache.get("b") is None
+        assert cache.get("a") == {"sub": "a"}
+        assert cache.get("c") == {"sub": "c"}
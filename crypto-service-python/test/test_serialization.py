@@ -0,0 +1,54 @@
+import json
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.main import app
+from app.serialization import FastJSONResponse, dumps, loads
+
+client = TestClient(app)
+
+
+class TestEncoding:
+    def test_dumps_matches_stdlib(self):
+        content = {"plaintext": "héllo \"wörld\"\n", "n": [1, 2.5, None, True]}
+        assert dumps(content) == json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        assert loads(dumps(content)) == content
+
+    def test_fast_response(self):
+        response = FastJSONResponse({"ciphertext": "abc"})
+        assert response.body == b'{"ciphertext":"abc"}'
+        assert response.media_type == "application/json"
+
+
+class TestEndpoints:
+    def test_encrypt_decrypt_response_shape(self, auth_header):
+        response = client.post("/encrypt", json={"plaintext": "Hello, 世界"}, headers=auth_header)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert list(response.json()) == ["ciphertext"]
+
+        response = client.post("/decrypt", json=response.json(), headers=auth_header)
+        assert response.json() == {"plaintext": "Hello, 世界"}
+
+    def test_batch_body_errors_keep_fastapi_format(self, auth_header):
+        response = client.post("/encrypt/batch", json={"items": [{"id": "1"}]}, headers=auth_header)
+        assert response.status_code == 422
+        [error] = response.json()["detail"]
+        assert error["type"] == "missing"
+        assert error["loc"] == ["body", "items", 0, "plaintext"]
+
+        response = client.post("/encrypt/batch", content=b"{not json", headers=auth_header)
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == "json_invalid"
+
+    def test_batch_auth_checked_before_body(self):
+        assert client.post("/encrypt/batch", content=b"{not json").status_code in (401, 403)
+
+    def test_batch_request_body_documented(self):
+        schema = client.get("/openapi.json").json()
+        body = schema["paths"]["/decrypt/batch"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+        assert body["required"] == ["items"]
+        assert body["properties"]["items"]["items"]["required"] == ["id", "ciphertext"]
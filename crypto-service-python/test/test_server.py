@@ -0,0 +1,83 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import Settings, get_usable_cpus
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestServerSettings:
+    def test_web_concurrency_defaults_to_core_count(self):
+        with patch.dict(os.environ, {"WEB_CONCURRENCY": ""}):
+            assert Settings.from_env().web_concurrency == get_usable_cpus()
+        with patch.dict(os.environ, {"WEB_CONCURRENCY": "3", "WORKER_MAX_REQUESTS": "500"}):
+            settings = Settings.from_env()
+        assert settings.web_concurrency == 3
+        assert settings.worker_max_requests == 500
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="multi-worker mode needs fork()")
+class TestMultiWorkerServer:
+    def test_workers_recycle_and_metrics_aggregate(self, tmp_path):
+        """Workers are replaced after their request limit; /metrics counts every worker."""
+        port = _free_port()
+        env = dict(
+            os.environ,
+            WORKER_MAX_REQUESTS="5",
+            WORKER_MAX_REQUESTS_JITTER="0",
+            PROMETHEUS_MULTIPROC_DIR=str(tmp_path),
+            ENVELOPE_KEY_STORE=str(tmp_path / "keys.db"),
+            LOG_LEVEL="WARNING"
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    httpx.get(f"{url}/health/live", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    assert time.monotonic() < deadline and server.poll() is None
+                    time.sleep(0.1)
+
+            key = 'crypto_http_requests_total{method="GET",route="/health/live",status="200"}'
+            before = _sample(httpx.get(f"{url}/metrics", timeout=5).text, key)
+
+            # Far more requests than two workers serve before being recycled;
+            # none may be dropped by a worker that is exiting
+            for _ in range(60):
+                assert httpx.get(f"{url}/health/live", timeout=5).status_code == 200
+
+            # The metrics scrapes are not counted under /health/live
+            assert _sample(httpx.get(f"{url}/metrics", timeout=5).text, key) == before + 60
+        finally:
+            server.send_signal(signal.SIGTERM)
+            assert server.wait(timeout=30) == 0
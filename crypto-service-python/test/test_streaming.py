@@ -0,0 +1,144 @@
+import asyncio
+import os
+import struct
+import sys
+from pathlib import Path
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import executor
+from app.executor import CryptoExecutor
+from app.main import app
+from app.streaming import (
+    HEADER_SIZE,
+    LEGACY_MAGIC,
+    NONCE_PREFIX_SIZE,
+    _derive_legacy_key,
+    _stream_keys,
+    StreamReader,
+    get_stream_keys,
+    encrypt_stream,
+    read_stream_header,
+    decrypt_stream
+)
+
+client = TestClient(app)
+
+
+async def _iterate(data: bytes, piece: int = 7):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+async def _collect(agen):
+    return [part async for part in agen]
+
+
+def _encrypt(data: bytes, chunk_size: int = 16) -> list:
+    return asyncio.run(_collect(encrypt_stream(_iterate(data), get_stream_keys()[0], chunk_size)))
+
+
+def _decrypt(stream: bytes) -> bytes:
+    async def run():
+        reader = StreamReader(_iterate(stream, piece=5))
+        header = await read_stream_header(reader)
+        return b"".join(await _collect(decrypt_stream(reader, header, get_stream_keys())))
+    return asyncio.run(run())
+
+
+class TestStreamFraming:
+    @pytest.mark.parametrize("size", [0, 1, 15, 16, 17, 32, 100])
+    def test_roundtrip(self, size):
+        """Data of any size survives encrypt -> decrypt, including chunk boundaries."""
+        data = os.urandom(size)
+        parts = _encrypt(data)
+        assert len(parts[0]) == HEADER_SIZE
+        assert len(parts) == 1 + max(1, -(-size // 16))
+        assert _decrypt(b"".join(parts)) == data
+
+    def test_reordered_chunks_are_rejected(self):
+        """Swapping two frames fails authentication."""
+        header, first, second, last = _encrypt(os.urandom(40))
+        with pytest.raises(HTTPException) as exc_info:
+            _decrypt(header + second + first + last)
+        assert exc_info.value.status_code == 400
+
+    def test_truncated_stream_is_rejected(self):
+        """Dropping the final frame is detected even at a frame boundary."""
+        parts = _encrypt(os.urandom(40))
+        with pytest.raises(HTTPException) as exc_info:
+            _decrypt(b"".join(parts[:-1]))
+        assert "Truncated" in exc_info.value.detail
+
+    def test_tampered_chunk_is_rejected(self):
+        """Flipping a ciphertext bit fails authentication."""
+        stream = bytearray(b"".join(_encrypt(os.urandom(40))))
+        stream[HEADER_SIZE + 4] ^= 0x01
+        with pytest.raises(HTTPException):
+            _decrypt(bytes(stream))
+
+    def test_invalid_header(self):
+        """Streams without the magic header are rejected before any output."""
+        with pytest.raises(HTTPException) as exc_info:
+            _decrypt(b"not a stream at all")
+        assert exc_info.value.detail == "Invalid stream header"
+
+    def test_oversized_frame_length_is_rejected(self):
+        """A frame length larger than the declared chunk size is refused."""
+        header = _encrypt(b"")[0]
+        with pytest.raises(HTTPException):
+            _decrypt(header + struct.pack(">I", 10_000) + b"x" * 10_000)
+
+
+    def test_streams_use_independent_keys(self):
+        """Each stream has its own salt, so the same plaintext never shares a stream key."""
+        data = os.urandom(40)
+        first, second = _encrypt(data), _encrypt(data)
+        keys = get_stream_keys()
+        assert first[0][8:24] != second[0][8:24]
+        assert _stream_keys(first[0], keys) != _stream_keys(second[0], keys)
+        # Frames of one stream do not open under another stream's header
+        with pytest.raises(HTTPException):
+            _decrypt(second[0] + b"".join(first[1:]))
+
+    def test_legacy_streams_still_decrypt(self):
+        """SCS1 streams, sealed with one key per Fernet key, remain readable."""
+        prefix = os.urandom(NONCE_PREFIX_SIZE)
+        header = LEGACY_MAGIC + struct.pack(">I", 16) + prefix
+        aead = AESGCM(_derive_legacy_key(get_stream_keys()[0]))
+        sealed = aead.encrypt(prefix + struct.pack(">I", 0) + b"\x01", b"legacy", header)
+        assert _decrypt(header + struct.pack(">I", len(sealed)) + sealed) == b"legacy"
+
+    def test_large_chunks_are_offloaded(self, monkeypatch):
+        """Frames at or above the offload threshold run on the crypto executor's pool."""
+        pool = CryptoExecutor(mode="thread", threshold=16)
+        monkeypatch.setattr(executor, "_crypto_executor", pool)
+        try:
+            data = os.urandom(100)
+            assert _decrypt(b"".join(_encrypt(data))) == data
+            assert pool._pool is not None
+        finally:
+            pool.shutdown()
+
+
+class TestStreamEndpoints:
+    def test_stream_roundtrip(self, auth_header):
+        """Bodies posted to /encrypt/stream come back from /decrypt/stream."""
+        data = os.urandom(200_000)
+
+        encrypted = client.post("/encrypt/stream", content=data, headers=auth_header)
+        assert encrypted.status_code == 200
+        assert encrypted.headers["content-type"] == "application/octet-stream"
+
+        decrypted = client.post("/decrypt/stream", content=encrypted.content, headers=auth_header)
+        assert decrypted.status_code == 200
+        assert decrypted.content == data
+
+    def test_decrypt_stream_invalid_header(self, auth_header):
+        """A bad header is reported as a normal 400 response."""
+        response = client.post("/decrypt/stream", content=b"garbage", headers=auth_header)
+        assert response.status_code == 400
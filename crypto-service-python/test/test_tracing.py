@@ -0,0 +1,156 @@
+import dataclasses
+import json
+import logging
+import sys
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import config, tracing
+from app.logger import DroppingQueueHandler, log_context
+from app.main import app
+from app.tracing import FileExporter, InMemoryExporter, Span, parse_traceparent
+
+client = TestClient(app)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def use_settings(monkeypatch):
+    """Override settings fields for the duration of a test."""
+    def use(**changes):
+        settings = dataclasses.replace(config.get_settings(), **changes)
+        monkeypatch.setattr(config, "_settings", settings)
+    return use
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    """Collect spans in memory for the duration of a test."""
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    monkeypatch.setattr(tracing, "_exporter_loaded", True)
+    return exporter
+
+
+class TestTraceparent:
+    def test_parse(self):
+        assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+        assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+        # Future versions may append fields
+        assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra") == (TRACE_ID, PARENT_ID, True)
+
+    def test_invalid(self):
+        for value in (
+            "",
+            "garbage",
+            f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+            f"00-{'0' * 32}-{PARENT_ID}-01",
+            f"00-{TRACE_ID}-{'0' * 16}-01",
+            f"ff-{TRACE_ID}-{PARENT_ID}-01",
+            f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+        ):
+            assert parse_traceparent(value) is None, value
+
+
+class TestPropagation:
+    def test_incoming_context_is_continued(self, auth_header):
+        headers = {**auth_header, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00", "X-Request-ID": "gw-123"}
+        response = client.post("/encrypt", json={"plaintext": "x"}, headers=headers)
+        assert response.headers["X-Request-ID"] == "gw-123"
+        version, trace_id, span_id, flags = response.headers["traceparent"].split("-")
+        assert (version, trace_id, flags) == ("00", TRACE_ID, "00")
+        assert span_id != PARENT_ID
+
+    def test_generated_when_missing_or_invalid(self):
+        first = client.get("/health/live", headers={"traceparent": "garbage", "X-Request-ID": "bad id\r\n"})
+        second = client.get("/health/live")
+        trace_ids = []
+        for response in (first, second):
+            parsed = parse_traceparent(response.headers["traceparent"])
+            assert parsed is not None
+            assert response.headers["X-Request-ID"] == parsed[0]
+            trace_ids.append(parsed[0])
+        assert trace_ids[0] != trace_ids[1]
+
+    def test_error_responses_carry_ids(self):
+        response = client.post("/encrypt", json={"plaintext": "x"}, headers={"X-Request-ID": "req-1"})
+        assert response.status_code in (401, 403)
+        assert response.headers["X-Request-ID"] == "req-1"
+
+    def test_logs_carry_request_id(self):
+        handler = DroppingQueueHandler(None)
+        token = log_context.set({"request_id": "req-9", "trace_id": TRACE_ID})
+        try:
+            record = handler.prepare(logging.LogRecord("app", logging.INFO, __file__, 1, "hello", (), None))
+        finally:
+            log_context.reset(token)
+        assert (record.request_id, record.trace_id) == ("req-9", TRACE_ID)
+
+
+class TestSpans:
+    def test_sampled_request_records_stage_spans(self, auth_header, exporter):
+        headers = {**auth_header, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        response = client.post("/encrypt/batch", json={"items": [{"id": "1", "plaintext": "x"}]}, headers=headers)
+        assert response.status_code == 200
+
+        spans = {span.name: span for span in exporter.spans}
+        root = spans["POST /encrypt/batch"]
+        assert root.parent_id == PARENT_ID
+        assert root.span_id == response.headers["traceparent"].split("-")[2]
+        assert root.attributes["status"] == 200
+        for stage in ("jwt_verify", "body_parse", "crypto", "serialization"):
+            assert spans[stage].trace_id == TRACE_ID
+            assert spans[stage].parent_id == root.span_id
+            assert root.start_ns <= spans[stage].start_ns <= spans[stage].end_ns <= root.end_ns
+
+    def test_unsampled_parent_records_nothing(self, auth_header, exporter):
+        headers = {**auth_header, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"}
+        client.post("/encrypt", json={"plaintext": "x"}, headers=headers)
+        assert list(exporter.spans) == []
+
+    def test_sample_rate_without_parent(self, auth_header, exporter, use_settings):
+        use_settings(trace_sample_rate=0.0)
+        client.post("/encrypt", json={"plaintext": "x"}, headers=auth_header)
+        assert list(exporter.spans) == []
+
+        use_settings(trace_sample_rate=1.0)
+        response = client.post("/encrypt", json={"plaintext": "x"}, headers=auth_header)
+        assert response.headers["traceparent"].endswith("-01")
+        assert {span.name for span in exporter.spans} >= {"POST /encrypt", "jwt_verify", "crypto", "serialization"}
+
+    def test_no_exporter_never_samples(self, auth_header, monkeypatch):
+        monkeypatch.setattr(tracing, "_exporter", None)
+        monkeypatch.setattr(tracing, "_exporter_loaded", True)
+        headers = {**auth_header, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        response = client.post("/encrypt", json={"plaintext": "x"}, headers=headers)
+        assert response.headers["traceparent"].endswith("-00")
+
+
+class TestExporters:
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        path = tmp_path / "spans.jsonl"
+        exporter = FileExporter(str(path))
+        exporter.export([Span("crypto", TRACE_ID, PARENT_ID, None, 1, 2, {"k": "v"})])
+        exporter.shutdown()
+        assert json.loads(path.read_text()) == {
+            "name": "crypto", "trace_id": TRACE_ID, "span_id": PARENT_ID, "parent_id": None,
+            "start_ns": 1, "end_ns": 2, "attributes": {"k": "v"}
+        }
+
+    def test_exporter_from_settings(self, use_settings, monkeypatch):
+        monkeypatch.setattr(tracing, "_exporter_loaded", False)
+        use_settings(trace_exporter="memory")
+        assert isinstance(tracing.get_exporter(), InMemoryExporter)
+
+        monkeypatch.setattr(tracing, "_exporter_loaded", False)
+        use_settings(trace_exporter="app.tracing:InMemoryExporter")
+        assert isinstance(tracing.get_exporter(), InMemoryExporter)
+
+        monkeypatch.setattr(tracing, "_exporter_loaded", False)
+        use_settings(trace_exporter="nonsense")
+        assert tracing.get_exporter() is None